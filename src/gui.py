@@ -1,9 +1,16 @@
 import os
 import sys
+import queue
+import threading
+import time
+import logging
 import tkinter as tk
 from tkinter import messagebox, BooleanVar, Checkbutton
 from pathlib import Path
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 from mwscanner_control import *
+from mwscanner_control import tracing
 
 # sys.path.append(os.path.join(Path.cwd(), ".."))
 # try:
@@ -12,6 +19,97 @@ from mwscanner_control import *
 #     raise
 
 
+class _QueueLogHandler(logging.Handler):
+    """Logging handler that forwards the records to the event queue."""
+
+    def __init__(self, events):
+        super().__init__()
+        self._events = events
+        self.setFormatter(logging.Formatter('%(message)s'))
+
+    def emit(self, record):
+        try:
+            self._events.put(('text', {'text': self.format(record) + '\n'}))
+        except Exception:
+            self.handleError(record)
+
+
+class AntennaMapView:
+    """Live map of the antennas (and the fitted ellipse) embedded in Tk.
+
+    The figure is rendered once and cached as background; afterwards only the
+    (animated) artists are redrawn and blitted, at most `max_fps` times per
+    second.
+    """
+
+    def __init__(self, master, coordinates, max_fps=10.):
+        self.max_fps = max_fps
+        self._background = None
+        self._dirty = False
+        self._last_draw = 0.
+
+        self.figure = Figure(figsize=(4.5, 4.5), dpi=100)
+        self.axes = self.figure.add_subplot(111)
+        self.axes.set_aspect('equal')
+        lim = 1.15 * max(max(abs(x), abs(y)) for x, y in coordinates)
+        self.axes.set_xlim(-lim, lim)
+        self.axes.set_ylim(-lim, lim)
+        self.axes.grid(True, lw=0.5)
+
+        self._ellipse, = self.axes.plot([], [], color='r', lw=1.5,
+                                        zorder=1, animated=True,
+                                        label='ellipse')
+        self._antennas = self.axes.scatter([x for x, _ in coordinates],
+                                           [y for _, y in coordinates],
+                                           s=100, color='b', zorder=2,
+                                           animated=True, label='antennas')
+        self._labels = [self.axes.annotate('{:d}'.format(im),
+                                           xy=(x, y),
+                                           xytext=(x + 5, y),
+                                           animated=True)
+                        for im, (x, y) in enumerate(coordinates)]
+
+        self.canvas = FigureCanvasTkAgg(self.figure, master=master)
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+    def _draw_artists(self):
+        self.axes.draw_artist(self._ellipse)
+        self.axes.draw_artist(self._antennas)
+        for label in self._labels:
+            self.axes.draw_artist(label)
+
+    def _on_draw(self, event):
+        # full redraw (first draw, resize etc), cache the static background
+        self._background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_artists()
+
+    def set_antennas(self, coordinates):
+        self._antennas.set_offsets(coordinates)
+        for label, (x, y) in zip(self._labels, coordinates):
+            label.xy = (x, y)
+            label.set_position((x + 5, y))
+        self._dirty = True
+
+    def set_ellipse(self, x_coordinates, y_coordinates):
+        self._ellipse.set_data(x_coordinates, y_coordinates)
+        self._dirty = True
+
+    def refresh(self, force=False):
+        """Blit the artists if they changed (bounded by `max_fps`)."""
+        now = time.monotonic()
+        if not force:
+            if not self._dirty or now - self._last_draw < 1. / self.max_fps:
+                return
+        self._dirty = False
+        self._last_draw = now
+        if self._background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self._background)
+        self._draw_artists()
+        self.canvas.blit(self.figure.bbox)
+
+
 class MotorControlApp(tk.Tk):
     def __init__(self):
         super().__init__()
@@ -20,6 +118,19 @@ class MotorControlApp(tk.Tk):
 
         self.motor_control = MotorControl()
 
+        # the motor operations run in a worker thread, which reports back
+        # through this queue. The queue is drained in the Tk mainloop
+        self._events = queue.Queue()
+        self._worker = None
+        self.poll_interval = 50         # in ms
+        self.motor_control.progress_callback = self._post_event
+        # the pauses after every antenna wait for this event (set from the
+        # dialog in the mainloop)
+        self._resume = threading.Event()
+        self.motor_control.pause_callback = self._wait_for_user
+        configure_logging(handler=_QueueLogHandler(self._events),
+                          capture_warnings=True)
+
         # Colors
         self.bg_color = 'light grey'
         self.txt_color = 'black'
@@ -56,8 +167,18 @@ class MotorControlApp(tk.Tk):
         self.force_motor_entry = None
         self.force_distance_entry = None
 
+        self.cancel_button = None
+        self.status_label = None
+        self.status_var = None
+        self.position_vars = []
+        self._action_buttons = []
+        self.antenna_map = None
+
         self.create_widgets()
 
+        self.protocol('WM_DELETE_WINDOW', self.on_close)
+        self.after(self.poll_interval, self._poll_events)
+
     def create_widgets(self):
         # Create widgets
 
@@ -211,6 +332,162 @@ class MotorControlApp(tk.Tk):
         self.force_distance_entry.grid(row=18, column=3, padx=self.padx,
                                        pady=self.pady)
 
+        # Cancel Button
+        self.cancel_button = tk.Button(self, text='Cancel',
+                                       command=self.cancel,
+                                       state=tk.DISABLED,
+                                       bg=self.bg_color,
+                                       fg=self.txt_color)
+        self.cancel_button.grid(row=0, column=1, padx=self.padx,
+                                pady=self.pady)
+
+        # Status of the running operation
+        self.status_var = tk.StringVar(value='Idle')
+        self.status_label = tk.Label(self, textvariable=self.status_var,
+                                     bg=self.bg_color, fg=self.txt_color)
+        self.status_label.grid(row=0, column=2, columnspan=2,
+                               padx=self.padx, pady=self.pady)
+
+        # Live position of every antenna
+        positions_frame = tk.Frame(self, bg=self.bg_color)
+        positions_frame.grid(row=20, column=0, columnspan=6, padx=self.padx,
+                             pady=self.pady)
+        for im, pos in enumerate(self.motor_control.positions):
+            var = tk.StringVar(value='{:d}: {:.2f} mm'.format(im, pos))
+            tk.Label(positions_frame, textvariable=var, width=14,
+                     bg=self.bg_color, fg=self.txt_color).grid(
+                row=im // 4, column=im % 4, padx=self.padx, pady=self.pady)
+            self.position_vars.append(var)
+
+        # Live antenna map
+        self.antenna_map = AntennaMapView(self,
+                                          self.motor_control.coordinates)
+        self.antenna_map.canvas.get_tk_widget().grid(row=0, column=4,
+                                                     rowspan=15,
+                                                     columnspan=2,
+                                                     padx=self.padx,
+                                                     pady=self.pady)
+
+        # these are disabled while an operation is running
+        self._action_buttons = [self.init_button, self.head_button,
+                                self.move_forward_button,
+                                self.move_backward_button,
+                                self.create_circle_button,
+                                self.create_ellipse_button,
+                                self.force_move_forward_button,
+                                self.force_move_backward_button]
+
+    def _post_event(self, event, data):
+        # NOTE: called from the worker thread, only touch the queue here
+        self._events.put((event, data))
+
+    def _wait_for_user(self):
+        # NOTE: called from the worker thread (see _run_in_worker), which
+        # waits until the dialog of the pause is closed
+        self._resume.clear()
+        self._events.put(('pause', {}))
+        self._resume.wait()
+
+    def _run_in_worker(self, description, func, *args, **kwargs):
+        """Run a (long) motor operation without blocking the mainloop.
+
+        NOTE: the pauses of the operation show a dialog (see
+        _wait_for_user), the worker thread has no console to wait for the
+        Enter key.
+        """
+        if self._worker is not None and self._worker.is_alive():
+            messagebox.showerror('Error', 'Another operation is running.')
+            return
+        # a cancel of an operation that already ended must not stop this one
+        self.motor_control.clear_cancel()
+        for button in self._action_buttons:
+            button.configure(state=tk.DISABLED)
+        self.cancel_button.configure(state=tk.NORMAL)
+        self._worker = threading.Thread(target=self._worker_main,
+                                        args=(description, func, args,
+                                              kwargs),
+                                        daemon=True)
+        self._worker.start()
+
+    def _worker_main(self, description, func, args, kwargs):
+        self._events.put(('start', {'action': description}))
+        status = 'finished'
+        try:
+            # the output of the motor control is logged (see
+            # _QueueLogHandler)
+            with tracing.span(description, 'gui'):
+                func(*args, **kwargs)
+        except MotionCancelled:
+            status = 'cancelled'
+            self.motor_control.release_all()
+        except (Exception, SystemExit) as exc:
+            # NOTE: the motor control calls sys.exit on fatal errors
+            status = 'failed'
+            self._events.put(('error', {'message': repr(exc)}))
+        self._events.put(('finished', {'action': description,
+                                       'status': status}))
+
+    def _poll_events(self):
+        positions = {}
+        try:
+            while True:
+                event, data = self._events.get_nowait()
+                if event == 'position':
+                    # only the last position of every antenna is shown
+                    positions[data['motor']] = data['position']
+                elif event == 'ellipse':
+                    if self.plot.get():
+                        self.antenna_map.set_ellipse(
+                            *ellipse_points(data['matrix'], data['centroid']))
+                elif event == 'text':
+                    self.output.insert(tk.END, data['text'])
+                    self.output.see(tk.END)
+                elif event == 'antenna':
+                    self.status_var.set('{:s}: antenna {:d}'.format(
+                        data['action'], data['motor']))
+                elif event == 'schedule':
+                    self.status_var.set('{:d} moves, about {:.1f} s'.format(
+                        data['moves'], data['predicted']))
+                elif event == 'start':
+                    self.status_var.set('Running: ' + data['action'])
+                elif event == 'error':
+                    messagebox.showerror('Error', data['message'])
+                elif event == 'pause':
+                    if not messagebox.askokcancel(
+                            'Paused', 'Antenna done. Continue?'):
+                        self.motor_control.request_cancel()
+                    self._resume.set()
+                elif event == 'finished':
+                    self.status_var.set('{:s} {:s}'.format(data['action'],
+                                                           data['status']))
+                    for button in self._action_buttons:
+                        button.configure(state=tk.NORMAL)
+                    self.cancel_button.configure(state=tk.DISABLED)
+                    positions.update(
+                        enumerate(self.motor_control.positions))
+        except queue.Empty:
+            pass
+
+        for im, pos in positions.items():
+            self.position_vars[im].set('{:d}: {:.2f} mm'.format(im, pos))
+        if positions:
+            self.antenna_map.set_antennas(self.motor_control.coordinates)
+        self.antenna_map.refresh()
+
+        self.after(self.poll_interval, self._poll_events)
+
+    def cancel(self):
+        if self._worker is not None and self._worker.is_alive():
+            self.motor_control.request_cancel()
+            self._resume.set()
+
+    def on_close(self):
+        if self._worker is not None and self._worker.is_alive():
+            self.motor_control.request_cancel()
+            self._resume.set()
+            self._worker.join(timeout=2.)
+        self.destroy()
+
     def print_motor_control(self):
         if self.motor_control is not None:
             self.output.delete('1.0', tk.END)
@@ -220,21 +497,26 @@ class MotorControlApp(tk.Tk):
 
     def init_motors(self):
         if self.motor_control is not None:
-            self.motor_control.init_motors(pauses=self.pauses.get())
+            self._run_in_worker('Init Motors',
+                                 self.motor_control.init_motors,
+                                 pauses=self.pauses.get())
         else:
             messagebox.showerror('Error',
                                  'No MotorControl object to initialize.')
 
     def set_on_head(self):
         if self.motor_control is not None:
-            self.motor_control.set_on_head(pauses=self.pauses.get())
+            self._run_in_worker('Set on Head',
+                                 self.motor_control.set_on_head,
+                                 pauses=self.pauses.get())
         else:
             messagebox.showerror('Error',
                                  'No MotorControl object to set on head.')
 
     def show_antennas(self):
         if self.motor_control is not None:
-            self.motor_control.show_antennas()
+            self.antenna_map.set_antennas(self.motor_control.coordinates)
+            self.antenna_map.refresh(force=True)
         else:
             messagebox.showerror('Error',
                                  'No MotorControl object to show antennas.')
@@ -244,8 +526,10 @@ class MotorControlApp(tk.Tk):
             try:
                 motor = int(self.motor_entry.get())
                 distance = float(self.distance_entry.get())
-                self.motor_control.move_forward(motor, distance,
-                                                pauses=self.pauses.get())
+                self._run_in_worker('Move Forward',
+                                    self.motor_control.move_forward,
+                                    motor, distance,
+                                    pauses=self.pauses.get())
             except ValueError:
                 messagebox.showerror('Error',
                                      'Please input valid motor number and '
@@ -258,8 +542,10 @@ class MotorControlApp(tk.Tk):
             try:
                 motor = int(self.motor_entry.get())
                 distance = float(self.distance_entry.get())
-                self.motor_control.move_backward(motor, distance,
-                                                 pauses=self.pauses.get())
+                self._run_in_worker('Move Backward',
+                                    self.motor_control.move_backward,
+                                    motor, distance,
+                                    pauses=self.pauses.get())
             except ValueError:
                 messagebox.showerror('Error',
                                      'Please input valid motor number and '
@@ -273,7 +559,9 @@ class MotorControlApp(tk.Tk):
                 distance_from_head = float(self.circle_distance_entry.get())
                 pauses = self.pauses.get()
 
-                self.motor_control.create_circle(distance_from_head, pauses)
+                self._run_in_worker('Create Circle',
+                                    self.motor_control.create_circle,
+                                    distance_from_head, pauses)
             except ValueError:
                 messagebox.showerror('Error',
                                      'Please input valid motor and distance.')
@@ -285,10 +573,12 @@ class MotorControlApp(tk.Tk):
             try:
                 distance_from_head = float(self.ellipse_distance_entry.get())
                 pauses = self.pauses.get()
-                plot = self.plot.get()
+                self.antenna_map.set_ellipse([], [])
 
-                self.motor_control.create_ellipse(distance_from_head, pauses,
-                                                  plot)
+                # NOTE: the ellipse is drawn on the embedded antenna map
+                self._run_in_worker('Create Ellipse',
+                                    self.motor_control.create_ellipse,
+                                    distance_from_head, pauses, False)
             except ValueError:
                 messagebox.showerror('Error', 'Please input valid distance.')
         else:
@@ -299,7 +589,9 @@ class MotorControlApp(tk.Tk):
             try:
                 motor = int(self.force_motor_entry.get())
                 distance = float(self.force_distance_entry.get())
-                self.motor_control.force_forward(motor, distance)
+                self._run_in_worker('FORCE Move Forward',
+                                    self.motor_control.force_forward,
+                                    motor, distance)
             except ValueError:
                 messagebox.showerror('Error',
                                      'Please input valid motor number and '
@@ -312,7 +604,9 @@ class MotorControlApp(tk.Tk):
             try:
                 motor = int(self.force_motor_entry.get())
                 distance = float(self.force_distance_entry.get())
-                self.motor_control.force_backward(motor, distance)
+                self._run_in_worker('FORCE Move Backward',
+                                    self.motor_control.force_backward,
+                                    motor, distance)
             except ValueError:
                 messagebox.showerror('Error',
                                      'Please input valid motor number and '
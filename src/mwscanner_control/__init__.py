@@ -1,12 +1,41 @@
 __version__ = '0.1'
 __all__ = [
     'MotorControl',
+    'MotionCancelled',
+    'MotionScheduler',
+    'AntennaLayout',
+    'MotorCoordinator',
+    'MotorNode',
+    'RemoteMotorControl',
     'RSVNAControl',
+    'SMatrix',
+    'SweepSegment',
+    'CalibrationRegistry',
+    'MotionStats',
+    'VNAStats',
     'dist2coordinates',
     'pause',
-    'outer_ellipsoid_fit'
+    'ellipse_points',
+    'ray_ellipse_distance',
+    'outer_ellipsoid_fit',
+    'configure_logging',
+    'set_quiet',
+    'start_tracing',
+    'stop_tracing',
+    'start_metrics_server'
 ]
 
-from .motor_control import MotorControl
-from .util import dist2coordinates, pause, outer_ellipsoid_fit
+from .motor_control import MotorControl, MotionCancelled
+from .scheduler import MotionScheduler
+from .layout import AntennaLayout
+from .distributed import MotorCoordinator, MotorNode, RemoteMotorControl
+from .util import dist2coordinates, pause, outer_ellipsoid_fit, \
+    ellipse_points, ray_ellipse_distance
 from .vna_control import RSVNAControl
+from .sparams import SMatrix
+from .sweep import SweepSegment
+from .calibration import CalibrationRegistry
+from .logs import configure_logging, set_quiet
+from .instrumentation import MotionStats, VNAStats
+from .tracing import start_tracing, stop_tracing
+from .metrics import start_metrics_server
@@ -0,0 +1,129 @@
+import hashlib
+import json
+import os
+import time
+
+# registry of the calibrations stored on the instrument (on the host)
+_REGISTRY_FILE = os.path.join(os.path.expanduser('~'),
+                              '.mwscanner_calibrations.json')
+# calibrations older than that (in s) are not used anymore
+_MAX_AGE = 24. * 3600.
+
+
+def calibration_key(vna):
+    """The sweep configuration a calibration is valid for.
+
+    Args:
+        vna (RSVNAControl): The controller (after `setup`).
+
+    Returns:
+        dict: Number of ports, frequency range, points, IF bandwidth and
+        segments (JSON serializable).
+    """
+    # normalized types, 1000 and 1000. must give the same id
+    key = {'ports': int(vna._num_channels),
+           'if_bandwidth': _float(vna.if_bandwidth)}
+    if vna.segments:
+        key['segments'] = [seg.to_dict() for seg in vna.segments]
+    else:
+        key.update(freq_min=round(float(vna.freq_min), 9),
+                   freq_max=round(float(vna.freq_max), 9),
+                   points=int(vna.freq_points))
+    return key
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def _key_id(key):
+    return hashlib.sha1(json.dumps(key, sort_keys=True).encode()).hexdigest()
+
+
+class CalibrationRegistry(object):
+    """Keeps track of the calibrations stored on the instrument.
+
+    Every calibration saved by `RSVNAControl.ensure_calibration` is recorded
+    with the sweep configuration it was made for (see `calibration_key`) and
+    its creation time. A calibration is reused as long as it matches the
+    configuration, is younger than `max_age` and was not invalidated, so
+    that the automatic calibration only runs when there is nothing to load.
+
+    Args:
+        path (str, optional): The json file of the registry. Defaults to
+            ``~/.mwscanner_calibrations.json``, ``None`` keeps it in memory.
+        max_age (float, optional): Maximum age of a usable calibration in s.
+            Defaults to one day.
+
+    Example:
+        >>> vna.calibrations = CalibrationRegistry()
+        >>> vna.setup(num_channels=8)     # loads a matching calibration
+        >>> vna.ensure_calibration()      # calibrates only if none was found
+    """
+
+    def __init__(self, path=_REGISTRY_FILE, max_age=_MAX_AGE):
+        self.path = path
+        self.max_age = max_age
+        self.entries = []
+        if path is not None and os.path.exists(path):
+            with open(path) as fid:
+                self.entries = json.load(fid)['calibrations']
+
+    def save(self):
+        """Writes the registry to `path` (if set)."""
+        if self.path is None:
+            return
+        with open(self.path, 'w') as fid:
+            json.dump({'calibrations': self.entries}, fid, indent=2)
+
+    @staticmethod
+    def file_name(key):
+        """The name of the calibration file on the instrument for `key`."""
+        return 'autoCal_{:d}chan_{:s}'.format(key['ports'], _key_id(key)[:8])
+
+    def add(self, key, calfile, created=None):
+        """Records a new calibration (and saves the registry).
+
+        Args:
+            key (dict): The configuration, see `calibration_key`.
+            calfile (str): The file on the instrument.
+            created (float, optional): Creation time (``time.time()``).
+                Defaults to ``None``, now.
+
+        Returns:
+            dict: The new entry.
+        """
+        entry = {'key': key, 'id': _key_id(key), 'file': calfile,
+                 'created': time.time() if created is None else created,
+                 'valid': True}
+        # a file is overwritten on the instrument, so is the entry
+        self.entries = [ent for ent in self.entries if ent['file'] != calfile]
+        self.entries.append(entry)
+        self.save()
+        return entry
+
+    def age(self, entry, now=None):
+        """Age of the calibration in s."""
+        return (time.time() if now is None else now) - entry['created']
+
+    def is_valid(self, entry, now=None):
+        """Checks if the calibration can still be used."""
+        return entry['valid'] and (self.max_age is None or
+                                   self.age(entry, now) <= self.max_age)
+
+    def find(self, key, now=None):
+        """Returns the newest valid calibration for `key` (``None`` if there
+        is none)."""
+        key_id = _key_id(key)
+        matches = [ent for ent in self.entries
+                   if ent['id'] == key_id and self.is_valid(ent, now)]
+        if not matches:
+            return None
+        return max(matches, key=lambda ent: ent['created'])
+
+    def invalidate(self, calfile):
+        """Marks a calibration as not usable (e.g. cables changed)."""
+        for entry in self.entries:
+            if entry['file'] == calfile:
+                entry['valid'] = False
+        self.save()
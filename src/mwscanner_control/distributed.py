@@ -0,0 +1,657 @@
+import argparse
+import functools
+import itertools
+import json
+import socket
+import socketserver
+import threading
+import time
+from concurrent.futures import Future
+
+import numpy as np
+
+from .logs import get_logger, configure_logging
+from .motor_control import MotionCancelled
+from .util import outer_ellipsoid_fit, ray_ellipse_distance, \
+    dist2coordinates
+
+_log = get_logger('distributed')
+
+_PORT = 5100
+# the nodes start a synchronized plan that many seconds after it was sent
+_PLAN_LEAD = .2
+# minimum time between two forwarded position events of one motor
+_EVENT_INTERVAL = .05
+# round trips used to estimate the clock offset of a node
+_SYNC_ROUNDS = 5
+
+# methods that move the antennas (one at a time on every node)
+_MOTION_METHODS = ('init_motors', 'set_on_head', 'move_forward',
+                   'move_backward', 'move_to_positions', 'force_forward',
+                   'force_backward', 'run_plan')
+
+
+class RemoteError(RuntimeError):
+    """Raised by :class:`RemoteMotorControl` when the call failed on the
+    node."""
+
+
+def _jsonable(value):
+    """Converts numpy values (and tuples) for ``json.dumps``."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError('Cannot serialize {!r}'.format(type(value)))
+
+
+def _dumps(message):
+    return (json.dumps(message, default=_jsonable) + '\n').encode()
+
+
+class MotorNode(object):
+    """Serves a :class:`MotorControl` over TCP.
+
+    The protocol is one JSON object per line. A request
+    ``{"id": 1, "method": "init_motors", "kwargs": {"pauses": false}}`` is
+    answered with ``{"id": 1, "result": ...}`` (or ``"error"``); the progress
+    events of the controller are sent to every client as
+    ``{"event": "position", "data": {...}}`` (the positions at most every
+    `event_interval` seconds per motor). The motion methods run one at a
+    time, ``request_cancel`` and the state queries are answered while
+    moving.
+
+    The protocol has no authentication: the node listens on this machine
+    only by default, serve on ``'0.0.0.0'`` on a trusted network only.
+
+    Args:
+        motor_control (MotorControl): The controller of the node.
+        host (str, optional): Defaults to ``'127.0.0.1'``.
+        port (int, optional): Defaults to 5100.
+        event_interval (float, optional): Defaults to 0.05.
+
+    Example:
+        >>> node = MotorNode(MotorControl(kit_address=[0x60, 0x61]))
+        >>> node.serve_forever()
+    """
+
+    def __init__(self, motor_control, host='127.0.0.1', port=_PORT,
+                 event_interval=_EVENT_INTERVAL):
+        self.motor_control = motor_control
+        self.host = host
+        self.port = port
+        self.event_interval = event_interval
+        self._server = None
+        self._clients = set()
+        self._clients_lock = threading.Lock()
+        self._motion_lock = threading.Lock()
+        self._last_event = {}
+        motor_control.progress_callback = self._on_progress
+
+    def _on_progress(self, event, data):
+        if event == 'position':
+            now = time.monotonic()
+            if now - self._last_event.get(data['motor'], 0.) < \
+                    self.event_interval:
+                return
+            self._last_event[data['motor']] = now
+        self._send_all({'event': event, 'data': data})
+
+    def _send_all(self, message):
+        line = _dumps(message)
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.send(line)
+
+    def describe(self):
+        """The antennas of the node (numbers and geometry)."""
+        mc = self.motor_control
+        return {'antennas': mc._antenna_number, 'angles': mc._angles,
+                'outer': mc._outer, 'inner': mc._inner}
+
+    def state(self):
+        """The positions of the antennas of the node."""
+        mc = self.motor_control
+        return {'positions': mc.positions, 'coordinates': mc.coordinates,
+                'head_positions': mc.head_positions,
+                'trusted': mc.positions_trusted()}
+
+    def run_plan(self, targets, start_at=None):
+        """Moves to `targets` (motor index -> position) at `start_at`
+        (``time.time()`` of the node, ``None`` to start now)."""
+        targets = {int(motor): pos for motor, pos in targets.items()}
+        if start_at is not None:
+            wait = start_at - time.time()
+            if wait > 0.:
+                time.sleep(wait)
+            elif wait < -_PLAN_LEAD:
+                _log.warning('Plan started %.3f s late', -wait)
+        self.motor_control.move_to_positions(targets)
+        return self.state()
+
+    def _dispatch(self, method, args, kwargs):
+        mc = self.motor_control
+        if method == 'clock':
+            return time.time()
+        if method in ('describe', 'state', 'run_plan'):
+            func = getattr(self, method)
+        elif method in _MOTION_METHODS + ('request_cancel', 'release_all',
+                                          'positions_trusted'):
+            func = getattr(mc, method)
+        else:
+            raise ValueError('Unknown method ' + str(method))
+
+        if method not in _MOTION_METHODS:
+            return func(*args, **kwargs)
+        if not self._motion_lock.acquire(blocking=False):
+            raise RuntimeError('Node is busy')
+        try:
+            result = func(*args, **kwargs)
+        finally:
+            self._motion_lock.release()
+        return self.state() if result is None else result
+
+    def _handle(self, client, request):
+        reply = {'id': request.get('id')}
+        try:
+            reply['result'] = self._dispatch(request['method'],
+                                             request.get('args', []),
+                                             request.get('kwargs', {}))
+        except (Exception, SystemExit) as exc:
+            _log.warning('%s failed: %r', request.get('method'), exc)
+            reply['error'] = type(exc).__name__
+            reply['message'] = str(exc)
+        try:
+            line = _dumps(reply)
+        except (TypeError, ValueError) as exc:
+            _log.warning('Cannot send the result of %s: %r',
+                         request.get('method'), exc)
+            line = _dumps({'id': reply['id'], 'error': type(exc).__name__,
+                           'message': 'Cannot send the result: ' + str(exc)})
+        client.send(line)
+
+    def start(self):
+        """Starts serving in a background thread."""
+        node = self
+
+        class Client(socketserver.StreamRequestHandler):
+
+            def setup(self):
+                super().setup()
+                self._lock = threading.Lock()
+                with node._clients_lock:
+                    node._clients.add(self)
+
+            def send(self, line):
+                with self._lock:
+                    try:
+                        self.wfile.write(line)
+                        self.wfile.flush()
+                    except OSError:
+                        pass
+
+            def handle(self):
+                for line in self.rfile:
+                    if not line.strip():
+                        continue
+                    try:
+                        request = json.loads(line)
+                        if not isinstance(request, dict):
+                            raise ValueError('expecting a JSON object')
+                    except ValueError as exc:
+                        _log.warning('Invalid request: %s', exc)
+                        self.send(_dumps({'id': None, 'error': 'ValueError',
+                                          'message': 'Invalid request: ' +
+                                                     str(exc)}))
+                        continue
+                    threading.Thread(target=node._handle,
+                                     args=(self, request),
+                                     daemon=True).start()
+
+            def finish(self):
+                with node._clients_lock:
+                    node._clients.discard(self)
+                super().finish()
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self._server = socketserver.ThreadingTCPServer((self.host, self.port),
+                                                       Client)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name='node',
+                         daemon=True).start()
+        _log.info('Motor node listening on %s:%d', self.host, self.port)
+
+    def serve_forever(self):
+        """Starts serving and blocks until interrupted."""
+        self.start()
+        try:
+            while True:
+                time.sleep(1.)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Stops the server."""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class RemoteMotorControl(object):
+    """Client of a :class:`MotorNode`.
+
+    The motion methods have the signatures of :class:`MotorControl` and
+    block until the node is done; `call_async` returns a future instead. The
+    progress events of the node are passed to `progress_callback` (from the
+    reader thread).
+
+    Args:
+        host (str): The address of the node.
+        port (int, optional): Defaults to 5100.
+        timeout (float, optional): Timeout of the calls in s. Defaults to
+            ``None``, wait forever.
+    """
+
+    def __init__(self, host, port=_PORT, timeout=None):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.progress_callback = None
+        self._sock = socket.create_connection((host, port), timeout=10.)
+        self._sock.settimeout(None)
+        self._rfile = self._sock.makefile('rb')
+        self._ids = itertools.count()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._reader = threading.Thread(target=self._read_loop,
+                                        name='node-' + str(host), daemon=True)
+        self._reader.start()
+
+    def _read_loop(self):
+        for line in self._rfile:
+            # a bad message (or a failing callback) must not stop the reader
+            try:
+                self._read_message(json.loads(line))
+            except Exception as exc:
+                _log.warning('Invalid message from %s: %r', self.host, exc)
+
+        # connection closed
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            future.set_exception(ConnectionError('Node closed the '
+                                                 'connection'))
+
+    def _read_message(self, message):
+        if 'event' in message:
+            if self.progress_callback is not None:
+                self.progress_callback(message['event'], message['data'])
+            return
+        with self._lock:
+            future = self._pending.pop(message['id'], None)
+        if future is None:
+            return
+        if 'error' not in message:
+            future.set_result(message['result'])
+        elif message['error'] == 'MotionCancelled':
+            future.set_exception(MotionCancelled(message['message']))
+        else:
+            future.set_exception(RemoteError('{:s}: {:s}'.format(
+                message['error'], message['message'])))
+
+    def call_async(self, method, *args, **kwargs):
+        """Sends a request to the node.
+
+        Returns:
+            concurrent.futures.Future: The result of the call.
+        """
+        future = Future()
+        with self._lock:
+            ident = next(self._ids)
+            self._pending[ident] = future
+            self._sock.sendall(_dumps({'id': ident, 'method': method,
+                                       'args': args, 'kwargs': kwargs}))
+        return future
+
+    def call(self, method, *args, **kwargs):
+        """Calls a method on the node and waits for the result."""
+        return self.call_async(method, *args, **kwargs).result(self.timeout)
+
+    def close(self):
+        """Closes the connection."""
+        self._sock.close()
+
+    def describe(self):
+        return self.call('describe')
+
+    def state(self):
+        return self.call('state')
+
+    @property
+    def positions(self):
+        return self.state()['positions']
+
+    @property
+    def coordinates(self):
+        return self.state()['coordinates']
+
+    def positions_trusted(self):
+        return self.call('positions_trusted')
+
+    def init_motors(self, pauses=False, plot_pin=False):
+        return self.call('init_motors', pauses=pauses)
+
+    def set_on_head(self, pauses=False, plot_pin=False, prediction=None,
+                    rehome=None):
+        return self.call('set_on_head', pauses=pauses, prediction=prediction,
+                         rehome=rehome)
+
+    def move_forward(self, motor, distance, pauses=False, plot_pin=False):
+        return self.call('move_forward', motor, distance, pauses=pauses)
+
+    def move_backward(self, motor, distance, pauses=False, plot_pin=False):
+        return self.call('move_backward', motor, distance, pauses=pauses)
+
+    def move_to_positions(self, targets, pauses=False):
+        if not isinstance(targets, dict):
+            targets = dict(enumerate(targets))
+        targets = {str(motor): pos for motor, pos in targets.items()}
+        return self.call('run_plan', targets, None)
+
+    def request_cancel(self):
+        return self.call('request_cancel')
+
+    def release_all(self):
+        return self.call('release_all')
+
+
+def _node_address(node):
+    if isinstance(node, str):
+        host, _, port = node.partition(':')
+        return host, int(port) if port else _PORT
+    return tuple(node)
+
+
+class MotorCoordinator(object):
+    """One logical motor controller over several :class:`MotorNode`.
+
+    The antennas of all nodes are numbered (motor index) in the order of
+    the nodes. Homing and head search run on all nodes at the same time.
+    Moves are split by node and started at the same time (the clock offset
+    of every node is estimated from a few round trips), shape creation
+    computes the targets from the gathered positions of all antennas.
+
+    Args:
+        nodes (list): :class:`RemoteMotorControl` objects, ``(host, port)``
+            tuples or ``'host:port'`` strings.
+        lead (float, optional): Delay between sending and starting a
+            synchronized plan in s. Defaults to 0.2.
+
+    Example:
+        >>> coord = MotorCoordinator(['pi-a:5100', 'pi-b:5100'])
+        >>> coord.init_motors()
+        >>> coord.create_circle(distance_from_head=2)
+    """
+
+    def __init__(self, nodes, lead=_PLAN_LEAD):
+        self.lead = lead
+        self.progress_callback = None
+        self.nodes = [node if isinstance(node, RemoteMotorControl) else
+                      RemoteMotorControl(*_node_address(node))
+                      for node in nodes]
+
+        # (node, local motor index) of every motor and its geometry
+        self._motors = []
+        self._antenna_number = []
+        self._angles = []
+        self._outer = []
+        self._inner = []
+        self._first = []
+        for ino, node in enumerate(self.nodes):
+            info = node.describe()
+            self._first.append(len(self._motors))
+            self._motors.extend((ino, im)
+                                for im in range(len(info['antennas'])))
+            self._antenna_number.extend(info['antennas'])
+            self._angles.extend(info['angles'])
+            self._outer.extend(info['outer'])
+            self._inner.extend(info['inner'])
+            node.progress_callback = functools.partial(self._on_progress, ino)
+
+        self._offsets = [0.] * len(self.nodes)
+        self.sync_clocks()
+
+    def __len__(self):
+        return len(self._motors)
+
+    def _on_progress(self, node, event, data):
+        if self.progress_callback is None:
+            return
+        if 'motor' in data:
+            data = dict(data, motor=self._first[node] + data['motor'])
+        self.progress_callback(event, data)
+
+    def sync_clocks(self):
+        """Estimates the clock offset of every node (from the round trip
+        with the smallest delay)."""
+        for ino, node in enumerate(self.nodes):
+            best = None
+            for _ in range(_SYNC_ROUNDS):
+                start = time.time()
+                remote = node.call('clock')
+                end = time.time()
+                if best is None or end - start < best[0]:
+                    best = (end - start, remote - (start + end) / 2.)
+            self._offsets[ino] = best[1]
+            _log.debug('Node %d: offset %.4f s, round trip %.4f s', ino,
+                       best[1], best[0])
+
+    def _broadcast(self, method, node_args=None, **kwargs):
+        """Calls `method` on all nodes at the same time and waits for all.
+
+        Args:
+            method (str): The method.
+            node_args (list, optional): The positional arguments of every
+                node (``None`` to skip a node). Defaults to no arguments.
+            **kwargs: Keyword arguments for all nodes.
+
+        Returns:
+            list: The result of every node.
+        """
+        if node_args is None:
+            node_args = [()] * len(self.nodes)
+        futures = [None if args is None else
+                   node.call_async(method, *args, **kwargs)
+                   for node, args in zip(self.nodes, node_args)]
+        results, error = [], None
+        for future in futures:
+            try:
+                results.append(None if future is None else future.result())
+            except Exception as exc:
+                results.append(None)
+                error = error or exc
+        if error is not None:
+            raise error
+        return results
+
+    def _gather(self, key):
+        states = self._broadcast('state')
+        return [val for state in states for val in state[key]]
+
+    @property
+    def positions(self):
+        """Positions of all antennas (distance from the center in mm)."""
+        return self._gather('positions')
+
+    @property
+    def coordinates(self):
+        """Coordinates of all antennas."""
+        return self._gather('coordinates')
+
+    @property
+    def head_positions(self):
+        """Head positions of the last `set_on_head` of all antennas."""
+        return self._gather('head_positions')
+
+    def positions_trusted(self):
+        return all(self._broadcast('positions_trusted'))
+
+    def get_angle(self, motor_num):
+        return self._angles[motor_num]
+
+    def _split(self, values):
+        """Splits a list (or dict) by motor index into one dict per node."""
+        if not isinstance(values, dict):
+            values = dict(enumerate(values))
+        split = [{} for _ in self.nodes]
+        for motor, val in values.items():
+            if val is not None:
+                ino, im = self._motors[motor]
+                split[ino][str(im)] = val
+        return split
+
+    def request_cancel(self):
+        """Asks all nodes to stop."""
+        self._broadcast('request_cancel')
+
+    def release_all(self):
+        self._broadcast('release_all')
+
+    def close(self):
+        for node in self.nodes:
+            node.close()
+
+    def init_motors(self, pauses=False, plot_pin=False):
+        """Homes the antennas of all nodes at the same time."""
+        self._broadcast('init_motors', pauses=False)
+
+    def set_on_head(self, pauses=False, plot_pin=False, prediction=None,
+                    rehome=None):
+        """Finds the head with the antennas of all nodes at the same time.
+
+        Args:
+            prediction (str, list or tuple, optional): As in
+                `MotorControl.set_on_head`, the positions and the ellipse
+                are split by node.
+        """
+        if isinstance(prediction, tuple) and len(prediction) == 2:
+            dist = ray_ellipse_distance(prediction[0], prediction[1],
+                                        self._angles)
+            prediction = [None if np.isnan(val) else float(val)
+                          for val in dist]
+        if prediction is None or isinstance(prediction, str):
+            node_pred = [prediction] * len(self.nodes)
+        else:
+            node_pred = []
+            for ino, node_vals in enumerate(self._split(prediction)):
+                num = sum(1 for motor in self._motors if motor[0] == ino)
+                node_pred.append([node_vals.get(str(im))
+                                  for im in range(num)])
+        futures = [node.call_async('set_on_head', pauses=False,
+                                   prediction=pred, rehome=rehome)
+                   for node, pred in zip(self.nodes, node_pred)]
+        for future in futures:
+            future.result()
+
+    def move_to_positions(self, targets, pauses=False):
+        """Moves the antennas to `targets`, starting all nodes at the same
+        time.
+
+        Args:
+            targets (list or dict): As in `MotorControl.move_to_positions`,
+                with the motor indices of the coordinator.
+        """
+        start_at = time.time() + self.lead
+        plans = self._split(targets)
+        self._broadcast('run_plan',
+                        [(plan, start_at + offset) if plan else None
+                         for plan, offset in zip(plans, self._offsets)])
+
+    def move_forward(self, motor, distance, pauses=False, plot_pin=False):
+        """As `MotorControl.move_forward` (motor 100 moves all antennas)."""
+        if motor == 100:
+            self.move_to_positions([pos - distance
+                                    for pos in self.positions])
+            return
+        ino, im = self._motors[motor]
+        self.nodes[ino].move_forward(im, distance)
+
+    def move_backward(self, motor, distance, pauses=False, plot_pin=False):
+        """As `MotorControl.move_backward` (motor 100 moves all antennas)."""
+        if motor == 100:
+            self.move_to_positions([pos + distance
+                                    for pos in self.positions])
+            return
+        ino, im = self._motors[motor]
+        self.nodes[ino].move_backward(im, distance)
+
+    def create_circle(self, distance_from_head=1, pauses=False):
+        """As `MotorControl.create_circle`, over the antennas of all nodes.
+        """
+        self.set_on_head()
+        positions = self.positions
+        target = max(positions) + distance_from_head
+        if max(positions) > min(self._outer):
+            _log.warning('CANNOT CREATE CIRCLE, Antenna %d is further than '
+                         'some antennas can possible reach',
+                         int(np.argmax(positions)))
+            return
+        self.move_to_positions([min(target, min(self._outer))] * len(self))
+
+    def create_ellipse(self, distance_from_head=1, pauses=False, plot=False):
+        """As `MotorControl.create_ellipse`, over the antennas of all nodes.
+        """
+        self.set_on_head()
+        self.move_backward(100, distance_from_head)
+        positions = self.positions
+        points = np.array([dist2coordinates(pos, angle)
+                           for pos, angle in zip(positions, self._angles)])
+        a_matrix, centroid = outer_ellipsoid_fit(points)
+        if self.progress_callback is not None:
+            self.progress_callback('ellipse', {'matrix': a_matrix,
+                                               'centroid': centroid})
+
+        dist = ray_ellipse_distance(a_matrix, centroid, self._angles)
+        targets = []
+        for motor, pos in enumerate(positions):
+            if np.isnan(dist[motor]):
+                raise RuntimeError('Antenna {:d} does not cross the '
+                                   'ellipse'.format(motor))
+            targets.append(min(max(float(dist[motor]), pos),
+                               self._outer[motor]))
+        self.move_to_positions(targets)
+
+
+def main(argv=None):
+    """Runs a motor node: ``python -m mwscanner_control.distributed``."""
+    from .motor_control import MotorControl
+    from .layout import AntennaLayout
+
+    parser = argparse.ArgumentParser(description='Serve the motors of this '
+                                                 'Raspberry Pi over TCP')
+    parser.add_argument('--host', default='127.0.0.1',
+                        help='0.0.0.0 to serve the network (no '
+                             'authentication, trusted networks only)')
+    parser.add_argument('--port', type=int, default=_PORT)
+    parser.add_argument('--layout', help='antenna layout (json)')
+    parser.add_argument('--hats', help='addresses of the hats of this node, '
+                                       'e.g. 0x60,0x61')
+    args = parser.parse_args(argv)
+    # the progress of the node on stderr
+    configure_logging()
+
+    layout = None if args.layout is None else \
+        AntennaLayout.from_file(args.layout)
+    kit_address = None if args.hats is None else \
+        [int(add, 0) for add in args.hats.split(',')]
+    MotorNode(MotorControl(kit_address=kit_address, layout=layout),
+              host=args.host, port=args.port).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,160 @@
+from time import perf_counter_ns
+
+# histograms use power of 2 buckets of nanoseconds (bucket k: < 2**k ns)
+_NUM_BUCKETS = 64
+
+_COUNTERS = ('steps', 'switch_reads', 'switch_presses', 'release_cycles',
+             'release_steps', 'bounces')
+
+
+class MotionStats(object):
+    """Low-overhead counters and latency histograms of the motion hot path.
+
+    The statistics are kept per motor (the index in the list of steppers of
+    :class:`MotorControl`). Every recording method should only be called
+    after checking `enabled`, so that a disabled instance costs a single
+    attribute lookup per step.
+
+    Attributes:
+        enabled (bool): Whether the motion code records statistics. Default
+            is ``False``.
+
+    Args:
+        num_motors (int): Number of motors.
+        labels (list, optional): Label of every motor in the snapshot, e.g.
+            the antenna numbers. Defaults to the motor indices.
+        enabled (bool, optional): Defaults to ``False``.
+
+    Example:
+        >>> stats = MotionStats(8, enabled=True)
+        >>> t0 = stats.start_phase()
+        >>> stats.record_step(0, 1200)
+        >>> stats.end_phase('forward', 0, t0)
+        >>> stats.snapshot()['motors'][0]['steps']
+        1
+    """
+
+    def __init__(self, num_motors, labels=None, enabled=False):
+        self.enabled = enabled
+        self._num_motors = num_motors
+        self._labels = list(range(num_motors)) if labels is None else labels
+        self.reset()
+
+    def reset(self):
+        """Clears all counters, histograms and phase timings."""
+        self._counters = {name: [0] * self._num_motors
+                          for name in _COUNTERS}
+        self._onestep_ns = [[0] * _NUM_BUCKETS
+                            for _ in range(self._num_motors)]
+        self._gpio_ns = [[0] * _NUM_BUCKETS for _ in range(self._num_motors)]
+        self._onestep_total = [0] * self._num_motors
+        self._gpio_total = [0] * self._num_motors
+        self._phases = {}
+
+    def record_step(self, motor, nsec):
+        """Records one motor step and its (`onestep`) latency in ns."""
+        self._counters['steps'][motor] += 1
+        self._onestep_total[motor] += nsec
+        self._onestep_ns[motor][nsec.bit_length()] += 1
+
+    def record_gpio(self, motor, nsec):
+        """Records one read of the switch and its latency in ns."""
+        self._counters['switch_reads'][motor] += 1
+        self._gpio_total[motor] += nsec
+        self._gpio_ns[motor][nsec.bit_length()] += 1
+
+    def count(self, motor, name, num=1):
+        """Increments one of the counters (e.g. ``'switch_presses'``)."""
+        self._counters[name][motor] += num
+
+    def start_phase(self):
+        """Returns the start time for :meth:`end_phase` (0 if disabled)."""
+        return perf_counter_ns() if self.enabled else 0
+
+    def end_phase(self, name, motor, start):
+        """Adds the time since `start` to the phase `name` of `motor`."""
+        if not self.enabled:
+            return
+        phase = self._phases.setdefault(name, {})
+        count, total = phase.get(motor, (0, 0))
+        phase[motor] = (count + 1, total + perf_counter_ns() - start)
+
+    @staticmethod
+    def _histogram(buckets, total):
+        count = sum(buckets)
+        nonzero = {2 ** ik: num for ik, num in enumerate(buckets) if num}
+        return {'count': count,
+                'total_ns': total,
+                'mean_ns': total / count if count else 0.,
+                'buckets': nonzero}
+
+    def snapshot(self):
+        """Returns a copy of the statistics as a (JSON serializable) dict.
+
+        Returns:
+            dict: With the keys ``'motors'`` (list with the counters and the
+            ``onestep_ns``/``gpio_ns`` histograms of every motor; the keys of
+            the buckets are the exclusive upper bounds in ns) and
+            ``'phases'`` (time in each phase per motor label).
+        """
+        motors = []
+        for im in range(self._num_motors):
+            data = {'label': self._labels[im]}
+            for name in _COUNTERS:
+                data[name] = self._counters[name][im]
+            data['onestep_ns'] = self._histogram(self._onestep_ns[im],
+                                                 self._onestep_total[im])
+            data['gpio_ns'] = self._histogram(self._gpio_ns[im],
+                                              self._gpio_total[im])
+            motors.append(data)
+
+        phases = {}
+        for name, phase in self._phases.items():
+            phases[name] = {self._labels[im]: {'count': count,
+                                               'total_ns': total}
+                            for im, (count, total) in phase.items()}
+        return {'motors': motors, 'phases': phases}
+
+
+class VNAStats(object):
+    """Counters of the VNA acquisition.
+
+    A measurement takes (at least) a full sweep, so these counters are always
+    updated by :class:`RSVNAControl`.
+
+    Attributes:
+        sweeps (int): Number of completed sweeps.
+        measure_count (int): Number of calls of ``measure``.
+        measure_seconds (float): Total time spent in ``measure``.
+        measure_max (float): Slowest ``measure`` in seconds.
+        bytes_received (int): Bytes of the transferred traces.
+        visa_errors (int): Number of VISA errors raised by the controller.
+        reconnects (int): Number of reconnects after a lost session (a
+            session lost during a sweep and recovered by the reconnect is
+            not a VISA error).
+    """
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Clears all counters."""
+        self.sweeps = 0
+        self.measure_count = 0
+        self.measure_seconds = 0.
+        self.measure_max = 0.
+        self.bytes_received = 0
+        self.visa_errors = 0
+        self.reconnects = 0
+
+    def record_measure(self, seconds, nbytes, sweeps=1):
+        """Records one (successful) call of ``measure``."""
+        self.sweeps += sweeps
+        self.measure_count += 1
+        self.measure_seconds += seconds
+        self.measure_max = max(self.measure_max, seconds)
+        self.bytes_received += nbytes
+
+    def snapshot(self):
+        """Returns a copy of the counters as a dict."""
+        return dict(vars(self))
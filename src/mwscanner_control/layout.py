@@ -0,0 +1,221 @@
+import json
+
+import numpy as np
+
+# DEFAULT LAYOUT: 8 antennas on 4 hats #
+
+# Max distance the motor can cover with the current hardware (in mm)
+# Antenna = [0, 1, 2, 3, 4, 5, 6, 7]
+_DRIVERS_MAX = [40, 40, 40, 40, 40, 40, 40, 40]
+
+# !!!!!!!!! THE FOLLOWING MEASUREMENTS MUST BE ACCURATE !!!!!!!!! #
+
+# Distance of each pair of antennas (in mm) in close position
+
+# Antenna = [0, 1, 2, 3,
+#            4, 5, 6, 7]
+
+# 0-4: 139
+# INN_DIST04 = 139
+#
+# # 1-5: 122
+# INN_DIST15 = 122
+#
+# # 2-6: 122
+# INN_DIST26 = 122
+#
+# # 3-7: 120
+# INN_DIST37 = 120
+#
+# # Distance of each antenna from the center (in mm) in close position
+# INNER_DIST = [INN_DIST04/2, INN_DIST15/2, INN_DIST26/2, INN_DIST37/2,
+#               INN_DIST04/2, INN_DIST15/2, INN_DIST26/2, INN_DIST37/2]
+
+# Distance of each pair of antennas (in mm) in home position
+
+# Antenna = [0, 1, 2, 3,
+#            4, 5, 6, 7]
+
+# 0-4 : 221
+_OUT_DIST04 = 221
+
+# 1-5: 204
+_OUT_DIST15 = 204
+
+# 2-6: 204
+_OUT_DIST26 = 204
+
+# 3-7: 200
+_OUT_DIST37 = 200
+
+# Distance of each antenna from the center (in mm) in home position
+_OUTER_DIST = [_OUT_DIST04 / 2, _OUT_DIST15 / 2, _OUT_DIST26 / 2, _OUT_DIST37
+               / 2, _OUT_DIST04 / 2, _OUT_DIST15 / 2, _OUT_DIST26 / 2,
+               _OUT_DIST37 / 2]
+
+# Angle of each antenna (in degrees)
+# Antenna = [0, 1, 2, 3, 4, 5, 6, 7]
+_ANGLES = [90, 45, 0, 315, 270, 225, 180, 135]
+
+# I2C addresses of the hats, each hat drives two antennas (stepper1 and
+# stepper2)
+_HAT_ADDRESSES = [0x60, 0x61, 0x62, 0x63]
+
+
+def _address(value):
+    """Accepts addresses as int or as (hex) string, e.g. ``'0x60'``."""
+    return int(value, 0) if isinstance(value, str) else int(value)
+
+
+class AntennaLayout(object):
+    """Geometry and wiring of the antennas of a scanner.
+
+    The antenna numbers are the indices in the lists. The layout is compiled
+    into arrays (indexed by antenna number) and a lookup table from the
+    (hat address, stepper) pair to the antenna number, which are used by
+    :class:`MotorControl` for all the motion and geometry.
+
+    Args:
+        angles (list): Angle of every antenna in degrees.
+        outer_dist (list): Distance of every antenna from the center in home
+            position (in mm).
+        travel (list or float): Max distance every motor can cover (in mm).
+        addresses (list): I2C address of the hat of every antenna.
+        steppers (list): Stepper of every antenna on its hat (0 for
+            ``stepper1``, 1 for ``stepper2``).
+
+    Attributes:
+        angles (numpy.ndarray): Angles in degrees.
+        outer (numpy.ndarray): Distances from the center in home position.
+        inner (numpy.ndarray): Closest allowed distances from the center.
+        travel (numpy.ndarray): Travel of the motors.
+        directions (numpy.ndarray): Unit vectors of the antennas (N x 2).
+        hats (list): The addresses of the hats, sorted.
+
+    Example:
+        >>> layout = AntennaLayout.regular(16, outer_dist=110.,
+        ...                                addresses=range(0x60, 0x68))
+        >>> obj = MotorControl(layout=layout)
+    """
+
+    def __init__(self, angles, outer_dist, travel, addresses, steppers):
+        num = len(angles)
+        if np.isscalar(travel):
+            travel = [travel] * num
+        for name, val in (('outer_dist', outer_dist), ('travel', travel),
+                          ('addresses', addresses), ('steppers', steppers)):
+            if len(val) != num:
+                msg = 'Expecting {:d} values of {:s}, got {:d}'
+                raise ValueError(msg.format(num, name, len(val)))
+
+        self.angles = np.asarray(angles, dtype=float)
+        self.outer = np.asarray(outer_dist, dtype=float)
+        self.travel = np.asarray(travel, dtype=float)
+        self.inner = self.outer - self.travel
+        theta = np.radians(self.angles)
+        self.directions = np.stack((np.cos(theta), np.sin(theta)), axis=-1)
+
+        self.addresses = [_address(add) for add in addresses]
+        self.steppers = [int(stp) for stp in steppers]
+        self.hats = sorted(set(self.addresses))
+        self._numbers = {}
+        for number, key in enumerate(zip(self.addresses, self.steppers)):
+            if key in self._numbers:
+                msg = 'Antennas {:d} and {:d} use the same stepper ' \
+                      '({:#x}, {:d})'
+                raise ValueError(msg.format(self._numbers[key], number,
+                                            *key))
+            self._numbers[key] = number
+
+    def __len__(self):
+        return len(self.angles)
+
+    @classmethod
+    def default(cls):
+        """The layout of the 8 antenna scanner (4 hats at 0x60-0x63)."""
+        return cls(angles=_ANGLES, outer_dist=_OUTER_DIST,
+                   travel=_DRIVERS_MAX,
+                   addresses=[add for add in _HAT_ADDRESSES for _ in (0, 1)],
+                   steppers=[0, 1] * len(_HAT_ADDRESSES))
+
+    @classmethod
+    def regular(cls, num, outer_dist, travel=40., addresses=None,
+                start_angle=90.):
+        """Antennas evenly spaced clockwise (as in the default layout).
+
+        Args:
+            num (int): Number of antennas.
+            outer_dist (float or list): Distance from the center in home
+                position (in mm).
+            travel (float or list, optional): Travel of the motors in mm.
+                Defaults to 40.
+            addresses (list, optional): The addresses of the hats, two
+                antennas per hat. Defaults to ``None``, from 0x60 on.
+            start_angle (float, optional): Angle of antenna 0 in degrees.
+                Defaults to 90.
+
+        Returns:
+            AntennaLayout: The layout.
+        """
+        if addresses is None:
+            addresses = range(0x60, 0x60 + (num + 1) // 2)
+        addresses = list(addresses)
+        if 2 * len(addresses) < num:
+            msg = '{:d} hats cannot drive {:d} antennas'
+            raise ValueError(msg.format(len(addresses), num))
+        if np.isscalar(outer_dist):
+            outer_dist = [outer_dist] * num
+        angles = [(start_angle - 360. * ia / num) % 360. for ia in range(num)]
+        return cls(angles=angles, outer_dist=outer_dist, travel=travel,
+                   addresses=[addresses[ia // 2] for ia in range(num)],
+                   steppers=[ia % 2 for ia in range(num)])
+
+    @classmethod
+    def from_dict(cls, config):
+        """Creates the layout from a dict with an ``'antennas'`` list.
+
+        Every antenna is a dict with the keys ``'angle'``, ``'outer_dist'``,
+        ``'travel'``, ``'address'`` and ``'stepper'`` (see `to_dict`).
+        """
+        antennas = config['antennas']
+        return cls(angles=[ant['angle'] for ant in antennas],
+                   outer_dist=[ant['outer_dist'] for ant in antennas],
+                   travel=[ant['travel'] for ant in antennas],
+                   addresses=[ant['address'] for ant in antennas],
+                   steppers=[ant['stepper'] for ant in antennas])
+
+    def to_dict(self):
+        """Returns the layout as a (JSON serializable) dict."""
+        return {'antennas': [{'angle': float(self.angles[ia]),
+                              'outer_dist': float(self.outer[ia]),
+                              'travel': float(self.travel[ia]),
+                              'address': '{:#x}'.format(self.addresses[ia]),
+                              'stepper': self.steppers[ia]}
+                             for ia in range(len(self))]}
+
+    @classmethod
+    def from_file(cls, path):
+        """Loads a layout saved by `to_file` (json)."""
+        with open(path) as fid:
+            return cls.from_dict(json.load(fid))
+
+    def to_file(self, path):
+        """Saves the layout to a json file."""
+        with open(path, 'w') as fid:
+            json.dump(self.to_dict(), fid, indent=2)
+
+    def antenna_number(self, address, stepper):
+        """Returns the antenna driven by a stepper.
+
+        Args:
+            address (int): The address of the hat.
+            stepper (int): 0 for ``stepper1``, 1 for ``stepper2``.
+
+        Returns:
+            int: The antenna number.
+        """
+        try:
+            return self._numbers[(_address(address), stepper)]
+        except KeyError:
+            msg = 'No antenna on stepper {:d} of the hat {:#x}'
+            raise ValueError(msg.format(stepper, _address(address)))
@@ -0,0 +1,162 @@
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+
+_LOGGER_NAME = 'mwscanner_control'
+
+# extra arguments for the log records of the (frequent) motion events
+SWITCH = {'category': 'switch'}
+BOUNCE = {'category': 'bounce'}
+
+_listener = None
+_level = logging.INFO
+
+
+def get_logger(name=None):
+    """Returns the logger of the package (or one of its children).
+
+    Args:
+        name (str, optional): Name of the child logger, e.g. ``'motor'``.
+            Defaults to ``None``, the package logger.
+
+    Returns:
+        logging.Logger: The requested logger.
+
+    Example:
+        >>> log = get_logger('motor')
+        >>> log.name
+        'mwscanner_control.motor'
+    """
+    if name is None:
+        return logging.getLogger(_LOGGER_NAME)
+    return logging.getLogger(_LOGGER_NAME + '.' + name)
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most one record per category every `interval` seconds.
+
+    The category is read from the ``category`` attribute of the record (pass
+    ``extra={'category': ...}`` when logging). Records without category are
+    never dropped. The number of suppressed records is appended to the next
+    record of the same category that is let through.
+
+    Args:
+        interval (float, optional): Minimum time between two records of the
+            same category in seconds. Defaults to 1.
+    """
+
+    def __init__(self, interval=1.):
+        super().__init__()
+        self.interval = interval
+        self._state = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        category = getattr(record, 'category', None)
+        if category is None:
+            return True
+
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._state.get(category, (None, 0))
+            if last is not None and now - last < self.interval:
+                self._state[category] = (last, suppressed + 1)
+                return False
+            self._state[category] = (now, 0)
+
+        if suppressed:
+            record.msg = '{:s} [{:d} similar suppressed]'.format(
+                record.getMessage(), suppressed)
+            record.args = None
+        return True
+
+
+def configure_logging(level=logging.INFO, handler=None, use_queue=False,
+                      rate_interval=1., fmt='%(message)s',
+                      capture_warnings=False):
+    """Configures the logging output of the package.
+
+    The library only emits log records, so the console output is enabled by
+    calling this function (or by configuring the ``mwscanner_control``
+    logger directly).
+
+    Args:
+        level (int, optional): Logging level. Defaults to ``logging.INFO``.
+        handler (logging.Handler, optional): Where to send the records.
+            Defaults to ``None``, i.e. a ``StreamHandler`` (stderr).
+        use_queue (bool, optional): If ``True``, the records are passed
+            through a queue and `handler` runs in a background thread, so
+            that the (slow) terminal I/O does not happen in the motion
+            thread. Defaults to ``False``.
+        rate_interval (float, optional): Interval for the `RateLimitFilter`
+            in seconds. Set to ``None`` to disable rate limiting. Defaults to
+            1.
+        fmt (str, optional): Format of the records. Defaults to
+            ``'%(message)s'``.
+        capture_warnings (bool, optional): Route the Python warnings (of
+            the whole process) to `handler` as well, see
+            ``logging.captureWarnings``. Defaults to ``False``.
+
+    Returns:
+        logging.Logger: The package logger.
+
+    Example:
+        >>> log = configure_logging(level=logging.DEBUG, use_queue=True)
+    """
+    global _listener, _level
+
+    stop_logging()
+    logger = get_logger()
+
+    if handler is None:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter(fmt))
+
+    # filter before the queue, so that dropped records are never enqueued
+    if use_queue:
+        log_queue = queue.SimpleQueue()
+        _listener = logging.handlers.QueueListener(log_queue, handler,
+                                                   respect_handler_level=True)
+        _listener.start()
+        handler = logging.handlers.QueueHandler(log_queue)
+    if rate_interval is not None:
+        handler.addFilter(RateLimitFilter(rate_interval))
+
+    for hdl in list(logger.handlers):
+        logger.removeHandler(hdl)
+    logger.addHandler(handler)
+    logger.setLevel(level)
+    logger.propagate = False
+    _level = level
+
+    if capture_warnings:
+        logging.captureWarnings(True)
+        warn_logger = logging.getLogger('py.warnings')
+        for hdl in list(warn_logger.handlers):
+            warn_logger.removeHandler(hdl)
+        warn_logger.addHandler(handler)
+
+    return logger
+
+
+def set_quiet(quiet=True):
+    """Only let warnings and errors through (or restore the level given to
+    `configure_logging`, INFO by default).
+
+    In quiet mode the motion events cost only a level check per step.
+
+    Args:
+        quiet (bool, optional): Defaults to ``True``.
+    """
+    get_logger().setLevel(logging.WARNING if quiet else _level)
+
+
+def stop_logging():
+    """Stops the background thread started by ``configure_logging(
+    use_queue=True)``, flushing the pending records."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,183 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# phases of MotorControl that move the antennas (the release phase is
+# nested in these)
+_MOVE_PHASES = ('homing', 'head', 'forward', 'backward', 'move', 'tuning')
+
+
+def _format_sample(name, labels, value):
+    if not labels:
+        return '{:s} {!r}'.format(name, value)
+    lbl = ','.join('{:s}="{}"'.format(key, val) for key, val in labels.items())
+    return '{:s}{{{:s}}} {!r}'.format(name, lbl, value)
+
+
+def _format_metric(lines, name, mtype, helptext, samples):
+    """Appends one metric in the Prometheus text format to `lines`."""
+    lines.append('# HELP {:s} {:s}'.format(name, helptext))
+    lines.append('# TYPE {:s} {:s}'.format(name, mtype))
+    for labels, value in samples:
+        lines.append(_format_sample(name, labels, value))
+
+
+def _format_summary(lines, name, helptext, samples):
+    """Appends a summary (without quantiles) to `lines`, `samples` is a list
+    of (labels, sum, count)."""
+    lines.append('# HELP {:s} {:s}'.format(name, helptext))
+    lines.append('# TYPE {:s} summary'.format(name))
+    for labels, total, count in samples:
+        lines.append(_format_sample(name + '_sum', labels, total))
+        lines.append(_format_sample(name + '_count', labels, count))
+
+
+def motor_metrics(stats, lines):
+    """Appends the metrics of a :class:`MotionStats` snapshot to `lines`."""
+    snap = stats.snapshot()
+    phases = snap['phases']
+
+    steps, rates, presses, bounces, releases = [], [], [], [], []
+    for motor in snap['motors']:
+        label = {'antenna': motor['label']}
+        steps.append((label, motor['steps']))
+        presses.append((label, motor['switch_presses']))
+        bounces.append((label, motor['bounces']))
+        releases.append((label, motor['release_cycles']))
+        move_ns = sum(phases.get(name, {}).get(motor['label'],
+                                               {}).get('total_ns', 0)
+                      for name in _MOVE_PHASES)
+        rate = motor['steps'] * 1.e9 / move_ns if move_ns else 0.
+        rates.append((label, rate))
+
+    _format_metric(lines, 'mwscanner_motor_steps_total', 'counter',
+                   'Motor steps taken.', steps)
+    _format_metric(lines, 'mwscanner_motor_steps_per_second', 'gauge',
+                   'Average step rate while moving.', rates)
+    _format_metric(lines, 'mwscanner_switch_presses_total', 'counter',
+                   'Switch presses detected while moving.', presses)
+    _format_metric(lines, 'mwscanner_switch_bounces_total', 'counter',
+                   'Unstable switch readings.', bounces)
+    _format_metric(lines, 'mwscanner_switch_release_cycles_total', 'counter',
+                   'Moves needed to release the switch.', releases)
+
+    homing = phases.get('homing', {})
+    _format_summary(lines, 'mwscanner_homing_duration_seconds',
+                    'Time spent homing the antennas.',
+                    [({'antenna': lbl}, val['total_ns'] * 1.e-9, val['count'])
+                     for lbl, val in homing.items()])
+
+
+def vna_metrics(stats, lines):
+    """Appends the metrics of a :class:`VNAStats` object to `lines`."""
+    _format_metric(lines, 'mwscanner_vna_sweeps_total', 'counter',
+                   'Completed VNA sweeps.', [({}, stats.sweeps)])
+    _format_summary(lines, 'mwscanner_vna_measure_seconds',
+                    'Latency of RSVNAControl.measure.',
+                    [({}, stats.measure_seconds, stats.measure_count)])
+    _format_metric(lines, 'mwscanner_vna_measure_seconds_max', 'gauge',
+                   'Slowest RSVNAControl.measure.',
+                   [({}, stats.measure_max)])
+    _format_metric(lines, 'mwscanner_vna_bytes_received_total', 'counter',
+                   'Bytes received from the VNA.',
+                   [({}, stats.bytes_received)])
+    _format_metric(lines, 'mwscanner_vna_visa_errors_total', 'counter',
+                   'VISA errors.', [({}, stats.visa_errors)])
+    _format_metric(lines, 'mwscanner_vna_reconnects_total', 'counter',
+                   'Reconnects after a lost VISA session.',
+                   [({}, stats.reconnects)])
+
+
+class MetricsServer(object):
+    """Local HTTP endpoint with the scanner metrics (Prometheus format).
+
+    The server runs in a daemon thread and renders the counters of the
+    given controllers on every request of ``/metrics``. Passing a
+    :class:`MotorControl` enables its instrumentation (see
+    :attr:`MotorControl.stats`).
+
+    Args:
+        motor_control (MotorControl, optional): Defaults to ``None``.
+        vna (RSVNAControl, optional): Defaults to ``None``.
+        host (str, optional): Defaults to ``'127.0.0.1'``.
+        port (int, optional): Defaults to 9464.
+
+    Example:
+        >>> server = MetricsServer(motor_control=MotorControl(), port=9464)
+        >>> server.start()
+        >>> # curl http://127.0.0.1:9464/metrics
+        >>> server.stop()
+    """
+
+    def __init__(self, motor_control=None, vna=None, host='127.0.0.1',
+                 port=9464):
+        self.motor_control = motor_control
+        self.vna = vna
+        self.host = host
+        self.port = port
+        self._httpd = None
+        self._thread = None
+
+    def render(self):
+        """Returns the current metrics in the Prometheus text format."""
+        lines = []
+        if self.motor_control is not None:
+            motor_metrics(self.motor_control.stats, lines)
+        if self.vna is not None:
+            vna_metrics(self.vna.stats, lines)
+        return '\n'.join(lines) + '\n'
+
+    def start(self):
+        """Starts serving in a background thread."""
+        if self._httpd is not None:
+            return
+        if self.motor_control is not None:
+            self.motor_control.stats.enabled = True
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                if self.path.split('?')[0] not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = server.render().encode()
+                self.send_response(200)
+                self.send_header('Content-Type',
+                                 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._httpd.daemon_threads = True
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever,
+                                        name='metrics', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stops the server."""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+        self._httpd = None
+        self._thread = None
+
+
+def start_metrics_server(motor_control=None, vna=None, host='127.0.0.1',
+                         port=9464):
+    """Creates and starts a :class:`MetricsServer`.
+
+    Returns:
+        MetricsServer: The running server.
+    """
+    server = MetricsServer(motor_control=motor_control, vna=vna, host=host,
+                           port=port)
+    server.start()
+    return server
@@ -1,87 +1,88 @@
+import itertools
+import json
 import numpy as np
 import warnings
 from sympy import solve, var
 import sys
-from datetime import datetime
+import threading
+import time
 import matplotlib.pyplot as plt
 import matplotlib
-from .util import dist2coordinates, pause, outer_ellipsoid_fit
+from time import perf_counter_ns
+from .util import dist2coordinates, pause, outer_ellipsoid_fit, \
+    ray_ellipse_distance
+from .instrumentation import MotionStats
+from .scheduler import MotionScheduler
+from .layout import AntennaLayout
+from .tracing import TRACER, span, traced
+from .logs import get_logger, SWITCH, BOUNCE
 
 matplotlib.use("TkAgg")
 
 _has_pi = True
 
+_log = get_logger('motor')
+
 # MOTOR PARAMETERS #
 
 _NUM_CONTROLS = 17
 
-# Max distance the motor can cover with the current hardware (in mm)
-# Antenna = [0, 1, 2, 3, 4, 5, 6, 7]
-_DRIVERS_MAX = [40, 40, 40, 40, 40, 40, 40, 40]
-
-# !!!!!!!!! THE FOLLOWING MEASUREMENTS MUST BE ACCURATE !!!!!!!!! #
-
-# Distance of each pair of antennas (in mm) in close position
-
-# Antenna = [0, 1, 2, 3,
-#            4, 5, 6, 7]
-
-# 0-4: 139
-# INN_DIST04 = 139
-#
-# # 1-5: 122
-# INN_DIST15 = 122
-#
-# # 2-6: 122
-# INN_DIST26 = 122
-#
-# # 3-7: 120
-# INN_DIST37 = 120
-#
-# # Distance of each antenna from the center (in mm) in close position
-# INNER_DIST = [INN_DIST04/2, INN_DIST15/2, INN_DIST26/2, INN_DIST37/2,
-#               INN_DIST04/2, INN_DIST15/2, INN_DIST26/2, INN_DIST37/2]
-
-# Distance of each pair of antennas (in mm) in home position
-
-# Antenna = [0, 1, 2, 3,
-#            4, 5, 6, 7]
-
-# 0-4 : 221
-_OUT_DIST04 = 221
-
-# 1-5: 204
-_OUT_DIST15 = 204
-
-# 2-6: 204
-_OUT_DIST26 = 204
-
-# 3-7: 200
-_OUT_DIST37 = 200
-
-# Distance of each antenna from the center (in mm) in home position
-_OUTER_DIST = [_OUT_DIST04 / 2, _OUT_DIST15 / 2, _OUT_DIST26 / 2, _OUT_DIST37
-               / 2, _OUT_DIST04 / 2, _OUT_DIST15 / 2, _OUT_DIST26 / 2,
-               _OUT_DIST37 / 2]
-
-# MAX distance allowed of each antenna from the center (in mm) in close position
-_INNER_DIST = [_OUTER_DIST[0] - _DRIVERS_MAX[0],
-               _OUTER_DIST[1] - _DRIVERS_MAX[1],
-               _OUTER_DIST[2] - _DRIVERS_MAX[2],
-               _OUTER_DIST[3] - _DRIVERS_MAX[3],
-               _OUTER_DIST[4] - _DRIVERS_MAX[4],
-               _OUTER_DIST[5] - _DRIVERS_MAX[5],
-               _OUTER_DIST[6] - _DRIVERS_MAX[6],
-               _OUTER_DIST[7] - _DRIVERS_MAX[7]]
-
-# Angle of each antenna (in degrees)
-# Antenna = [0, 1, 2, 3, 4, 5, 6, 7]
-_ANGLES = [90, 45, 0, 315, 270, 225, 180, 135]
+# Two phase homing: fast approach until the switch is pressed, back off and
+# re-approach slowly. Step rates in steps/s (None: as fast as possible)
+_HOMING_FAST_RATE = None
+_HOMING_SLOW_RATE = 50
+# back off distance after the first contact (in mm)
+_HOMING_BACKOFF = 1.
+
+# Step rate of the moves in steps/s (None: as fast as possible), see
+# `MotorControl.tune_step_rate`
+_STEP_RATE = None
+# Step rate tuning: candidate rates (steps/s), test distance (mm), tolerated
+# step loss (mm) and trials per rate
+_TUNING_RATES = (100, 150, 200, 300, 400, 600, 800, 1200)
+_TUNING_DIST = 20.
+_TUNING_TOLERANCE = .05
+_TUNING_REPEATS = 2
+
+# Hold policy: the coils stay energized for that many seconds after a move
+# (0: release right away, None: until `release_all`) and are given some time
+# to pull the rotor back to the held phase before stepping again
+_HOLD_TIMEOUT = 2.
+_SETTLE_SECONDS = .005
+
+# Predictive head approach: the antenna moves fast until this distance (in
+# mm) before the predicted contact and then probes slowly for twice as much
+_PREDICTION_MARGIN = 2.
+
+# Positions are trusted (no re-homing needed) for that many steps after
+# homing, unless there is an unexpected switch event
+_TRUST_MAX_STEPS = 4000
+
+# Stepping styles. One full step (1.8deg.) is 16 microsteps of the driver
+# and 200 full steps move the lead screw 8 mm
+_MICROSTEPS = 16
+_USTEPS_PER_MM = 200 * _MICROSTEPS / 8
+# the coils repeat every 4 full steps
+_CYCLE_USTEPS = 4 * _MICROSTEPS
+# microsteps made by one step of each style
+_STYLE_USTEPS = {'single': _MICROSTEPS, 'double': _MICROSTEPS,
+                 'interleave': _MICROSTEPS // 2, 'microstep': 1}
+# fast style for long moves, fine style for the approach of a switch or target
+_CRUISE_STYLE = 'double'
+_APPROACH_STYLE = 'interleave'
+# the last part of a move (in mm) is made with the approach style
+_APPROACH_DIST = .5
+
+_STEPPER_STYLES = {}
 
 try:
     from adafruit_motorkit import MotorKit
     from adafruit_motor import stepper
     import RPi.GPIO as GPIO
+
+    _STEPPER_STYLES = {'single': stepper.SINGLE, 'double': stepper.DOUBLE,
+                       'interleave': stepper.INTERLEAVE,
+                       'microstep': stepper.MICROSTEP}
 except (Exception,):
     _has_pi = False
 
@@ -89,6 +90,11 @@ except (Exception,):
 # TODO : CHECK POSITION AFTER RELEASE
 
 
+class MotionCancelled(Exception):
+    """Raised inside a motion method after :meth:`MotorControl.request_cancel`
+    was called (e.g. from another thread)."""
+
+
 class MotorControl:
     """Constructor method for the motor controller object:
 
@@ -99,25 +105,33 @@ class MotorControl:
     Args:
         kit_address (list, optional): List of kit addresses (default: None).
         motor_id (list, optional): List of motor IDs (default: None).
+        rate_profile (str, optional): Step rate profile to load, see
+            `tune_step_rate` (default: None).
+        layout (AntennaLayout, optional): Geometry and wiring of the
+            antennas (default: None, the 8 antenna layout).
 
     Example:
         >>> obj = MotorControl(kit_address=[0x60, 0x61],
         >>>                    motor_id=[[0, 0],[0, 1]])
 
     Note:
-        - If `kit_address` is not provided, it is set to the default
-          addresses [0x60, 0x61, 0x62, 0x63].
-        - If `motor_id` is not provided, it is set to the default IDs
+        - If `kit_address` is not provided, it is set to the hats of the
+          `layout`, by default [0x60, 0x61, 0x62, 0x63].
+        - If `motor_id` is not provided, every antenna of the `layout` (on
+          the hats of `kit_address`) gets a motor, by default
           [[0, 0], [0, 1], [1, 0], [1, 1], [2, 0], [2, 1], [3, 0], [3, 1]].
         - The `kit_address` and `motor_id` parameters are used to keep track
           of the hats and motors.
-        - The initial motor positions are set to the maximum value defined
-          by `_DRIVERS_MAX`.
+        - The initial motor positions are set to the home positions of the
+          `layout`.
         - The `_antenna_number` sets the numbering that we have set
-          to the lab
+          to the lab (looked up in the `layout`)
         - The antenna numbers and motor coordinates are initialized based on
           the kit addresses and motor IDs.
         - The GPIO pin for the switch is set up.
+        - The progress of the motion methods is logged, nothing is printed
+          until the logging is configured (``configure_logging()`` prints
+          INFO and above to stderr).
 
 
     Destructor method for the motor controller object:
@@ -170,52 +184,40 @@ class MotorControl:
     """
 
     def __init__(self, kit_address=None,
-                 motor_id=None):
+                 motor_id=None, rate_profile=None, layout=None):
+        if layout is None:
+            layout = AntennaLayout.default()
+        self._layout = layout
+
         # keep track of the hats and the motors
         if kit_address is None:
-            kit_address = [0x60, 0x61, 0x62, 0x63]
+            kit_address = list(layout.hats)
         if motor_id is None:
-            motor_id = [[0, 0], [0, 1],
-                        [1, 0], [1, 1],
-                        [2, 0], [2, 1],
-                        [3, 0], [3, 1]]
+            motor_id = [[kit_address.index(add), stp]
+                        for add, stp in zip(layout.addresses, layout.steppers)
+                        if add in kit_address]
         self._kit_address = kit_address
         self._motor_id = motor_id
 
-        self._antenna_number = []
         self._antenna_coords = []
         self._antenna_pos = []
-        for im in range(len(self._motor_id)):
+        # position in microsteps from home (integer, see `new_position`)
+        self._antenna_usteps = []
+        # set the numbering of the antennas and compile the geometry of
+        # every motor
+        self._antenna_number = [
+            layout.antenna_number(self._kit_address[mid[0]], mid[1])
+            for mid in self._motor_id]
+        self._angles = layout.angles[self._antenna_number].tolist()
+        self._outer = layout.outer[self._antenna_number].tolist()
+        self._inner = layout.inner[self._antenna_number].tolist()
+        self._travel = layout.travel[self._antenna_number].tolist()
 
-            # set the numbering of the antennas
-
-            # First kit
-            if self._kit_address[self._motor_id[im][0]] == 0x60:
-                if self._motor_id[im][1] == 0:
-                    self._antenna_number.append(0)
-                else:
-                    self._antenna_number.append(1)
-            # Second kit
-            elif self._kit_address[self._motor_id[im][0]] == 0x61:
-                if self._motor_id[im][1] == 0:
-                    self._antenna_number.append(2)
-                else:
-                    self._antenna_number.append(3)
-            # Third kit
-            elif self._kit_address[self._motor_id[im][0]] == 0x62:
-                if self._motor_id[im][1] == 0:
-                    self._antenna_number.append(4)
-                else:
-                    self._antenna_number.append(5)
-            # Fourth kit
-            else:
-                if self._motor_id[im][1] == 0:
-                    self._antenna_number.append(6)
-                else:
-                    self._antenna_number.append(7)
+        for im in range(len(self._motor_id)):
 
             # position in mm
-            self._antenna_pos.append(_OUTER_DIST[self._antenna_number[im]])
+            self._antenna_pos.append(self._outer[im])
+            self._antenna_usteps.append(0)
 
             # set real coordinates of motors
             self._antenna_coords.append(
@@ -223,17 +225,72 @@ class MotorControl:
 
         self._init_system = False
 
+        # stepping styles of the motion phases (see `cruise_style`)
+        self._cruise_style = _CRUISE_STYLE
+        self._approach_style = _APPROACH_STYLE
+        self.approach_distance = _APPROACH_DIST
+        # last microstep counter returned by the drivers
+        self._coil_usteps = [None] * len(self._motor_id)
+
+        # hold policy (see `hold_timeout`): idle motors are held (or
+        # released), released motors have no current in the coils
+        self.hold_timeout = _HOLD_TIMEOUT
+        self._idle = [True] * len(self._motor_id)
+        self._released = [True] * len(self._motor_id)
+        self._idle_since = [0.] * len(self._motor_id)
+        self._hold_timers = [None] * len(self._motor_id)
+        self._coil_lock = threading.Lock()
+
+        # two phase homing profile of every antenna (see `init_motors`)
+        self.two_phase_homing = True
+        self.homing_fast_rate = [_HOMING_FAST_RATE] * len(self._motor_id)
+        self.homing_slow_rate = [_HOMING_SLOW_RATE] * len(self._motor_id)
+        self.homing_backoff = [_HOMING_BACKOFF] * len(self._motor_id)
+
+        # step rate of the moves of every antenna (see `tune_step_rate`)
+        self.step_rate = [_STEP_RATE] * len(self._motor_id)
+        if rate_profile is not None:
+            self.load_rate_profile(rate_profile)
+
+        # concurrent moves of several antennas (see `move_to_positions`),
+        # None to always move one antenna after the other
+        self.scheduler = MotionScheduler()
+
+        # position trust, steps since homing and switch events (see
+        # `positions_trusted`)
+        self.trust_max_steps = _TRUST_MAX_STEPS
+        self._steps_since_home = [0] * len(self._motor_id)
+        self._trusted = [False] * len(self._motor_id)
+
+        # predictive head approach (see `set_on_head`)
+        self.prediction_margin = _PREDICTION_MARGIN
+        self._head_positions = [None] * len(self._motor_id)
+
         self._pin_switch = _NUM_CONTROLS
 
         self.plot_pin_states = False
 
+        # callable(event, data) notified with the progress of the motion
+        # methods, e.g. new antenna positions. It is called from the thread
+        # that moves the motors, so it should return quickly
+        self.progress_callback = None
+        # callable() that waits for the user after every antenna when
+        # `pauses` is set, instead of the Enter key on the console (e.g. a
+        # dialog of a GUI). It is called from the thread that moves the
+        # motors
+        self.pause_callback = None
+        self._cancel_requested = False
+
+        # hot path instrumentation, see `stats`
+        self._stats = MotionStats(len(self._motor_id),
+                                  labels=self._antenna_number)
+
         # init the motors
 
         if not _has_pi:
             msg = 'Raspberry Pi libraries could not be found, Motors cannot ' \
                   'be imported to the system'
             warnings.warn(msg, UserWarning)
-            print(msg)
         else:
 
             self._mkits = [MotorKit(add) for add in self._kit_address]
@@ -322,7 +379,7 @@ class MotorControl:
                 .format(self._kit_address[self._motor_id[im][0]])
             motor_str += 'Stepper: {:d}\n'.format(self._motor_id[im][0])
             motor_str += 'Closer Distance: {:2f}\n'.format(
-                _INNER_DIST[self._antenna_number[im]])
+                self._inner[im])
 
             if self._init_system:
                 motor_str += 'Position: {:2f} mm\n'.format(self._antenna_pos[
@@ -335,11 +392,13 @@ class MotorControl:
         return motor_str
 
     @staticmethod
-    def _dist2steps(distance):
+    def _dist2steps(distance, style=_CRUISE_STYLE):
         """Converts distance (in mm ) to the equivalent number of motor steps.
 
         Args:
             distance (float): The distance in mm.
+            style (str, optional): The stepping style. Defaults to
+                ``'double'``.
 
         Returns:
             int: The number of steps.
@@ -351,16 +410,19 @@ class MotorControl:
         Note:
             one full rotation (360deg.) of the motor corresponds to 200 steps
             (1.8deg./step) which (for this lead screw) corresponds to 8mm linear
-            distance
+            distance. ``'single'`` and ``'double'`` make full steps,
+            ``'interleave'`` half steps and ``'microstep'`` 1/16 steps.
         """
-        return int(200 * distance / 8)
+        return int(distance * _USTEPS_PER_MM / _STYLE_USTEPS[style])
 
     @staticmethod
-    def _steps2dist(steps):
+    def _steps2dist(steps, style=_CRUISE_STYLE):
         """Converts motor steps to linear distance (mm)
 
         Args:
             steps (int): The number of motor steps.
+            style (str, optional): The stepping style. Defaults to
+                ``'double'``.
 
         Returns:
             float: The distance in mm.
@@ -369,24 +431,24 @@ class MotorControl:
             >>> steps2dist(500)
             20
         """
-        return 8 * steps / 200
+        return steps * _STYLE_USTEPS[style] / _USTEPS_PER_MM
 
     @staticmethod
     def _update_move(distance):
-        """Print a message indicating the movement based on the given distance.
+        """Log a message indicating the movement based on the given distance.
 
         Args:
             distance (float): The distance of movement.
 
         Examples:
             >>> _update_move(10.5)
-            # Prints 'Moved Forward: 10.500000 mm'
+            # Logs 'Moved Forward: 10.500000 mm'
 
             >>> _update_move(-5.2)
-            # Prints 'Moved Backward: 5.200000 mm'
+            # Logs 'Moved Backward: 5.200000 mm'
 
             >>> _update_move(0)
-            # Prints 'Antenna stayed Still'
+            # Logs 'Antenna stayed Still'
 
         Notes:
             - Positive distance indicates forward movement.
@@ -394,23 +456,327 @@ class MotorControl:
             - A distance of 0 indicates no movement.
         """
         if distance > 0:
-            print('Moved Forward: {:2f} mm'.format(distance))
+            _log.info('Moved Forward: %f mm', distance)
         elif distance < 0:
-            print('Moved Backward: {:2f} mm'.format(abs(distance)))
+            _log.info('Moved Backward: %f mm', abs(distance))
         else:
-            print('Antenna stayed Still')
+            _log.info('Antenna stayed Still')
 
     @property
     def coordinates(self):
         """Get coordinates"""
         return self._antenna_coords
 
-    def check_pin(self, pin_value):
+    @property
+    def layout(self):
+        """AntennaLayout: Geometry and wiring of the antennas."""
+        return self._layout
+
+    @property
+    def positions(self):
+        """Get positions (distance from the center in mm)"""
+        return self._antenna_pos
+
+    @property
+    def stats(self):
+        """MotionStats: Counters and latency histograms of the motion.
+
+        Disabled by default, set ``stats.enabled = True`` to start recording
+        and use ``stats.snapshot()`` and ``stats.reset()`` to read and clear
+        them.
+        """
+        return self._stats
+
+    @staticmethod
+    def _check_style(style):
+        if style not in _STYLE_USTEPS:
+            msg = 'Unknown stepping style {!r}, expecting one of {:s}'
+            raise ValueError(msg.format(style, ', '.join(_STYLE_USTEPS)))
+        return style
+
+    @property
+    def cruise_style(self):
+        """str: Stepping style of the fast parts of the motion (moves and
+        the fast approach of the switches). One of ``'single'``,
+        ``'double'`` (default), ``'interleave'`` or ``'microstep'``."""
+        return self._cruise_style
+
+    @cruise_style.setter
+    def cruise_style(self, val):
+        self._cruise_style = self._check_style(val)
+
+    @property
+    def approach_style(self):
+        """str: Stepping style of the final approach of a switch or target
+        (the slow touch, the release of the switch and the last
+        `approach_distance` mm of the moves). Default is
+        ``'interleave'``."""
+        return self._approach_style
+
+    @approach_style.setter
+    def approach_style(self, val):
+        self._approach_style = self._check_style(val)
+
+    def _onestep(self, num_motor, direction, style=_CRUISE_STYLE):
+        """Makes one step with the given motor (timed if stats are enabled).
+
+        Args:
+            num_motor (int): The index of the stepper motor.
+            direction (int): ``stepper.FORWARD`` or ``stepper.BACKWARD``.
+            style (str, optional): The stepping style. Defaults to
+                ``'double'``.
+
+        Returns:
+            int: The microsteps made (negative backward). The driver may
+            make a shorter step to align with the grid of the style.
+        """
+        self._check_cancel()
+        if self._idle[num_motor]:
+            self._energize(num_motor)
+        if self._stats.enabled:
+            start = perf_counter_ns()
+            ustep = self._steppers[num_motor].onestep(
+                direction=direction, style=_STEPPER_STYLES[style])
+            self._stats.record_step(num_motor, perf_counter_ns() - start)
+        else:
+            ustep = self._steppers[num_motor].onestep(
+                direction=direction, style=_STEPPER_STYLES[style])
+
+        last = self._coil_usteps[num_motor]
+        self._coil_usteps[num_motor] = ustep
+        if last is None:
+            size = _STYLE_USTEPS[style]
+            return size if direction == stepper.FORWARD else -size
+        delta = (ustep - last) % _CYCLE_USTEPS
+        return delta - _CYCLE_USTEPS if delta > _CYCLE_USTEPS // 2 else delta
+
+    def _energize(self, num_motor):
+        """Prepares an idle motor for stepping.
+
+        The hold timer is cancelled. A released motor is re-energized at the
+        phase it had when it was released (so that the rotor is pulled back
+        to where it was) and the held motors above the limit of the
+        `scheduler` are released.
+        """
+        with self._coil_lock:
+            self._cancel_hold(num_motor)
+            self._idle[num_motor] = False
+            if not self._released[num_motor]:
+                return
+            self._released[num_motor] = False
+
+            limit = 1 if self.scheduler is None else \
+                self.scheduler.max_energized
+            held = [im for im in range(len(self._motor_id))
+                    if self._idle[im] and not self._released[im]]
+            moving = self._idle.count(False)
+            held.sort(key=lambda im: self._idle_since[im])
+            for im in held[:max(len(held) + moving - limit, 0)]:
+                self._cancel_hold(im)
+                self._steppers[im].release()
+                self._released[im] = True
+
+            ustep = self._coil_usteps[num_motor]
+            update = getattr(self._steppers[num_motor], '_update_coils', None)
+            if ustep is None or update is None:
+                return
+            update(microstepping=ustep % (_MICROSTEPS // 2) != 0)
+        time.sleep(_SETTLE_SECONDS)
+
+    def _cancel_hold(self, num_motor):
+        """Cancels the hold timer of a motor (with `_coil_lock`)."""
+        timer = self._hold_timers[num_motor]
+        if timer is not None:
+            timer.cancel()
+            self._hold_timers[num_motor] = None
+
+    def _release(self, num_motor):
+        """Ends a move: the motor is held for `hold_timeout` seconds and
+        then released by a background timer.
+
+        Args:
+            num_motor (int): The index of the stepper motor.
+        """
+        with self._coil_lock:
+            self._cancel_hold(num_motor)
+            self._idle[num_motor] = True
+            self._idle_since[num_motor] = time.monotonic()
+            if self._released[num_motor]:
+                return
+            if self.hold_timeout is not None and self.hold_timeout <= 0:
+                self._steppers[num_motor].release()
+                self._released[num_motor] = True
+            elif self.hold_timeout is not None:
+                timer = threading.Timer(self.hold_timeout, self._release_idle,
+                                        (num_motor,))
+                timer.daemon = True
+                self._hold_timers[num_motor] = timer
+                timer.start()
+
+    def _release_idle(self, num_motor):
+        """Releases a held motor when its hold timer expires."""
+        with self._coil_lock:
+            if self._hold_timers[num_motor] is not \
+                    threading.current_thread():
+                return
+            self._hold_timers[num_motor] = None
+            self._steppers[num_motor].release()
+            self._released[num_motor] = True
+
+    def _read_switch(self, num_motor=None):
+        """Reads the switch pin (timed if stats are enabled).
+
+        Args:
+            num_motor (int, optional): The motor that is moving, for the
+                statistics. Defaults to ``None``.
+
+        Returns:
+            int: 0 if the switch is pressed, 1 otherwise.
+        """
+        if self._stats.enabled and num_motor is not None:
+            start = perf_counter_ns()
+            value = GPIO.input(self._pin_switch)
+            self._stats.record_gpio(num_motor, perf_counter_ns() - start)
+            return value
+        return GPIO.input(self._pin_switch)
+
+    def _phase_start(self):
+        """Start time of a motion phase (0 if stats and tracing are off)."""
+        if self._stats.enabled or TRACER.enabled:
+            return perf_counter_ns()
+        return 0
+
+    def _phase_end(self, name, num_motor, start):
+        """Records the motion phase in the stats and the session trace."""
+        self._stats.end_phase(name, num_motor, start)
+        TRACER.complete(name, 'motor', start,
+                        antenna=self._antenna_number[num_motor])
+
+    @property
+    def head_positions(self):
+        """list: Positions (in mm) where each antenna touched the head in the
+        last `set_on_head` (``None`` if the head was not found). Can be set,
+        e.g. with the positions of a previous session."""
+        return self._head_positions
+
+    @head_positions.setter
+    def head_positions(self, val):
+        if len(val) != len(self._motor_id):
+            msg = 'Expecting {:d} head positions, got {:d}'
+            raise ValueError(msg.format(len(self._motor_id), len(val)))
+        self._head_positions = list(val)
+
+    def positions_trusted(self):
+        """Checks if the tracked positions can be used without re-homing.
+
+        The position of an antenna is trusted after `init_motors`, as long
+        as it did not make more than `trust_max_steps` steps and there was
+        no unexpected switch event (unstable switch, switch pressed while
+        moving backward, moves with `force_forward`/`force_backward`).
+
+        Returns:
+            bool: ``True`` if the positions of all antennas are trusted.
+
+        Example:
+            >>> obj = MotorControl()
+            >>> obj.positions_trusted()
+            False
+        """
+        if not self._init_system:
+            return False
+        for im in range(len(self._motor_id)):
+            if not self._trusted[im] or \
+                    self._steps_since_home[im] > self.trust_max_steps:
+                return False
+        return True
+
+    def _distrust(self, num_motor, reason):
+        """Marks the position of an antenna as not trusted."""
+        if self._trusted[num_motor]:
+            _log.info('Position of antenna %d not trusted: %s',
+                      self._antenna_number[num_motor], reason)
+        self._trusted[num_motor] = False
+
+    def _predict_head(self, prediction):
+        """Converts the `prediction` of `set_on_head` to positions in mm.
+
+        Args:
+            prediction (str, list or tuple): ``'last'``, a list of positions
+                or the ellipse (A, c) as returned by `outer_ellipsoid_fit`.
+
+        Returns:
+            list: The predicted position of every antenna (``None`` if
+            unknown).
+        """
+        if isinstance(prediction, str):
+            if prediction != 'last':
+                raise ValueError('Unknown prediction ' + prediction)
+            return list(self._head_positions)
+        if isinstance(prediction, tuple) and len(prediction) == 2:
+            angles = [self.get_angle(im) for im in range(len(self._motor_id))]
+            dist = ray_ellipse_distance(prediction[0], prediction[1], angles)
+            return [None if np.isnan(val) else float(val) for val in dist]
+        if len(prediction) != len(self._motor_id):
+            msg = 'Expecting {:d} predicted positions, got {:d}'
+            raise ValueError(msg.format(len(self._motor_id), len(prediction)))
+        return list(prediction)
+
+    def _switch_pressed(self, num_motor):
+        """Records a press of the switch by a moving antenna (log, stats,
+        trace and ``'switch'`` progress event)."""
+        _log.debug('Pressed switch', extra=SWITCH)
+        if self._stats.enabled:
+            self._stats.count(num_motor, 'switch_presses')
+        TRACER.instant('switch', 'motor', motor=num_motor)
+        self._notify('switch', motor=num_motor,
+                     position=self._antenna_pos[num_motor])
+
+    def _notify(self, event, **data):
+        """Forward a progress event to `progress_callback` (if set)."""
+        if self.progress_callback is not None:
+            self.progress_callback(event, data)
+
+    def _pause(self):
+        """Waits for the user (see `pause_callback`), a cancellation
+        requested meanwhile stops the motion method."""
+        if self.pause_callback is None:
+            pause()
+        else:
+            self.pause_callback()
+        self._check_cancel()
+
+    def request_cancel(self):
+        """Asks the running motion method to stop as soon as possible.
+
+        The flag is checked before every step, so it is safe to call this
+        method from a different thread than the one moving the motors. The
+        motion method raises `MotionCancelled` and the caller is
+        responsible for releasing the motors.
+
+        Example:
+            >>> obj = MotorControl()
+            >>> obj.request_cancel()
+        """
+        self._cancel_requested = True
+
+    def clear_cancel(self):
+        """Drops a cancellation that was requested after the last motion
+        method ended (so that it does not stop the next one)."""
+        self._cancel_requested = False
+
+    def _check_cancel(self):
+        """Raises `MotionCancelled` if a cancellation has been requested."""
+        if self._cancel_requested:
+            self._cancel_requested = False
+            TRACER.instant('cancel', 'motor')
+            raise MotionCancelled('Motion cancelled by the user')
+
+    def check_pin(self, pin_value, num_motor=None):
         """Checks the status of a pin switch.
 
-        If the pin switch is OFF, it prints "switch is OFF".
-        If the pin switch is STILL ON, it prints "switch is STILL ON",
-        terminates the program, and exits.
+        If the pin switch is OFF, it logs "switch is OFF".
+        If the pin switch is STILL ON 3 times in a row, it terminates the
+        program, and exits.
 
         Returns:
             None
@@ -422,15 +788,14 @@ class MotorControl:
         """
         for _ in range(3):
 
-            pin_value.append(GPIO.input(self._pin_switch))
+            pin_value.append(self._read_switch(num_motor))
             if pin_value[-1] == 1:
-                print("switch is OFF")
+                _log.debug('switch is OFF', extra=SWITCH)
                 return pin_value
             else:
-                print("switch is STILL ON")
+                _log.debug('switch is STILL ON', extra=SWITCH)
 
-        print("3 times in a row")
-        print(">Terminating...")
+        _log.error('Switch is STILL ON 3 times in a row, terminating...')
         self.__del__()
         sys.exit()
 
@@ -528,15 +893,18 @@ class MotorControl:
             >>> obj.release_all()
             (All steppers are released)
         """
-        for stpr in self._steppers:
-            stpr.release()
+        with self._coil_lock:
+            for im, stpr in enumerate(self._steppers):
+                self._cancel_hold(im)
+                stpr.release()
+                self._idle[im] = True
+                self._released[im] = True
 
     def get_angle(self, motor_num):
         """Retrieves the angle corresponding to a specific motor number.
 
         This method takes a motor number as input and returns the
-        corresponding angle from the `_ANGLES` list based on the
-        `_antenna_number` mapping.
+        corresponding angle of the antenna in the `layout`.
 
         Args:
             motor_num (int): The motor number.
@@ -549,12 +917,12 @@ class MotorControl:
             >>> obj.get_angle(2)
             45.0
         """
-        return _ANGLES[self._antenna_number[motor_num]]
+        return self._angles[motor_num]
 
-    def check_pin_stable(self, pin_value):
+    def check_pin_stable(self, pin_value, num_motor=None):
         """Checks if the pin state is stable.
 
-        This function monitors the state of a GPIO pin, and prints messages
+        This function monitors the state of a GPIO pin, and logs a message
         indicating the state  of the pin at two different points in time.
         It also issues a warning if the pin state  is not stable,
         suggesting to initialize the antennas until the warning does not
@@ -563,29 +931,20 @@ class MotorControl:
         Raises:
             UserWarning: If the state of the GPIO pin is unstable.
         """
-        pre_time = datetime.now()
-        pin_value.append(GPIO.input(self._pin_switch))
-        pin_value.append(GPIO.input(self._pin_switch))
+        pin_value.append(self._read_switch(num_motor))
+        pin_value.append(self._read_switch(num_motor))
         if pin_value[-1] != pin_value[-2]:
-            now_time = datetime.now()
-            if pin_value[-2] == 0:
-                print(pre_time, "GPIO PIN was ", pin_value[-2], ", SWITCH was "
-                                                                "PRESSED, "
-                                                                "LED was OFF")
-                print(now_time, "GPIO PIN was ", pin_value[-1], ", SWITCH was "
-                                                                "NOT PRESSED, "
-                                                                "LED was ON")
-            else:
-                print(pre_time, "GPIO PIN was ", pin_value[-2], ", SWITCH was "
-                                                                "NOT PRESSED, "
-                                                                "LED was ON")
-                print(now_time, "GPIO PIN was ", pin_value[-1], ", SWITCH was "
-                                                                "PRESSED, "
-                                                                "LED was OFF")
+            _log.debug('GPIO PIN changed %d -> %d, SWITCH was %s',
+                       pin_value[-2], pin_value[-1],
+                       'PRESSED' if pin_value[-2] == 0 else 'NOT PRESSED',
+                       extra=BOUNCE)
+            if num_motor is not None:
+                self._distrust(num_motor, 'unstable switch')
+                if self._stats.enabled:
+                    self._stats.count(num_motor, 'bounces')
             msg = "Switch status is not stable, STRONG SUGGESTION: INITIALIZE " \
                   "ANTENNAS until the msg doesnt appear"
             warnings.warn(msg, UserWarning)
-            print(msg)
 
         return pin_value
 
@@ -623,33 +982,38 @@ class MotorControl:
         Note:
             The method checks the status of the switch using the GPIO pin
             `self._pin_switch`.
-            It uses the `dist2steps` and `steps2dist` functions to convert
-            between steps and distance.
+            The steps are made with the `approach_style`.
             The `StepperMotor` class should be instantiated and passed as an
             argument to control the motor.
             The `forward` parameter determines the direction of movement
             (forward or backward).
         """
-        pin_value.append(GPIO.input(self._pin_switch))
+        pin_value.append(self._read_switch(num_motor))
         if pin_value[-1] == 0:
 
             if verbose:
-                print("Moving to release switch")
+                _log.debug('Moving to release switch', extra=SWITCH)
+            t_phase = self._phase_start()
+            steps_start = steps
 
-            pin_value.append(GPIO.input(self._pin_switch))
+            pin_value.append(self._read_switch(num_motor))
             while pin_value[-1] == 0:
-                if forward:
-                    self.forward(num_motor)
-                else:
-                    self.backward(num_motor)
+                self._step(num_motor, forward, style=self._approach_style)
 
                 steps += 1
 
-                pin_value = self.check_pin_stable(pin_value=pin_value)
+                pin_value = self.check_pin_stable(pin_value=pin_value,
+                                                  num_motor=num_motor)
+
+            if self._stats.enabled:
+                self._stats.count(num_motor, 'release_cycles')
+                self._stats.count(num_motor, 'release_steps',
+                                  steps - steps_start)
+            self._phase_end('release', num_motor, t_phase)
 
-        pin_value.append(GPIO.input(self._pin_switch))
+        pin_value.append(self._read_switch(num_motor))
         if pin_value[-1] == 0:
-            print("Switch is still ON")
+            _log.debug('Switch is still ON', extra=SWITCH)
 
         return steps, pin_value
 
@@ -674,28 +1038,43 @@ class MotorControl:
             >>> obj = MotorControl()
             >>> obj.new_position(1, 10)
             (Position and coordinates of motor 1 are updated)
+
+        Note:
+            The position is tracked in whole microsteps from the home
+            position, so `distance` is rounded to 1/400 mm.
         """
+        outer = self._outer[num_motor]
+        self._set_usteps(num_motor,
+                         int(round((outer - distance) * _USTEPS_PER_MM)))
+
+    def _set_usteps(self, num_motor, usteps):
+        """Sets the position in microsteps from home (and in mm)."""
+        self._antenna_usteps[num_motor] = usteps
+        distance = self._outer[num_motor] - \
+            usteps / _USTEPS_PER_MM
         self._antenna_pos[num_motor] = distance
         self._antenna_coords[num_motor] = \
             dist2coordinates(distance,
                              self.get_angle(num_motor))
+        self._notify('position', motor=num_motor, position=distance)
 
-    def forward(self, num_motor):
+    def forward(self, num_motor, style=None):
         """Moves the specified stepper motor one step forward.
 
         Args:
             num_motor (int): The index of the stepper motor to be moved.
+            style (str, optional): The stepping style. Defaults to
+                ``None``, the `cruise_style`.
 
         Note:
             The new position of the antenna is updated with respect to
             the number of steps taken.
         """
-        self._steppers[num_motor].onestep(
-            direction=stepper.FORWARD, style=stepper.DOUBLE)
+        ustep = self._onestep(num_motor, stepper.FORWARD,
+                              style or self._cruise_style)
+        self._steps_since_home[num_motor] += 1
 
-        self.new_position(num_motor,
-                          self._antenna_pos[
-                              num_motor] - self._steps2dist(1))
+        self._set_usteps(num_motor, self._antenna_usteps[num_motor] + ustep)
 
     def force_forward(self, num_motor, distance):
         """Forces the specified stepper motor to move forward by a certain
@@ -707,29 +1086,35 @@ class MotorControl:
 
         Note:
             The distance is converted to steps before moving the motor.
-            The motor is released after moving.
+            The motor is released after moving (see `hold_timeout`). The
+            position is not tracked, so the antennas are re-homed before
+            the next `set_on_head`.
         """
-        for _ in range(self._dist2steps(distance)):
-            self._steppers[num_motor].onestep(direction=stepper.FORWARD,
-                                              style=stepper.DOUBLE)
-        self._steppers[num_motor].release()
-
-    def backward(self, num_motor):
+        self._distrust(num_motor, 'forced move')
+        rate = self.step_rate[num_motor]
+        last = 0.
+        for _ in range(self._dist2steps(distance, self._cruise_style)):
+            last = self._pace(rate, last)
+            self._onestep(num_motor, stepper.FORWARD, self._cruise_style)
+        self._release(num_motor)
+
+    def backward(self, num_motor, style=None):
         """Moves the specified stepper motor one step backward.
 
         Args:
             num_motor (int): The index of the stepper motor to be moved.
+            style (str, optional): The stepping style. Defaults to
+                ``None``, the `cruise_style`.
 
         Note:
             The new position of the antenna is updated with respect to
             the number of steps taken.
         """
-        self._steppers[num_motor].onestep(
-            direction=stepper.BACKWARD, style=stepper.DOUBLE)
+        ustep = self._onestep(num_motor, stepper.BACKWARD,
+                              style or self._cruise_style)
+        self._steps_since_home[num_motor] += 1
 
-        self.new_position(num_motor,
-                          self._antenna_pos[
-                              num_motor] + self._steps2dist(1))
+        self._set_usteps(num_motor, self._antenna_usteps[num_motor] + ustep)
 
     def force_backward(self, num_motor, distance):
         """Forces the specified stepper motor to move backward by a certain
@@ -741,19 +1126,259 @@ class MotorControl:
 
         Note:
             The distance is converted to steps before moving the motor.
-            The motor is released after moving.
+            The motor is released after moving (see `hold_timeout`). The
+            position is not tracked, so the antennas are re-homed before
+            the next `set_on_head`.
         """
-        for _ in range(self._dist2steps(distance)):
-            self._steppers[num_motor].onestep(direction=stepper.BACKWARD,
-                                              style=stepper.DOUBLE)
-        self._steppers[num_motor].release()
+        self._distrust(num_motor, 'forced move')
+        rate = self.step_rate[num_motor]
+        last = 0.
+        for _ in range(self._dist2steps(distance, self._cruise_style)):
+            last = self._pace(rate, last)
+            self._onestep(num_motor, stepper.BACKWARD, self._cruise_style)
+        self._release(num_motor)
+
+    @staticmethod
+    def _pace(rate, last):
+        """Waits so that consecutive steps are at most `rate` per second.
+
+        Args:
+            rate (float): Step rate in steps/s, ``None`` for no waiting.
+            last (float): The time (`time.perf_counter`) of the last step.
+
+        Returns:
+            float: The time of the current step.
+        """
+        if rate is None:
+            return 0.
+        wait = last + 1. / rate - time.perf_counter()
+        if wait > 0.:
+            time.sleep(wait)
+        return time.perf_counter()
+
+    def _step(self, num_motor, forward, track=True, style=None):
+        """One step forward or backward, updating the position if `track`."""
+        style = style or self._cruise_style
+        if track:
+            if forward:
+                self.forward(num_motor, style)
+            else:
+                self.backward(num_motor, style)
+        else:
+            self._onestep(num_motor,
+                          stepper.FORWARD if forward else stepper.BACKWARD,
+                          style)
+
+    def _move_styles(self, distance):
+        """Styles of the steps of a move of `distance` mm.
 
+        The move is made with the `cruise_style`, except for the last
+        `approach_distance` mm that are made with the `approach_style`.
+
+        Returns:
+            iterator: The style of every step.
+        """
+        cruise_steps = self._dist2steps(
+            max(distance - self.approach_distance, 0.), self._cruise_style)
+        rest = int(round(distance * _USTEPS_PER_MM)) - \
+            cruise_steps * _STYLE_USTEPS[self._cruise_style]
+        approach_steps = max(rest, 0) // _STYLE_USTEPS[self._approach_style]
+        return itertools.chain(
+            itertools.repeat(self._cruise_style, cruise_steps),
+            itertools.repeat(self._approach_style, approach_steps))
+
+    def _step_until_switch(self, num_motor, forward, pin_value,
+                           max_steps=None, rate=None, track=True,
+                           style=None):
+        """Steps in one direction until the switch is pressed.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            forward (bool): The direction of the movement.
+            pin_value (list): The history of the switch readings.
+            max_steps (int, optional): Give up after that many steps.
+                Defaults to ``None``, i.e. never give up.
+            rate (float, optional): Step rate in steps/s. Defaults to
+                ``None``, as fast as possible.
+            track (bool, optional): Update the antenna position. Defaults to
+                ``True``.
+            style (str, optional): The stepping style. Defaults to ``None``,
+                the `cruise_style`.
+
+        Returns:
+            tuple: If the switch was pressed, the number of steps and the
+            switch readings.
+        """
+        steps = 0
+        last = 0.
+        while max_steps is None or steps < max_steps:
+            last = self._pace(rate, last)
+            self._step(num_motor, forward, track, style)
+            steps += 1
+
+            pin_value.append(self._read_switch(num_motor))
+            if pin_value[-1] == 0:
+                self._switch_pressed(num_motor)
+                return True, steps, pin_value
+        return False, steps, pin_value
+
+    def _approach_switch(self, num_motor, forward, pin_value, max_steps=None,
+                         track=True):
+        """Moves until the switch is pressed, with the two phase profile.
+
+        The antenna approaches with `homing_fast_rate` (`cruise_style`). On
+        the first contact it backs off `homing_backoff` mm and re-approaches
+        with `homing_slow_rate` (`approach_style`), so that the final contact
+        is always made at the same (slow) speed. If `two_phase_homing` is
+        ``False``, only the fast approach is performed.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            forward (bool): The direction of the movement.
+            pin_value (list): The history of the switch readings.
+            max_steps (int, optional): Maximum steps of the fast approach.
+                Defaults to ``None``, no limit.
+            track (bool, optional): Update the antenna position. Defaults to
+                ``True``.
+
+        Returns:
+            tuple: If the switch was pressed and the switch readings.
+        """
+        pressed, _, pin_value = self._step_until_switch(
+            num_motor, forward, pin_value, max_steps=max_steps,
+            rate=self.homing_fast_rate[num_motor], track=track)
+        if not pressed or not self.two_phase_homing:
+            return pressed, pin_value
+
+        # back off
+        backoff = self.homing_backoff[num_motor]
+        rate = self.homing_fast_rate[num_motor]
+        last = 0.
+        for _ in range(self._dist2steps(backoff, self._cruise_style)):
+            last = self._pace(rate, last)
+            self._step(num_motor, not forward, track)
+        pin_value.append(self._read_switch(num_motor))
+        if pin_value[-1] == 0:
+            _, pin_value = self.move_switch_off(
+                num_motor=num_motor, pin_value=pin_value, forward=not forward)
+
+        # slow touch, the switch should be found within the back off
+        pressed, _, pin_value = self._step_until_switch(
+            num_motor, forward, pin_value,
+            max_steps=self._dist2steps(2. * backoff, self._approach_style) + 1,
+            rate=self.homing_slow_rate[num_motor], track=track,
+            style=self._approach_style)
+        if not pressed:
+            msg = 'Switch not found again after backing off, antenna ' \
+                  '{:d}'.format(self._antenna_number[num_motor])
+            warnings.warn(msg, UserWarning)
+        return pressed, pin_value
+
+    def _release_switch(self, num_motor, pin_value, forward):
+        """Moves (`pin_checks` times) until the switch is released.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            pin_value (list): The history of the switch readings.
+            forward (bool): The direction to release the switch.
+
+        Returns:
+            tuple: If the switch was released and the switch readings.
+        """
+        steps_switch_off = 0
+        for _ in range(self.pin_checks):
+            extra_steps, pin_value = self.move_switch_off(
+                num_motor=num_motor, pin_value=pin_value, forward=forward)
+
+            steps_switch_off += extra_steps
+
+        pin_value.append(self._read_switch(num_motor))
+        if pin_value[-1] == 1:
+            _log.info('Switch released, %f mm needed',
+                      self._steps2dist(steps_switch_off,
+                                       self._approach_style))
+            return True, pin_value
+
+        msg = "Unstable Switch State, Repeat Initialization"
+        warnings.warn(msg, UserWarning)
+        _, pin_value = self.move_switch_off(
+            num_motor=num_motor, pin_value=pin_value, forward=forward)
+        return False, pin_value
+
+    def _probe_head(self, num_motor, predicted, pin_value):
+        """Moves fast close to the predicted contact and probes slowly.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            predicted (float): The predicted contact position (in mm).
+            pin_value (list): The history of the switch readings.
+
+        Returns:
+            tuple: If the head was found (and the switch released) and the
+            switch readings.
+        """
+        margin = self.prediction_margin
+        inner = self._inner[num_motor]
+        position = self._antenna_pos[num_motor]
+        fast_dist = min(max(position - predicted - margin, 0.),
+                        position - inner)
+        pressed, _, pin_value = self._step_until_switch(
+            num_motor, True, pin_value,
+            max_steps=self._dist2steps(fast_dist, self._cruise_style),
+            rate=self.homing_fast_rate[num_motor])
+
+        if not pressed:
+            probe_dist = min(2. * margin, self._antenna_pos[num_motor] - inner)
+            pressed, _, pin_value = self._step_until_switch(
+                num_motor, True, pin_value,
+                max_steps=self._dist2steps(probe_dist, self._approach_style),
+                rate=self.homing_slow_rate[num_motor],
+                style=self._approach_style)
+            if pressed:
+                found_head, pin_value = self._release_switch(
+                    num_motor, pin_value, forward=False)
+                if found_head:
+                    _log.info('Antenna is set on head (predicted)')
+                return found_head, pin_value
+            _log.info('Head not found at the predicted position, searching '
+                      'the full range')
+        else:
+            # touched at full speed, release and approach again normally
+            _log.info('Head is closer than predicted')
+            _, pin_value = self.move_switch_off(num_motor=num_motor,
+                                                pin_value=pin_value,
+                                                forward=False)
+        return False, pin_value
+
+    def _home_motor(self, num_motor, pin_value):
+        """Moves the antenna backward to the switch and releases it.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            pin_value (list): The history of the switch readings.
+
+        Returns:
+            list: The switch readings.
+        """
+        _log.debug('Moving BACKWARD')
+        while True:
+            _, pin_value = self._approach_switch(num_motor, False,
+                                                 pin_value, track=False)
+            released, pin_value = self._release_switch(num_motor, pin_value,
+                                                       forward=True)
+            if released:
+                return pin_value
+
+    @traced('motor')
     def init_motors(self, pauses=True, plot_pin=False):
         """Initializes motors to HOME position
 
         Initializes each motor in the `_steppers` list by sequentially
         moving each motor backward until it touches the switch connected
-        to the GPIO pin. Afterwards, it moves a few steps forward to
+        to the GPIO pin. With `two_phase_homing` the switch is first
+        approached fast (`homing_fast_rate`), then the motor backs off
+        `homing_backoff` mm and touches the switch again slowly
+        (`homing_slow_rate`). Afterwards, it moves a few steps forward to
         release the switch. Each motor is released after its
         initialization, accompanied by a status message of the PIN/switch
         state.
@@ -786,64 +1411,32 @@ class MotorControl:
             completed, self._init_system is set to True, indicating that the
             positions of the motors are now known.
         """
-        print("---------------------")
-        print("INITIALIZING MOTORS")
-        print("---------------------\n")
+        _log.info('----- INITIALIZING MOTORS -----')
 
         all_pin_value = []
         for num_motor in range(len(self._motor_id)):
 
-            pin_value = []
-            steps_switch_off = 0
-
-            print("----- Antenna {:d} -----".format(
-                self._antenna_number[num_motor]))
+            _log.info('Antenna %d', self._antenna_number[num_motor])
+            self._notify('antenna', motor=num_motor, action='init')
+            t_phase = self._phase_start()
 
-            print("Moving BACKWARD")
-            while True:
+            pin_value = self._home_motor(num_motor, [])
+            plot_pin = self.plot_pin_states
 
-                self._steppers[num_motor].onestep(
-                    direction=stepper.BACKWARD, style=stepper.DOUBLE)
+            _log.info('Initialization complete')
 
-                pin_value.append(GPIO.input(self._pin_switch))
+            self._release(num_motor)
+            self._phase_end('homing', num_motor, t_phase)
 
-                if pin_value[-1] == 0:
-                    plot_pin = self.plot_pin_states
-                    print("Pressed switch")
-
-                    for _ in range(self.pin_checks):
-                        extra_steps, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
-
-                        steps_switch_off += extra_steps
-
-                    pin_value.append(GPIO.input(self._pin_switch))
-                    if pin_value[-1] == 1:
-
-                        print("Switch released, {:2f} mm needed".format(
-                            self._steps2dist(steps_switch_off)))
-                        break
-                    else:
-                        msg = "Unstable Switch State, Repeat Initialization"
-                        warnings.warn(msg, UserWarning)
-                        print(msg)
-                        _, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
-
-            print('Initialization complete')
-
-            self._steppers[num_motor].release()
-
-            pin_value = self.check_pin(pin_value)
+            pin_value = self.check_pin(pin_value, num_motor=num_motor)
             all_pin_value.append(pin_value)
 
-            self.new_position(num_motor, _OUTER_DIST[self._antenna_number[
-                num_motor]])
+            self.new_position(num_motor, self._outer[num_motor])
+            self._steps_since_home[num_motor] = 0
+            self._trusted[num_motor] = True
 
             if pauses:
-                pause()
+                self._pause()
 
         if plot_pin:
             fig, axs = plt.subplots(len(self._motor_id), figsize=(10, 20))
@@ -854,17 +1447,232 @@ class MotorControl:
             plt.show()
         self._init_system = True
 
-    def set_on_head(self, pauses=True, plot_pin=False):
+    def _count_to_switch(self, num_motor, pin_value):
+        """Counts the slow steps backward until the switch is pressed, then
+        releases it again.
+
+        Returns:
+            tuple: The number of steps (in `approach_style`, ``None`` if the
+            switch was not found or not released) and the switch readings.
+        """
+        max_steps = self._dist2steps(
+            self._travel[num_motor],
+            self._approach_style)
+        pressed, steps, pin_value = self._step_until_switch(
+            num_motor, False, pin_value, max_steps=max_steps,
+            rate=self.homing_slow_rate[num_motor], track=False,
+            style=self._approach_style)
+        if not pressed:
+            return None, pin_value
+        released, pin_value = self._release_switch(num_motor, pin_value,
+                                                   forward=True)
+        return (steps if released else None), pin_value
+
+    def _rate_trial(self, num_motor, rate, steps, reference, pin_value):
+        """Moves `steps` forward and back at `rate` and measures the step
+        loss against the home switch.
+
+        Args:
+            num_motor (int): The index of the stepper motor to be moved.
+            rate (float): The step rate in steps/s.
+            steps (int): The number of steps in each direction.
+            reference (int): The result of `_count_to_switch` before the
+                trial.
+            pin_value (list): The history of the switch readings.
+
+        Returns:
+            tuple: The step loss (in `approach_style` steps, ``None`` if the
+            switch was pressed during the trial) and the switch readings.
+        """
+        pressed, _, pin_value = self._step_until_switch(
+            num_motor, True, pin_value, max_steps=steps, rate=rate,
+            track=False)
+        if pressed:
+            msg = 'Switch pressed moving forward while tuning antenna ' \
+                  '{:d}, is the head removed?'.format(
+                      self._antenna_number[num_motor])
+            warnings.warn(msg, UserWarning)
+            _, pin_value = self.move_switch_off(num_motor, pin_value,
+                                                forward=False)
+            return None, pin_value
+
+        pressed, _, pin_value = self._step_until_switch(
+            num_motor, False, pin_value, max_steps=steps, rate=rate,
+            track=False)
+        if pressed:
+            # lost forward steps, the home switch was reached early
+            _, pin_value = self.move_switch_off(num_motor, pin_value,
+                                                forward=True)
+            return None, pin_value
+
+        count, pin_value = self._count_to_switch(num_motor, pin_value)
+        if count is None:
+            return None, pin_value
+        return count - reference, pin_value
+
+    @traced('motor')
+    def tune_step_rate(self, rates=_TUNING_RATES, distance=_TUNING_DIST,
+                       tolerance=_TUNING_TOLERANCE, repeats=_TUNING_REPEATS,
+                       profile=None, pauses=False):
+        """Finds the fastest step rate of every antenna without step loss.
+
+        Each antenna is homed (see `init_motors`) and the number of slow
+        steps from the released switch back to the switch is counted as a
+        reference. Then, for increasing `rates`, the antenna moves
+        `distance` mm forward and back (in `cruise_style`) and the count is
+        repeated: steps lost on the way show up as a different count, or as
+        the switch being pressed before the end of the backward move. The
+        fastest rate without loss is stored in `step_rate` (and
+        `homing_fast_rate`) and used by all the following moves.
+
+        The head must be removed, the forward moves should not touch it.
+
+        Args:
+            rates (list, optional): Candidate step rates in steps/s.
+            distance (float, optional): Length of the test moves in mm.
+                Defaults to 20.
+            tolerance (float, optional): Tolerated step loss in mm. Defaults
+                to 0.05.
+            repeats (int, optional): Trials per rate. Defaults to 2.
+            profile (str, optional): Save the rates to this file (see
+                `load_rate_profile`). Defaults to ``None``.
+            pauses (bool, optional): Flag to decide whether to pause after
+                each antenna. Defaults to False.
+
+        Returns:
+            list: The step rate of every antenna (``None`` if even the
+            slowest rate lost steps, the previous rate is kept then).
+
+        Example:
+            >>> obj = MotorControl()
+            >>> obj.tune_step_rate(profile='step_rates.json')
+            >>> obj = MotorControl(rate_profile='step_rates.json')
+        """
+        _log.info('----- TUNING STEP RATES -----')
+
+        tolerance = self._dist2steps(tolerance, self._approach_style)
+        tuned = []
+        for num_motor in range(len(self._motor_id)):
+
+            antenna = self._antenna_number[num_motor]
+            _log.info('Antenna %d', antenna)
+            self._notify('antenna', motor=num_motor, action='tune')
+            t_phase = self._phase_start()
+
+            pin_value = self._home_motor(num_motor, [])
+            reference, pin_value = self._count_to_switch(num_motor,
+                                                         pin_value)
+            steps = self._dist2steps(
+                min(distance,
+                    self._travel[num_motor] - self.homing_backoff[num_motor]),
+                self._cruise_style)
+
+            best = None
+            for rate in sorted(rates) if reference is not None else ():
+                lost = 0
+                for _ in range(repeats):
+                    lost, pin_value = self._rate_trial(num_motor, rate, steps,
+                                                       reference, pin_value)
+                    if lost is None or abs(lost) > tolerance:
+                        break
+                if lost is None or abs(lost) > tolerance:
+                    _log.info('Steps lost at %g steps/s', rate)
+                    break
+                _log.debug('No step loss at %g steps/s', rate)
+                best = rate
+
+            if best is None:
+                msg = 'Could not tune the step rate of antenna {:d}, ' \
+                      'keeping {}'.format(antenna, self.step_rate[num_motor])
+                warnings.warn(msg, UserWarning)
+            else:
+                _log.info('Step rate: %g steps/s', best)
+                self.step_rate[num_motor] = best
+                self.homing_fast_rate[num_motor] = best
+            tuned.append(best)
+
+            self._release(num_motor)
+            self._phase_end('tuning', num_motor, t_phase)
+
+            # the antenna is home again
+            self.new_position(num_motor, self._outer[num_motor])
+            self._steps_since_home[num_motor] = 0
+            self._trusted[num_motor] = True
+
+            if pauses:
+                self._pause()
+
+        self._init_system = True
+        if profile is not None:
+            self.save_rate_profile(profile)
+        return tuned
+
+    def save_rate_profile(self, path):
+        """Saves `step_rate` of every antenna to a json file.
+
+        Args:
+            path (str): The profile file.
+        """
+        rates = {str(self._antenna_number[im]): self.step_rate[im]
+                 for im in range(len(self._motor_id))
+                 if self.step_rate[im] is not None}
+        with open(path, 'w') as fid:
+            json.dump({'style': self._cruise_style, 'rates': rates}, fid,
+                      indent=2)
+
+    def load_rate_profile(self, path):
+        """Loads the step rates saved by `tune_step_rate`.
+
+        The rates are used for the moves (`step_rate`) and the fast approach
+        of the switches (`homing_fast_rate`). Antennas missing in the file
+        keep their rate.
+
+        Args:
+            path (str): The profile file.
+        """
+        with open(path) as fid:
+            profile = json.load(fid)
+        if profile.get('style', self._cruise_style) != self._cruise_style:
+            msg = 'Step rates were tuned with the {!r} style, the cruise ' \
+                  'style is {!r}'.format(profile['style'], self._cruise_style)
+            warnings.warn(msg, UserWarning)
+        rates = profile['rates']
+        for im in range(len(self._motor_id)):
+            rate = rates.get(str(self._antenna_number[im]))
+            if rate is not None:
+                self.step_rate[im] = rate
+                self.homing_fast_rate[im] = rate
+
+    @traced('motor')
+    def set_on_head(self, pauses=True, plot_pin=False, prediction=None,
+                    rehome=None):
         """Moves each motor until it touches the head
 
         Moves each motor in the `_steppers` list forward until it touches the head by
         repeatedly making forward steps. Once the switch connected to the GPIO pin is
         activated, the motor takes a few steps backward to release the switch.
+        The head is approached with the same two phase profile as the home
+        switch (see `init_motors`).
+
+        With a `prediction` of the contact points, each antenna moves fast
+        up to `prediction_margin` mm before the predicted contact and then
+        probes slowly (`homing_slow_rate`) for twice the margin. Only if the
+        head is not found there, the antenna falls back to the search of the
+        full range.
 
         Args:
             plot_pin:
             pauses (bool, optional): A flag determining whether to pause after each
             motor movement. Defaults to True.
+            prediction (str, list or tuple, optional): The predicted contact
+                points. Either ``'last'`` (the `head_positions` of the last
+                call), a list with the position of every antenna (in mm,
+                ``None`` if unknown) or the ellipse ``(A, c)`` of the head
+                as returned by `outer_ellipsoid_fit`. Defaults to ``None``,
+                no prediction.
+            rehome (bool, optional): Whether to home the antennas before
+                searching the head. Defaults to ``None``, i.e. only if
+                the positions are not trusted (see `positions_trusted`).
 
         Returns:
             None
@@ -883,73 +1691,72 @@ class MotorControl:
             of each motor is updated. The `pauses` parameter can be used to manage
             pauses after each motor movement.
         """
-        print("---------------------")
-        print("FINDING HEAD")
-        print("---------------------\n")
+        _log.info('----- FINDING HEAD -----')
+
+        if rehome is None:
+            rehome = not self.positions_trusted()
+        if rehome:
+            self.init_motors(pauses=False)
+        else:
+            _log.info('Positions are trusted, skipping homing')
+        predicted = [None] * len(self._motor_id)
+        if prediction is not None:
+            predicted = self._predict_head(prediction)
 
-        self.init_motors(pauses=False)
         all_pin_value = []
         for num_motor in range(len(self._motor_id)):
 
             pin_value = []
-            steps_switch_off = 0
 
             init_pos = self._antenna_pos[num_motor]
 
-            print("----- Antenna {:d} -----".format(
-                self._antenna_number[num_motor]))
+            _log.info('Antenna %d', self._antenna_number[num_motor])
+            self._notify('antenna', motor=num_motor, action='head')
+            t_phase = self._phase_start()
 
             found_head = False
-            max_distance = _DRIVERS_MAX[self._antenna_number[num_motor]]
-
-            print("Moving FORWARD")
-
-            for steps in range(self._dist2steps(max_distance)):
-
-                self.forward(num_motor)
-
-                pin_value.append(GPIO.input(self._pin_switch))
-                if pin_value[-1] == 0:
-                    plot_pin = self.plot_pin_states
-                    print("Pressed switch")
-
-                    for _ in range(self.pin_checks):
-                        extra_steps, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=False)
-
-                        steps_switch_off += extra_steps
-
-                    pin_value.append(GPIO.input(self._pin_switch))
-                    if pin_value[-1] == 1:
-
-                        print("Switch released, {:2f} mm needed".format(
-                            self._steps2dist(steps_switch_off)))
-
-                        print('Antenna is set on head')
-
-                        found_head = True
-                        break
-                    else:
-                        msg = "Unstable Switch State, Repeat Initialization"
-                        warnings.warn(msg, UserWarning)
-                        print(msg)
-                        _, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
+            inner = self._inner[num_motor]
+
+            if predicted[num_motor] is not None:
+                found_head, pin_value = self._probe_head(
+                    num_motor, predicted[num_motor], pin_value)
+
+            _log.debug('Moving FORWARD')
+
+            # search the remaining travel (the full range when starting from
+            # home), at most `pin_checks` contacts
+            for _ in range(0 if found_head else self.pin_checks):
+                max_steps = self._dist2steps(
+                    self._antenna_pos[num_motor] - inner, self._cruise_style)
+                if max_steps <= 0:
+                    break
+                pressed, pin_value = self._approach_switch(
+                    num_motor, True, pin_value, max_steps=max_steps)
+                if not pressed:
+                    break
+
+                plot_pin = self.plot_pin_states
+                found_head, pin_value = self._release_switch(
+                    num_motor, pin_value, forward=False)
+                if found_head:
+                    _log.info('Antenna is set on head')
+                    break
 
             if not found_head:
-                print('Antenna did NOT find head')
+                _log.warning('Antenna did NOT find head')
+            self._head_positions[num_motor] = \
+                self._antenna_pos[num_motor] if found_head else None
 
-            self._steppers[num_motor].release()
+            self._release(num_motor)
+            self._phase_end('head', num_motor, t_phase)
 
-            pin_value = self.check_pin(pin_value)
+            pin_value = self.check_pin(pin_value, num_motor=num_motor)
             all_pin_value.append(pin_value)
 
             self._update_move(init_pos - self._antenna_pos[num_motor])
 
             if pauses:
-                pause()
+                self._pause()
 
         if plot_pin:
             fig, axs = plt.subplots(len(self._motor_id), figsize=(10, 20))
@@ -959,18 +1766,22 @@ class MotorControl:
             fig.tight_layout(pad=5.0)
             plt.show()
 
+    @traced('motor')
     def move_forward(self, motor, distance, pauses=True, plot_pin=False):
         """Moves motor forward
 
         This method moves the specified motor forward towards the head for
         the specified distance in millimeters. If the distance is larger
-        than the maximum distance that the motor can move (_DRIVERS_MAX),
+        than the maximum distance that the motor can move (`layout` travel),
         the motor will move until it reaches the end. While moving forward,
         if the head is detected (based on the switch status), the motor
         will back off until the switch is released.
 
         If the value of the `motor` parameter is 100, the method moves all
-        the motors in the `_steppers` list the same distance.
+        the motors in the `_steppers` list the same distance. Without
+        `pauses` the antennas move concurrently with the `scheduler` (the
+        longest moves first, see `move_to_positions`); set `scheduler` to
+        ``None`` to move them one after the other in index order.
 
         Args:
             plot_pin:
@@ -993,7 +1804,7 @@ class MotorControl:
               `check_pin`, `new_position`, and `pause` methods to perform
               the motor movement.
             - The method takes into account the maximum distance that the
-              motor can move (_DRIVERS_MAX) and adjusts the distance if it
+              motor can move (`layout` travel) and adjusts the distance if it
               exceeds this limit.
             - The method checks the switch status using the GPIO input to
               detect the head.
@@ -1004,76 +1815,65 @@ class MotorControl:
             - Pauses after each motor movement can be controlled using the
               `pauses` parameter.
         """
-        print("---------------------")
-        print("FORWARD")
-        print("---------------------\n")
+        _log.info('----- FORWARD -----')
 
         start_motor = motor
         end_motor = motor + 1
         if motor == 100:
+            if self.scheduler is not None and not pauses:
+                self.move_to_positions(
+                    [pos - distance for pos in self._antenna_pos])
+                return
             start_motor = 0
             end_motor = len(self._steppers)
         all_pin_value = []
         for num_motor in range(start_motor, end_motor):
 
             pin_value = []
-            steps_switch_off = 0
 
             init_pos = self._antenna_pos[num_motor]
 
-            print("----- Antenna {:d} -----".
-                  format(self._antenna_number[num_motor]))
+            _log.info('Antenna %d', self._antenna_number[num_motor])
+            self._notify('antenna', motor=num_motor, action='forward')
+            t_phase = self._phase_start()
 
             if self._antenna_pos[num_motor] - distance < \
-                    _INNER_DIST[self._antenna_number[num_motor]]:
-                print("> Antenna CANNOT MOVE THAT CLOSE, reaching closest "
-                      "point")
+                    self._inner[num_motor]:
+                _log.info('Antenna CANNOT MOVE THAT CLOSE, reaching closest '
+                          'point')
 
-                distance = self._antenna_pos[num_motor] - _INNER_DIST[
-                    self._antenna_number[num_motor]]
+                distance = self._antenna_pos[num_motor] - self._inner[num_motor]
 
-            print("Moving FORWARD")
+            _log.debug('Moving FORWARD')
 
-            for _ in range(self._dist2steps(distance)):
+            rate = self.step_rate[num_motor]
+            last = 0.
+            for style in self._move_styles(distance):
 
-                self.forward(num_motor)
+                last = self._pace(rate, last)
+                self.forward(num_motor, style)
 
-                pin_value.append(GPIO.input(self._pin_switch))
+                pin_value.append(self._read_switch(num_motor))
                 if pin_value[-1] == 0:
 
                     plot_pin = self.plot_pin_states
-                    print("Pressed switch")
-
-                    for _ in range(self.pin_checks):
-                        extra_steps, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=False)
-
-                        steps_switch_off += extra_steps
-
-                    pin_value.append(GPIO.input(self._pin_switch))
-                    if pin_value[-1] == 1:
+                    self._switch_pressed(num_motor)
 
-                        print("Switch released, {:2f} mm needed".format(
-                            self._steps2dist(steps_switch_off)))
+                    released, pin_value = self._release_switch(
+                        num_motor, pin_value, forward=False)
+                    if released:
                         break
-                    else:
-                        msg = "Unstable Switch State, Repeat Initialization"
-                        warnings.warn(msg, UserWarning)
-                        print(msg)
-                        _, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
 
-            self._steppers[num_motor].release()
+            self._release(num_motor)
+            self._phase_end('forward', num_motor, t_phase)
 
-            pin_value = self.check_pin(pin_value)
+            pin_value = self.check_pin(pin_value, num_motor=num_motor)
             all_pin_value.append(pin_value)
 
             self._update_move(init_pos - self._antenna_pos[num_motor])
 
             if pauses:
-                pause()
+                self._pause()
 
         if plot_pin:
             fig, axs = plt.subplots(len(self._motor_id), figsize=(10, 20))
@@ -1083,17 +1883,21 @@ class MotorControl:
             fig.tight_layout(pad=5.0)
             plt.show()
 
+    @traced('motor')
     def move_backward(self, motor, distance, pauses=True, plot_pin=False):
         """Moves motor backward.
 
         This method moves the specified motor backward (opposite of the
         head) for the specified distance in millimeters. If the distance
         is larger than the maximum distance that the motor can move (
-        _DRIVERS_MAX), the motor will move until it reaches the switch and
+        `layout` travel), the motor will move until it reaches the switch and
         then back off until the switch is released.
 
         If the value of the `motor` parameter is 100, the method moves all
-        the motors in the `_steppers` list the same distance.
+        the motors in the `_steppers` list the same distance. Without
+        `pauses` the antennas move concurrently with the `scheduler` (the
+        longest moves first, see `move_to_positions`); set `scheduler` to
+        ``None`` to move them one after the other in index order.
 
         Args:
             plot_pin:
@@ -1116,7 +1920,7 @@ class MotorControl:
               check_pin`, `new_position`, and `pause` methods to perform the
               motor movement.
             - The method takes into account the maximum distance that the
-              motor can move (_DRIVERS_MAX) and adjusts the distance if it
+              motor can move (`layout` travel) and adjusts the distance if it
               exceeds this limit.
             - The method checks the switch status using the GPIO input to
               detect when the motor reaches the switch.
@@ -1128,14 +1932,16 @@ class MotorControl:
             - Pauses after each motor movement can be controlled using the
               `pauses` parameter.
         """
-        print("---------------------")
-        print("BACKWARD")
-        print("---------------------\n")
+        _log.info('----- BACKWARD -----')
 
         start_motor = motor
         end_motor = motor + 1
 
         if motor == 100:
+            if self.scheduler is not None and not pauses:
+                self.move_to_positions(
+                    [pos + distance for pos in self._antenna_pos])
+                return
             start_motor = 0
             end_motor = len(self._steppers)
 
@@ -1143,63 +1949,52 @@ class MotorControl:
         for num_motor in range(start_motor, end_motor):
 
             pin_value = []
-            steps_switch_off = 0
 
             init_pos = self._antenna_pos[num_motor]
 
-            print("----- Antenna {:d} -----".format(
-                self._antenna_number[num_motor]))
+            _log.info('Antenna %d', self._antenna_number[num_motor])
+            self._notify('antenna', motor=num_motor, action='backward')
+            t_phase = self._phase_start()
 
             distance_head = distance
             if self._antenna_pos[num_motor] + distance > \
-                    _OUTER_DIST[self._antenna_number[num_motor]]:
-                print("> Antenna CANNOT MOVE AWAY THAT MUCH, reaching home "
-                      "position")
+                    self._outer[num_motor]:
+                _log.info('Antenna CANNOT MOVE AWAY THAT MUCH, reaching home '
+                          'position')
 
-                distance_head = _OUTER_DIST[self._antenna_number[
-                    num_motor]] - self._antenna_pos[num_motor]
+                distance_head = self._outer[num_motor] - self._antenna_pos[num_motor]
 
-            print("Moving BACKWARD")
-            for _ in range(self._dist2steps(distance_head)):
+            _log.debug('Moving BACKWARD')
+            rate = self.step_rate[num_motor]
+            last = 0.
+            for style in self._move_styles(distance_head):
 
-                self.backward(num_motor)
+                last = self._pace(rate, last)
+                self.backward(num_motor, style)
 
-                pin_value.append(GPIO.input(self._pin_switch))
+                pin_value.append(self._read_switch(num_motor))
                 if pin_value[-1] == 0:
 
                     plot_pin = self.plot_pin_states
-                    print("Pressed switch")
-
-                    for _ in range(self.pin_checks):
-                        extra_steps, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
-
-                        steps_switch_off += extra_steps
+                    self._switch_pressed(num_motor)
+                    # the home switch should not be reached
+                    self._distrust(num_motor, 'switch pressed moving backward')
 
-                    pin_value.append(GPIO.input(self._pin_switch))
-                    if pin_value[-1] == 1:
-
-                        print("Switch released, {:2f} mm needed".format(
-                            self._steps2dist(steps_switch_off)))
+                    released, pin_value = self._release_switch(
+                        num_motor, pin_value, forward=True)
+                    if released:
                         break
-                    else:
-                        msg = "Unstable Switch State, Repeat Initialization"
-                        warnings.warn(msg, UserWarning)
-                        print(msg)
-                        _, pin_value = self.move_switch_off(
-                            num_motor=num_motor, pin_value=pin_value,
-                            forward=True)
 
-            self._steppers[num_motor].release()
+            self._release(num_motor)
+            self._phase_end('backward', num_motor, t_phase)
 
-            pin_value = self.check_pin(pin_value)
+            pin_value = self.check_pin(pin_value, num_motor=num_motor)
             all_pin_value.append(pin_value)
 
             self._update_move(init_pos - self._antenna_pos[num_motor])
 
             if pauses:
-                pause()
+                self._pause()
 
         if plot_pin:
             fig, axs = plt.subplots(len(self._motor_id), figsize=(10, 20))
@@ -1209,6 +2004,52 @@ class MotorControl:
             fig.tight_layout(pad=5.0)
             plt.show()
 
+    @traced('motor')
+    def move_to_positions(self, targets, pauses=False):
+        """Moves several antennas to the given positions.
+
+        The moves are run concurrently by the `scheduler`, which logs the
+        predicted time before moving. With `pauses` (or without scheduler)
+        the antennas move one after the other with `move_forward` and
+        `move_backward`. Positions out of the range of an antenna are
+        limited to the range.
+
+        Args:
+            targets (list or dict): The target position (distance from the
+                center in mm) of every antenna (``None`` to stay) or a dict
+                with the positions of some of the motor indices.
+            pauses (bool, optional): Flag indicating whether to pause after
+                each motor movement. Defaults to False.
+
+        Returns:
+            None
+
+        Example:
+            >>> obj = MotorControl()
+            >>> obj.move_to_positions({0: 90., 4: 90.})
+        """
+        if not isinstance(targets, dict):
+            targets = dict(enumerate(targets))
+
+        limited = {}
+        for num_motor, target in targets.items():
+            if target is None:
+                continue
+            limited[num_motor] = min(max(target, self._inner[num_motor]),
+                                     self._outer[num_motor])
+
+        if self.scheduler is None or pauses:
+            for num_motor, target in limited.items():
+                distance = self._antenna_pos[num_motor] - target
+                if distance > 0:
+                    self.move_forward(num_motor, distance, pauses=pauses)
+                else:
+                    self.move_backward(num_motor, -distance, pauses=pauses)
+            return
+
+        self.scheduler.run(self, limited)
+
+    @traced('motor')
     def create_circle(self, distance_from_head=1, pauses=True):
         """Creates circle that the closest antenna is distance_from_head
             away from the head.
@@ -1240,50 +2081,40 @@ class MotorControl:
             (Circle movement is performed)
 
         Note:
-            - The method utilizes the `set_on_head`, `move_backward`,
-              and `release` methods to create the circle.
+            - The method utilizes the `set_on_head` and
+              `move_to_positions` methods to create the circle.
             - The `set_on_head` method is called initially to position the
               antennas on the head.
-            - The `move_backward` method is used to move each antenna
-              backward
-              by a distance equal to the difference
-              between the target point (calculated based on the maximum
-              motor position and `distance_from_head`) and the current
-              motor position.
-            - The `release` method is called to release the motor after each
-              backward movement.
-            - If the target point exceeds the maximum limit (_DRIVERS_MAX),
+            - The `move_to_positions` method is used to move every antenna
+              backward to the target point (calculated based on the maximum
+              motor position and `distance_from_head`).
+            - If the target point exceeds the maximum limit (`layout` travel),
               the method creates the circle with the maximum possible
-              radius by setting the target point to _DRIVERS_MAX.
+              radius by setting the target point to the closest home position.
             - Pauses after each motor movement can be controlled using the
               `pauses` parameter.
         """
-        print("---------------------")
-        print("CIRCLE")
-        print("---------------------\n")
+        _log.info('----- CIRCLE -----')
 
         self.set_on_head(pauses=pauses)
 
-        if max(self._antenna_pos) > min(_OUTER_DIST):
+        if max(self._antenna_pos) > min(self._outer):
             index_max = np.argmax(self._antenna_pos)
             msg = "CANNOT CREATE CIRCLE, Antenna {:d} is further than some " \
                   "antennas can possible reach".format(index_max)
             warnings.warn(msg, UserWarning)
-            print(msg)
         else:
 
             target_point = max(self._antenna_pos) + distance_from_head
             index_max = np.argmax(self._antenna_pos)
 
-            print("MAX DISTANCE is from Antenna {:d}".format(index_max))
-            if target_point > min(_OUTER_DIST):
-                print('!! Creating Max Circle !!')
-                target_point = min(_OUTER_DIST)
+            _log.info('MAX DISTANCE is from Antenna %d', index_max)
+            if target_point > min(self._outer):
+                _log.info('!! Creating Max Circle !!')
+                target_point = min(self._outer)
 
-            for num_motor in range(len(self._motor_id)):
-                self.move_backward(num_motor, target_point - self._antenna_pos[
-                    num_motor], pauses=pauses)
-                self._steppers[num_motor].release()
+            self.move_to_positions([target_point] * len(self._motor_id),
+                                   pauses=pauses)
 
     def solve_ellipse_system(self, a, b, c, centroid_x, centroid_y,
                                    num_motor):
@@ -1296,10 +2127,10 @@ class MotorControl:
         and `num_motor`. It calculates the coordinates (x, y) and the
         distance from the center for the specified antenna.
 
-        First, we construct the ellipse's and driver's equation.
-        After that, we want to find the x, y possible solutions of the 2x2
-        system. We expect two solutions. We keep the correct solution based
-        on the antenna number.
+        The driver is the ray from the center in the direction of the
+        antenna (see `ray_ellipse_distance`). Of the two crossings with the
+        ellipse we keep the one in the direction of the antenna, which works
+        for any `layout`.
 
         Args:
             a (float): Coefficient of the ellipse equation.
@@ -1328,87 +2159,35 @@ class MotorControl:
               coefficients and centroid coordinates.
             - It also calculates the driver equation based on the antenna
               angle obtained from the `get_angle` method.
-            - The equation system is solved using the `solve` function from
-              `sympy`.
-            - The resulting solutions are rounded and used to determine the
-              x and y coordinates of the ellipse intersection.
-            - The specific x and y values are assigned based on the antenna
-              number.
-            - The distance from the center is calculated by subtracting the
-              inner distance (obtained from `_INNER_DIST`)
-              from the Euclidean distance between the x and y coordinates.
+            - The crossing in the direction of the antenna is rounded to
+              the x and y coordinates of the ellipse intersection.
+            - The distance is calculated by subtracting the current antenna
+              position from the Euclidean distance between the x and y
+              coordinates.
         """
-        print("Antenna {:d}".format(self._antenna_number[num_motor]))
-
-        tanth = np.tan(np.radians(self.get_angle(num_motor)))
-        cp2 = a + 2. * b * tanth + c * tanth * tanth
-        cp1 = a * centroid_x + b * (centroid_x * tanth + centroid_y)
-        cp1 += c * centroid_y * tanth
-        cp1 *= -2.
-        cp0 = a * centroid_x * centroid_x
-        cp0 += 2. * b * centroid_x * centroid_y
-        cp0 += c * centroid_y * centroid_y - 1.
-
-        xsol = np.roots([cp2, cp1, cp0])
-        ysol = xsol * tanth
-
-        sol = [(xsol[0], ysol[0]), (xsol[1], ysol[1])]
-
-        if len(sol) == 2:
-
-            if not (isinstance(sol[0][0], complex) or
-                    isinstance(sol[1][0], complex) or
-                    isinstance(sol[0][1], complex) or
-                    isinstance(sol[0][1], complex)):
-
-                x1 = int(round(sol[0][0]))
-                y1 = int(round(sol[0][1]))
-
-                x2 = int(round(sol[1][0]))
-                y2 = int(round(sol[1][1]))
-
-                if self._antenna_number[num_motor] == 0:
-                    x = 0
-                    y = y1 if y1 > 0 else y2
-                elif self._antenna_number[num_motor] == 1:
-                    x = x1 if x1 > 0 else x2
-                    y = x
-                elif self._antenna_number[num_motor] == 2:
-                    x = x1 if x1 > 0 else x2
-                    y = 0
-                elif self._antenna_number[num_motor] == 3:
-                    x = x1 if x1 > 0 else x2
-                    y = -x
-                elif self._antenna_number[num_motor] == 4:
-                    x = 0
-                    y = y1 if y1 < 0 else y2
-                elif self._antenna_number[num_motor] == 5:
-                    x = x1 if x1 < 0 else x2
-                    y = x
-                elif self._antenna_number[num_motor] == 6:
-                    x = x1 if x1 < 0 else x2
-                    y = 0
-                else:
-                    x = x1 if x1 < 0 else x2
-                    y = - x
+        _log.debug('Antenna %d', self._antenna_number[num_motor])
 
-                return x, y, round(np.sqrt(np.square(x) +
-                                           np.square(y)) - self._antenna_pos[
-                                       num_motor])
-            else:
-                msg = 'Found Complex Solutions in Equation System'
-                warnings.warn(msg, UserWarning)
-                print(msg)
-                self.__del__()
-                sys.exit()
-        else:
-            msg = 'Number of Solutions in Equation system must be == 2, ' \
-                  'found ' + str(len(sol))
+        a_matrix = np.array([[a, b], [b, c]])
+        dist = ray_ellipse_distance(a_matrix, np.array([centroid_x,
+                                                        centroid_y]),
+                                    [self.get_angle(num_motor)])[0]
+
+        if np.isnan(dist):
+            msg = 'Found Complex Solutions in Equation System'
             warnings.warn(msg, UserWarning)
-            print(msg)
             self.__del__()
             sys.exit()
 
+        # the crossing in the direction of the antenna
+        x, y = dist2coordinates(dist, self.get_angle(num_motor))
+        x = int(round(x))
+        y = int(round(y))
+
+        return x, y, round(np.sqrt(np.square(x) +
+                                   np.square(y)) - self._antenna_pos[
+                               num_motor])
+
+    @traced('motor')
     def create_ellipse(self, distance_from_head=1, pauses=True, plot=True):
         """This method finds the outer ellipse (around the head) equation
             parameters based on the positions of the antennas.
@@ -1451,7 +2230,7 @@ class MotorControl:
             - If the distance from the center plus the current motor
               position exceeds a threshold, a warning message is printed.
             - The antennas are then moved backward to their respective
-              ellipse positions.
+              ellipse positions (see `move_to_positions`).
             - If the move distance is negative, the method exits with an
               error message.
             - If the `plot` flag is set to True, the method calls the
@@ -1461,8 +2240,8 @@ class MotorControl:
         Raises:
             SystemExit: If the number of antenna points is less than 3.
         """
-        print("> Creating Ellipse...\n\n")
-        print("> We set antennas on Head...")
+        _log.info('Creating Ellipse...')
+        _log.info('We set antennas on Head...')
 
         self.set_on_head(pauses=pauses)
 
@@ -1470,60 +2249,59 @@ class MotorControl:
                            distance=distance_from_head,
                            pauses=pauses)
         if len(self._motor_id) == 2:
-            print("Cannot Compute Ellipse from only 2 points")
+            _log.warning('Cannot Compute Ellipse from only 2 points')
         else:
-            print("Calculating Outer ellipse")
-            a_outer, centroid_outer = outer_ellipsoid_fit(
-                np.array(self._antenna_coords))
+            _log.info('Calculating Outer ellipse')
+            with span('fit ellipse', 'motor'):
+                a_outer, centroid_outer = outer_ellipsoid_fit(
+                    np.array(self._antenna_coords))
             a = a_outer[0][0]
             b = a_outer[0][1]
             c = a_outer[1][1]
             c_x = centroid_outer[0]
             c_y = centroid_outer[1]
+            self._notify('ellipse', matrix=a_outer, centroid=centroid_outer)
 
             if np.square(b) - 4 * a * c >= 0:
-                print("Ellipse does NOT correspond to the condition")
+                _log.error('Ellipse does NOT correspond to the condition')
                 self.__del__()
                 sys.exit()
 
             x_coords = []
             y_coords = []
+            targets = {}
 
             for num_motor in range(len(self._motor_id)):
-                x, y, distance = self.solve_ellipse_system(a=a,
-                                                           b=b,
-                                                           c=c,
-                                                           centroid_x=c_x,
-                                                           centroid_y=c_y,
-                                                           num_motor=num_motor)
+                with span('solve ellipse', 'motor',
+                          antenna=self._antenna_number[num_motor]):
+                    x, y, distance = self.solve_ellipse_system(
+                        a=a, b=b, c=c, centroid_x=c_x, centroid_y=c_y,
+                        num_motor=num_motor)
 
                 x_coords.append(x)
                 y_coords.append(y)
 
                 if distance + self._antenna_pos[num_motor] > \
-                        _OUTER_DIST[self._antenna_number[num_motor]]:
-                    print("We are moving antenna to MAX distance, "
-                          "wont correspond to Ellipse equation")
+                        self._outer[num_motor]:
+                    _log.info('We are moving antenna to MAX distance, '
+                              'wont correspond to Ellipse equation')
                     distance = \
-                        _OUTER_DIST[self._antenna_number[num_motor]] - \
+                        self._outer[num_motor] - \
                         self._antenna_pos[num_motor]
 
                 if distance >= 0:
-
-                    self.move_backward(motor=num_motor,
-                                       distance=distance,
-                                       pauses=pauses)
+                    targets[num_motor] = self._antenna_pos[num_motor] + \
+                        distance
                 elif 0 > distance > -2:
-
-                    self.move_backward(motor=num_motor,
-                                       distance=0,
-                                       pauses=pauses)
+                    targets[num_motor] = self._antenna_pos[num_motor]
                 else:
                     msg = "Cannot move NEGATIVE distance {:2f}".format(distance)
                     warnings.warn(msg, UserWarning)
-                    print(msg)
                     self.__del__()
                     sys.exit()
+
+            self.move_to_positions(targets, pauses=pauses)
             if plot:
-                self.plot_ellipse_antennas(x_coordinates=x_coords,
-                                           y_coordinates=y_coords)
+                with span('plot ellipse', 'motor'):
+                    self.plot_ellipse_antennas(x_coordinates=x_coords,
+                                               y_coordinates=y_coords)
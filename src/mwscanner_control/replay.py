@@ -0,0 +1,180 @@
+import gzip
+import json
+import time
+import warnings
+
+_VERSION = 1
+
+
+class RecordedError(OSError):
+    """An exchange that failed in the recorded session.
+
+    Raised by `ReplayResource` in place of the original error (e.g. a VISA
+    timeout), so that the error handling can be replayed as well.
+    """
+
+
+class SessionRecorder(object):
+    """Records the SCPI traffic of a VISA resource.
+
+    Wraps the resource opened by `RSVNAControl.connect`: every ``write`` and
+    ``query`` is forwarded and written to a gzip compressed file of JSON
+    lines with the command, the response (or the error) and the timing. The
+    other attributes are passed through unchanged (and not recorded).
+
+    Every exchange is flushed to the file, so that the session can be
+    replayed up to a crash. The recorder is closed with the resource (by
+    `RSVNAControl.disconnect`) or used as a context manager.
+
+    Args:
+        resource (pyvisa.resources.Resource): The resource to record.
+        path (str): The file, e.g. ``'session.scpi.gz'``.
+        link (str, optional): The link, stored in the header of the file.
+    """
+
+    def __init__(self, resource, path, link=None):
+        self._resource = resource
+        self._fid = gzip.open(path, 'wt')
+        self._start = time.perf_counter()
+        self._dump({'version': _VERSION, 'link': link,
+                    'created': time.time()})
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _dump(self, record):
+        self._fid.write(json.dumps(record, separators=(',', ':')) + '\n')
+        self._fid.flush()
+
+    def _record(self, operation, cmd, resp, start, error=None):
+        end = time.perf_counter()
+        record = {'op': operation, 'cmd': cmd, 'resp': resp,
+                  't': start - self._start, 'dt': end - start}
+        if error is not None:
+            record['error'] = type(error).__name__
+            record['message'] = str(error)
+        self._dump(record)
+
+    def write(self, cmd, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            result = self._resource.write(cmd, *args, **kwargs)
+        except Exception as exc:
+            self._record('write', cmd, None, start, error=exc)
+            raise
+        self._record('write', cmd, None, start)
+        return result
+
+    def query(self, cmd, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            resp = self._resource.query(cmd, *args, **kwargs)
+        except Exception as exc:
+            self._record('query', cmd, None, start, error=exc)
+            raise
+        self._record('query', cmd, resp, start)
+        return resp
+
+    def detach(self):
+        """Closes the recorded resource, but not the recording.
+
+        The recording goes on with the resource given to `attach`, e.g.
+        after `RSVNAControl.reconnect`.
+        """
+        resource, self._resource = self._resource, None
+        if resource is not None:
+            resource.close()
+
+    def attach(self, resource):
+        """Records the traffic of `resource` from now on."""
+        self._resource = resource
+
+    def close(self):
+        try:
+            self.detach()
+        finally:
+            self._fid.close()
+
+
+class ReplayResource(object):
+    """Serves the responses of a recorded session (see `SessionRecorder`).
+
+    Stands in for the VISA resource of `RSVNAControl`, so that the setup,
+    parsing and scan pipelines can be run and profiled without the
+    instrument. The commands must come in the recorded order. The exchanges
+    that failed raise a `RecordedError`. A recording that was not closed
+    (e.g. after a crash) is replayed up to the last complete exchange.
+
+    Args:
+        path (str): The recorded file.
+        speed (float, optional): Replays the duration of every exchange
+            divided by `speed` (1 for the original timing). Defaults to
+            ``None``, no waiting.
+        strict (bool, optional): Raise if a command differs from the
+            recording. Defaults to ``True``, otherwise the command is
+            answered with the recorded response anyway.
+
+    Attributes:
+        header (dict): The header of the recording.
+    """
+
+    def __init__(self, path, speed=None, strict=True):
+        with gzip.open(path, 'rt') as fid:
+            self.header = json.loads(fid.readline())
+            self._records = []
+            try:
+                for line in fid:
+                    self._records.append(json.loads(line))
+            except (EOFError, ValueError):
+                msg = 'The recording is truncated after {:d} exchanges'
+                warnings.warn(msg.format(len(self._records)), RuntimeWarning)
+        if self.header.get('version') != _VERSION:
+            msg = 'Unknown version {} of the recording'
+            raise ValueError(msg.format(self.header.get('version')))
+        self.speed = speed
+        self.strict = strict
+        self._next = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def remaining(self):
+        """int: Number of exchanges not replayed yet."""
+        return len(self._records) - self._next
+
+    def _replay(self, operation, cmd):
+        if self._next >= len(self._records):
+            raise RuntimeError('Recording exhausted at {:s} {!r}'.format(
+                operation, cmd))
+        record = self._records[self._next]
+        if (record['op'], record['cmd']) != (operation, cmd):
+            msg = 'Exchange {:d} differs from the recording: {:s} {!r} ' \
+                  'instead of {:s} {!r}'
+            msg = msg.format(self._next, operation, cmd, record['op'],
+                             record['cmd'])
+            if self.strict:
+                raise RuntimeError(msg)
+        self._next += 1
+        if self.speed:
+            time.sleep(record['dt'] / self.speed)
+        if 'error' in record:
+            raise RecordedError('{:s}: {:s}'.format(record['error'],
+                                                    record['message']))
+        return record['resp']
+
+    def write(self, cmd, *args, **kwargs):
+        self._replay('write', cmd)
+        return len(cmd)
+
+    def query(self, cmd, *args, **kwargs):
+        return self._replay('query', cmd)
+
+    def close(self):
+        pass
@@ -0,0 +1,263 @@
+import collections
+import heapq
+import itertools
+import time
+import warnings
+
+from .logs import get_logger
+from .tracing import TRACER
+
+_log = get_logger('scheduler')
+
+# Steppers moving (energized) at the same time, e.g. limited by the supply
+_MAX_ENERGIZED = 2
+# Steps/s of all the hats together (they share one I2C bus)
+_BUS_STEP_RATE = 500.
+# Duration of one step (the I2C transfer) when there are no statistics
+_STEP_SECONDS = 2.5e-3
+
+
+class _Job(object):
+    """The move of one antenna to a target position."""
+
+    __slots__ = ('motor', 'target', 'rate', 'forward', 'steps', 'styles',
+                 'start')
+
+    def __init__(self, motor_control, motor, target):
+        self.motor = motor
+        self.target = target
+        self.rate = motor_control.step_rate[motor]
+        self.start = 0
+        self.restart(motor_control)
+
+    def restart(self, motor_control):
+        """Plans the steps from the current position to the target."""
+        distance = motor_control.positions[self.motor] - self.target
+        self.forward = distance > 0
+        styles = list(motor_control._move_styles(abs(distance)))
+        self.steps = len(styles)
+        self.styles = iter(styles)
+
+    def duration(self, step_seconds):
+        """Estimated duration in s when moving alone."""
+        interval = 1. / self.rate if self.rate else 0.
+        return self.steps * max(interval, step_seconds)
+
+
+class MotionScheduler(object):
+    """Moves several antennas concurrently under power and bus limits.
+
+    At most `max_energized` steppers move at the same time and the steps of
+    all of them are interleaved in one thread, so that the I2C bus shared by
+    the hats never has more than `bus_step_rate` steps/s. Each antenna keeps
+    its own `MotorControl.step_rate`. The longest moves are started first
+    (LPT order), which keeps the total time close to the minimum.
+
+    The switch pin is shared by all antennas: when it is pressed during
+    concurrent moves, the moving antennas back off one after the other to
+    find the one that touched it. That move ends (as in
+    `MotorControl.move_forward`/`move_backward`) and the others continue.
+
+    Attributes:
+        max_energized (int): Maximum number of steppers moving at once.
+        bus_step_rate (float): Step budget of the bus in steps/s (``None``
+            for no limit).
+        step_seconds (float): Duration of one step used by `predict` when
+            the `MotorControl.stats` have no measurement.
+
+    Args:
+        max_energized (int, optional): Defaults to 2.
+        bus_step_rate (float, optional): Defaults to 500.
+        step_seconds (float, optional): Defaults to 2.5e-3.
+
+    Example:
+        >>> obj = MotorControl()
+        >>> obj.scheduler = MotionScheduler(max_energized=4)
+        >>> obj.scheduler.predict(obj, {0: 90., 1: 80.})
+        >>> obj.move_to_positions({0: 90., 1: 80.})
+    """
+
+    def __init__(self, max_energized=_MAX_ENERGIZED,
+                 bus_step_rate=_BUS_STEP_RATE, step_seconds=_STEP_SECONDS):
+        if max_energized < 1:
+            raise ValueError('max_energized must be at least 1')
+        self.max_energized = max_energized
+        self.bus_step_rate = bus_step_rate
+        self.step_seconds = step_seconds
+
+    def _step_seconds(self, motor_control):
+        """Duration of one step of every motor, measured if possible."""
+        durations = []
+        for motor in motor_control.stats.snapshot()['motors']:
+            hist = motor['onestep_ns']
+            durations.append(hist['mean_ns'] * 1.e-9 if hist['count'] else
+                             self.step_seconds)
+        return durations
+
+    def plan(self, motor_control, targets):
+        """Creates the moves, longest first.
+
+        Args:
+            motor_control (MotorControl): The controller.
+            targets (dict): Target position (in mm) of each motor index.
+
+        Returns:
+            list: The moves that need at least one step.
+        """
+        step_seconds = self._step_seconds(motor_control)
+        jobs = [_Job(motor_control, motor, target)
+                for motor, target in targets.items()]
+        jobs = [job for job in jobs if job.steps]
+        jobs.sort(key=lambda job: job.duration(step_seconds[job.motor]),
+                  reverse=True)
+        return jobs
+
+    def _simulate(self, jobs, step_seconds):
+        """Runs the schedule with estimated step durations, returns the
+        total time in s."""
+        bus_interval = 1. / self.bus_step_rate if self.bus_step_rate else 0.
+        pending = collections.deque(jobs)
+        active = []
+        order = itertools.count()
+        now = bus_next = 0.
+        while pending or active:
+            while pending and len(active) < self.max_energized:
+                job = pending.popleft()
+                heapq.heappush(active, (now, next(order), job, job.steps))
+            next_time, key, job, left = heapq.heappop(active)
+            start = max(now, next_time, bus_next)
+            now = start + step_seconds[job.motor]
+            bus_next = start + bus_interval
+            if left > 1:
+                interval = 1. / job.rate if job.rate else 0.
+                heapq.heappush(active, (start + interval, key, job, left - 1))
+        return now
+
+    def predict(self, motor_control, targets):
+        """Predicts the time needed to reach the `targets`.
+
+        Args:
+            motor_control (MotorControl): The controller.
+            targets (dict): Target position (in mm) of each motor index.
+
+        Returns:
+            float: The predicted duration in s.
+        """
+        return self._simulate(self.plan(motor_control, targets),
+                              self._step_seconds(motor_control))
+
+    def _find_pressed(self, motor_control, jobs, pin_value):
+        """Backs off the moving antennas one by one until the switch is
+        released.
+
+        Returns:
+            tuple: The job of the antenna that pressed the switch (``None``
+            if not found) and the switch readings.
+        """
+        mc = motor_control
+        if len(jobs) == 1:
+            job = jobs[0]
+            released, pin_value = mc._release_switch(job.motor, pin_value,
+                                                     forward=not job.forward)
+            return (job if released else None), pin_value
+
+        for job in jobs:
+            backoff = mc._dist2steps(mc.homing_backoff[job.motor],
+                                     mc.approach_style)
+            for _ in range(backoff):
+                mc._step(job.motor, not job.forward, style=mc.approach_style)
+                pin_value.append(mc._read_switch(job.motor))
+                if pin_value[-1] == 1:
+                    break
+            if pin_value[-1] == 1:
+                released, pin_value = mc._release_switch(
+                    job.motor, pin_value, forward=not job.forward)
+                return (job if released else None), pin_value
+        return None, pin_value
+
+    def run(self, motor_control, targets):
+        """Moves the antennas to the `targets`.
+
+        The predicted duration is logged (and sent as a ``'schedule'``
+        progress event) before moving.
+
+        Args:
+            motor_control (MotorControl): The controller.
+            targets (dict): Target position (in mm) of each motor index.
+
+        Returns:
+            float: The elapsed time in s.
+        """
+        mc = motor_control
+        jobs = self.plan(mc, targets)
+        predicted = self._simulate(jobs, self._step_seconds(mc))
+        _log.info('%d moves, predicted time %.2f s', len(jobs), predicted)
+        mc._notify('schedule', moves=len(jobs), predicted=predicted)
+
+        t_run = time.perf_counter()
+        t_trace = mc._phase_start()
+        bus_interval = 1. / self.bus_step_rate if self.bus_step_rate else 0.
+        pending = collections.deque(jobs)
+        active = []
+        order = itertools.count()
+        bus_next = 0.
+        pin_value = []
+        while pending or active:
+            while pending and len(active) < self.max_energized:
+                job = pending.popleft()
+                job.start = mc._phase_start()
+                heapq.heappush(active,
+                               (time.perf_counter(), next(order), job))
+
+            next_time, key, job = heapq.heappop(active)
+            style = next(job.styles, None)
+            if style is None:
+                mc._release(job.motor)
+                mc._phase_end('move', job.motor, job.start)
+                continue
+
+            wait = max(next_time, bus_next) - time.perf_counter()
+            if wait > 0.:
+                time.sleep(wait)
+            start = time.perf_counter()
+            bus_next = start + bus_interval
+            mc._step(job.motor, job.forward, style=style)
+
+            pin_value.append(mc._read_switch(job.motor))
+            if pin_value[-1] == 1:
+                interval = 1. / job.rate if job.rate else 0.
+                heapq.heappush(active, (start + interval, key, job))
+                continue
+
+            moving = [job] + [item[2] for item in active]
+            pressed, pin_value = self._find_pressed(mc, moving, pin_value)
+            if pressed is None:
+                for other in moving:
+                    mc._distrust(other.motor, 'switch pressed in a '
+                                              'concurrent move')
+                    mc._release(other.motor)
+                msg = 'Could not find the antenna pressing the switch, ' \
+                      'moves aborted'
+                warnings.warn(msg, UserWarning)
+                break
+
+            mc._switch_pressed(pressed.motor)
+            if not pressed.forward:
+                # the home switch should not be reached
+                mc._distrust(pressed.motor, 'switch pressed moving backward')
+            mc._release(pressed.motor)
+            mc._phase_end('move', pressed.motor, pressed.start)
+
+            # the others continue from where they were backed off
+            active = []
+            now = time.perf_counter()
+            for other in moving:
+                if other is not pressed:
+                    other.restart(mc)
+                    heapq.heappush(active, (now, next(order), other))
+
+        elapsed = time.perf_counter() - t_run
+        TRACER.complete('schedule', 'motor', t_trace, moves=len(jobs),
+                        predicted=predicted)
+        _log.info('Moves done in %.2f s', elapsed)
+        return elapsed
@@ -0,0 +1,222 @@
+import numpy as np
+
+
+def upper_pairs(num_ports):
+    """All the S-parameters of a reciprocal network, in trace order.
+
+    The order is the one of the traces created by `RSVNAControl.setup`
+    (``S11, S12, ..., S1N, S22, ...``).
+
+    Args:
+        num_ports (int): Number of ports.
+
+    Returns:
+        list: The (i, j) pairs (0-based, i <= j).
+
+    Example:
+        >>> upper_pairs(2)
+        [(0, 0), (0, 1), (1, 1)]
+    """
+    return [(ik, ij) for ik in range(num_ports)
+            for ij in range(ik, num_ports)]
+
+
+def trace_pairs(num_ports, traces='all'):
+    """The S-parameters of a group of traces.
+
+    The groups are the windows created by `RSVNAControl.setup`.
+
+    Args:
+        num_ports (int): Number of ports.
+        traces (str or list, optional): ``'all'``, ``'reflection'``
+            (S(i, i)), ``'neighbour'`` (S(i, i + 1) and S(0, N - 1)),
+            ``'transmission'`` (the others) or a list of (i, j) pairs
+            (0-based). Defaults to ``'all'``.
+
+    Returns:
+        list: The (i, j) pairs (i <= j) in trace order, without duplicates.
+
+    Raises:
+        ValueError: If the group is unknown.
+
+    Example:
+        >>> trace_pairs(4, 'neighbour')
+        [(0, 1), (0, 3), (1, 2), (2, 3)]
+    """
+    pairs = upper_pairs(num_ports)
+    if not isinstance(traces, str):
+        wanted = {(min(ik, ij), max(ik, ij)) for ik, ij in traces}
+        for ik, ij in wanted:
+            if ik < 0 or ij >= num_ports:
+                msg = 'S-parameter out of range, S{:d}{:d}'
+                raise IndexError(msg.format(ik + 1, ij + 1))
+        return [pair for pair in pairs if pair in wanted]
+
+    group = traces.lower()
+    if group == 'all':
+        return pairs
+    if group == 'reflection':
+        return [(ik, ij) for ik, ij in pairs if ik == ij]
+
+    neighbour = {(ik, ik + 1) for ik in range(num_ports - 1)}
+    if num_ports > 2:
+        neighbour.add((0, num_ports - 1))
+    if group == 'neighbour':
+        return [pair for pair in pairs if pair in neighbour]
+    if group == 'transmission':
+        return [(ik, ij) for ik, ij in pairs
+                if ik != ij and (ik, ij) not in neighbour]
+    raise ValueError('Unknown group of traces ' + traces)
+
+
+def packed_index(i, j, num_ports):
+    """Row of S(i, j) in the packed upper triangle (vectorized).
+
+    Args:
+        i (int or array_like): The first (0-based) port.
+        j (int or array_like): The second (0-based) port.
+        num_ports (int): Number of ports.
+
+    Returns:
+        int or numpy.ndarray: The rows, S(i, j) and S(j, i) share the row.
+
+    Example:
+        >>> packed_index([0, 1, 2], [2, 1, 1], 3)
+        array([2, 3, 4])
+    """
+    i, j = np.minimum(i, j), np.maximum(i, j)
+    return (i * (2 * num_ports - i + 1)) // 2 + j - i
+
+
+class SMatrix(object):
+    """S-parameters of a reciprocal network in packed storage.
+
+    Only the upper triangle (i <= j) is stored, one row per S-parameter and
+    one column per frequency point, which is about half of the dense
+    ``(freq, N, N)`` array. The rows can be any subset of the S-parameters
+    (e.g. only the reflections, see `RSVNAControl.measure`). The ports are
+    0-based: ``S[0, 1]`` is S12.
+
+    Args:
+        data (numpy.ndarray): The packed S-parameters ``(ntraces, freq)``.
+        num_ports (int): Number of ports.
+        pairs (list, optional): The (i, j) pair of every row of `data`.
+            Defaults to ``None``, all the pairs in trace order (see
+            `upper_pairs`).
+
+    Attributes:
+        data (numpy.ndarray): The packed S-parameters.
+        num_ports (int): Number of ports.
+        pairs (list): The (i, j) pair of every row.
+
+    Example:
+        >>> frequency, sparam = vna.measure(smatrix=True)
+        >>> s12 = sparam[0, 1]            # view of the packed row
+        >>> refl = sparam.reflection      # copy (N, freq)
+        >>> full = sparam.full()          # (freq, N, N)
+    """
+
+    def __init__(self, data, num_ports, pairs=None):
+        if pairs is None:
+            pairs = upper_pairs(num_ports)
+        pairs = [(min(ik, ij), max(ik, ij)) for ik, ij in pairs]
+        data = np.asarray(data)
+        if data.ndim != 2 or data.shape[0] != len(pairs):
+            msg = 'Expecting data of shape ({:d}, freq), got {}'
+            raise ValueError(msg.format(len(pairs), data.shape))
+
+        self.data = data
+        self.num_ports = num_ports
+        self.pairs = pairs
+
+        # (i, j) -> row, -1 for the S-parameters not measured
+        rows = np.full((num_ports, num_ports), -1, dtype=np.intp)
+        for irow, (ik, ij) in enumerate(pairs):
+            if not (0 <= ik and ij < num_ports):
+                msg = 'S-parameter out of range, S{:d}{:d}'
+                raise IndexError(msg.format(ik + 1, ij + 1))
+            rows[ik, ij] = rows[ij, ik] = irow
+        self._rows = rows
+        self._full = None
+
+    def __repr__(self):
+        return 'SMatrix({:d} ports, {:d} traces, {:d} points)'.format(
+            self.num_ports, len(self.pairs), self.data.shape[1])
+
+    def __len__(self):
+        return self.num_ports
+
+    @property
+    def freq_points(self):
+        """int: Number of frequency points."""
+        return self.data.shape[1]
+
+    @property
+    def nbytes(self):
+        """int: Memory of the packed data in bytes."""
+        return self.data.nbytes
+
+    def row(self, i, j):
+        """Row of S(i, j) in `data` (vectorized, -1 if not measured)."""
+        return self._rows[i, j]
+
+    def __contains__(self, key):
+        i, j = key
+        return self._rows[i, j] >= 0
+
+    def __getitem__(self, key):
+        """``S[i, j]`` is a view of the packed row of S(i, j)."""
+        i, j = key
+        irow = self._rows[i, j]
+        if irow < 0:
+            msg = 'S{:d}{:d} was not measured'
+            raise KeyError(msg.format(i + 1, j + 1))
+        return self.data[irow]
+
+    def _take(self, pairs):
+        pairs = np.asarray(pairs, dtype=np.intp).reshape(-1, 2)
+        rows = self._rows[pairs[:, 0], pairs[:, 1]]
+        if np.any(rows < 0):
+            ik, ij = pairs[np.argmax(rows < 0)]
+            msg = 'S{:d}{:d} was not measured'
+            raise KeyError(msg.format(ik + 1, ij + 1))
+        return self.data[rows]
+
+    @property
+    def reflection(self):
+        """numpy.ndarray: S(i, i) of all ports ``(N, freq)`` (a copy of
+        the rows)."""
+        ports = np.arange(self.num_ports)
+        return self._take(np.stack((ports, ports), axis=-1))
+
+    @property
+    def neighbours(self):
+        """numpy.ndarray: S(i, i + 1) of all ports (and S(1, N)) as in the
+        'Neighbour' window of the VNA ``(N, freq)`` (a copy of the rows)."""
+        ports = np.arange(self.num_ports)
+        return self._take(np.stack((ports, (ports + 1) % self.num_ports),
+                                   axis=-1))
+
+    def full(self):
+        """The full reciprocal matrix ``(freq, N, N)``.
+
+        Built once (and cached) with one fancy indexing of the packed data;
+        the S-parameters not measured are ``nan``.
+
+        Returns:
+            numpy.ndarray: The S-matrix of every frequency point (do not
+            modify it, it is shared by the following calls).
+        """
+        if self._full is None:
+            padded = self.data
+            if np.any(self._rows < 0):
+                nan_row = np.full((1, self.freq_points), np.nan,
+                                  dtype=np.result_type(self.data, np.nan))
+                padded = np.concatenate((self.data, nan_row))
+            # -1 picks the nan row
+            self._full = np.moveaxis(padded[self._rows], -1, 0)
+        return self._full
+
+    def __array__(self, dtype=None, copy=None):
+        full = self.full()
+        return full if dtype is None else full.astype(dtype)
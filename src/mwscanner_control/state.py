@@ -0,0 +1,192 @@
+import math
+
+# settings of channel 1 that are compared with the instrument:
+# (name, query header, kind), the catalog of the traces comes last since
+# it is the only response with commas
+_SETTINGS = (
+    ('continuous', ':INITiate1:CONTinuous', 'bool'),
+    ('display', ':SYSTem:DISPlay:UPDate', 'bool'),
+    ('sweep_type', ':SENSe1:SWEep:TYPE', 'type'),
+    ('points', ':SENSe1:SWEep:POINts', 'int'),
+    ('freq_min', ':SENSe1:FREQuency:STARt', 'float'),
+    ('freq_max', ':SENSe1:FREQuency:STOP', 'float'),
+    ('segments', ':SENSe1:SEGMent:COUNt', 'int'),
+    ('if_bandwidth', ':SENSe1:BWIDth', 'float'),
+    ('averaging', ':SENSe1:AVERage:STATe', 'bool'),
+    ('avg_count', ':SENSe1:AVERage:COUNt', 'int'),
+    ('avg_mode', ':SENSe1:AVERage:MODE', 'type'),
+    ('traces', ':CALCulate1:PARameter:CATalog', 'catalog'),
+)
+# settings of a segment of the segment table (same format)
+_SEGMENT_SETTINGS = (
+    ('freq_min', ':FREQuency:STARt', 'float'),
+    ('freq_max', ':FREQuency:STOP', 'float'),
+    ('points', ':SWEep:POINts', 'int'),
+    ('if_bandwidth', ':BWIDth', 'float'),
+    ('power', ':POWer', 'float'),
+)
+# the settings written by `RSVNAControl._set_sweep` and `_set_averaging`
+SWEEP_SETTINGS = ('sweep_type', 'points', 'freq_min', 'freq_max', 'segments',
+                  'if_bandwidth')
+AVERAGING_SETTINGS = ('averaging', 'avg_count', 'avg_mode')
+# relative tolerance of the float settings
+_RTOL = 1.e-6
+
+
+def snapshot_query():
+    """The query of all the settings in one message."""
+    return ';'.join(header + '?' for _, header, _ in _SETTINGS)
+
+
+def _parse(kind, resp):
+    resp = resp.strip()
+    if kind == 'type':
+        resp = resp.upper()
+        return 'SEGM' if resp.startswith('SEGM') else resp[:3]
+    if kind == 'int':
+        return int(float(resp))
+    if kind == 'float':
+        return float(resp)
+    if kind == 'bool':
+        return resp.upper() in ('1', 'ON')
+    # catalog: 'Trc1,S11,Trc2,S12'
+    items = resp.strip('\'"').split(',')
+    return dict(zip(items[::2], items[1::2])) if resp.strip('\'"') else {}
+
+
+def parse_snapshot(resp):
+    """Parses the response of `snapshot_query` to a dict."""
+    parts = resp.split(';')
+    if len(parts) != len(_SETTINGS):
+        msg = 'Expecting {:d} settings in the snapshot, got {:d}'
+        raise ValueError(msg.format(len(_SETTINGS), len(parts)))
+    return {name: _parse(kind, part)
+            for (name, _, kind), part in zip(_SETTINGS, parts)}
+
+
+def segment_query(count):
+    """The query of the segment table (`count` segments) in one message."""
+    return ';'.join(':SENSe1:SEGMent{:d}{:s}?'.format(iseg, header)
+                    for iseg in range(1, count + 1)
+                    for _, header, _ in _SEGMENT_SETTINGS)
+
+
+def parse_segments(resp, count):
+    """Parses the response of `segment_query` to a list of dicts (the
+    frequencies in Hz)."""
+    parts = resp.split(';')
+    if len(parts) != count * len(_SEGMENT_SETTINGS):
+        msg = 'Expecting {:d} segments in the table, got {:d} values'
+        raise ValueError(msg.format(count, len(parts)))
+    nset = len(_SEGMENT_SETTINGS)
+    return [{name: _parse(kind, part)
+             for (name, _, kind), part in zip(_SEGMENT_SETTINGS,
+                                              parts[iseg:iseg + nset])}
+            for iseg in range(0, len(parts), nset)]
+
+
+def desired_segments(segments):
+    """The segment table (as in `parse_segments`) of `SweepSegment` objects,
+    ``None`` for the settings the segments leave to the channel."""
+    return [{'freq_min': seg.freq_min * 1.e9, 'freq_max': seg.freq_max * 1.e9,
+             'points': seg.points, 'if_bandwidth': seg.if_bandwidth,
+             'power': seg.power} for seg in segments]
+
+
+def segment_differences(desired, current):
+    """The numbers (from 1) of the segments that differ (``None`` settings
+    of `desired` are not compared)."""
+    if len(desired) != len(current):
+        return list(range(1, max(len(desired), len(current)) + 1))
+    return [iseg for iseg, (des, cur) in enumerate(zip(desired, current), 1)
+            if any(des[name] is not None and not _same(des[name], cur[name])
+                   for name, _, _ in _SEGMENT_SETTINGS)]
+
+
+def trace_catalog(num_ports):
+    """The traces created by `RSVNAControl.setup` (name -> S-parameter)."""
+    # the trace ids of RSVNAControl._index2traceid
+    return {'Trc{:d}'.format(((ik - 1) * (2 * num_ports - ik + 2)) // 2 + ij):
+            'S{:d}{:d}'.format(ik, ij)
+            for ik in range(1, num_ports + 1)
+            for ij in range(ik, num_ports + 1)}
+
+
+def desired_state(vna):
+    """The settings `RSVNAControl` applies for its current attributes.
+
+    Args:
+        vna (RSVNAControl): The controller.
+
+    Returns:
+        dict: The settings (as in `parse_snapshot`), ``None`` for the ones
+        that are not set by the controller.
+    """
+    state = dict.fromkeys(name for name, _, _ in _SETTINGS)
+    state.update(continuous=False, display=True, points=vna.sweep_points,
+                 if_bandwidth=vna.if_bandwidth,
+                 averaging=vna.averaging is not None)
+    if vna.averaging is not None:
+        state.update(avg_count=vna.averaging, avg_mode='RED')
+    if vna.segments:
+        state.update(sweep_type='SEGM', segments=len(vna.segments))
+    else:
+        state.update(sweep_type='LIN', freq_min=vna.freq_min * 1.e9,
+                     freq_max=vna.freq_max * 1.e9)
+    if vna._num_channels is not None:
+        state['traces'] = trace_catalog(vna._num_channels)
+    return state
+
+
+def _same(desired, current):
+    if isinstance(desired, float) or isinstance(current, float):
+        return math.isclose(desired, current, rel_tol=_RTOL)
+    return desired == current
+
+
+def differences(desired, current):
+    """The names of the settings that differ (missing or ``None`` settings
+    of `desired` are not compared)."""
+    return [name for name, _, _ in _SETTINGS
+            if desired.get(name) is not None and
+            not _same(desired[name], current[name])]
+
+
+def state_commands(names, state):
+    """The commands that write the settings `names` of `state`.
+
+    The trace catalog and the segment table are not written by single
+    commands (see `RSVNAControl.setup` and `_set_sweep`) and are skipped.
+
+    Returns:
+        list: The commands.
+    """
+    cmds = []
+    for name in names:
+        val = state[name]
+        if name == 'continuous':
+            cmds.append(':INITiate:CONTinuous:ALL ' + ('ON' if val else 'OFF'))
+        elif name == 'display':
+            cmds.append(':SYSTem:DISPlay:UPDate ' + ('ON' if val else 'OFF'))
+        elif name == 'sweep_type':
+            val = {'LIN': 'LINear', 'SEGM': 'SEGMent'}.get(val, val)
+            cmds.append(':SENSe1:SWEep:TYPE ' + val)
+        elif name == 'points' and state['sweep_type'] != 'SEGM':
+            cmds.append(':SENSe1:SWEep:POINts {:d}'.format(val))
+        elif name == 'freq_min':
+            cmds.append(':SENSe1:FREQuency:STARt {:f}GHz'.format(val * 1.e-9))
+        elif name == 'freq_max':
+            cmds.append(':SENSe1:FREQuency:STOP {:f}GHz'.format(val * 1.e-9))
+        elif name == 'if_bandwidth':
+            cmds.append(':SENSe1:BWIDth {:f}Hz'.format(val))
+        elif name == 'averaging':
+            cmds.append(':SENSe1:AVERage:STATe ' + ('ON' if val else 'OFF'))
+        elif name == 'avg_count':
+            cmds.append(':SENSe1:AVERage:COUNt {:d}'.format(val))
+        elif name == 'avg_mode':
+            val = {'RED': 'REDuce'}.get(val, val)
+            cmds.append(':SENSe1:AVERage:MODE ' + val)
+    if state.get('averaging') and \
+            any(name in names for name in AVERAGING_SETTINGS):
+        cmds.append(':SENSe1:AVERage:CLEar')
+    return cmds
@@ -0,0 +1,152 @@
+import math
+
+import numpy as np
+
+# IF bandwidths of the instrument in Hz (1, 1.5, 2, 3, 5, 7 per decade)
+_IF_BANDWIDTHS = tuple(mant * 10 ** dec for dec in range(0, 6)
+                       for mant in (1, 1.5, 2, 3, 5, 7)) + (1.e6,)
+# maximum averaging count chosen by `plan_sweep`
+_MAX_AVERAGING = 1000
+
+
+class SweepSegment(object):
+    """One segment of a segmented frequency sweep.
+
+    Args:
+        freq_min (float): Start frequency in GHz.
+        freq_max (float): Stop frequency in GHz.
+        points (int): Number of frequency points.
+        if_bandwidth (float, optional): IF (measurement) bandwidth in Hz.
+            Defaults to ``None``, the bandwidth of the channel.
+        power (float, optional): Source power in dBm. Defaults to ``None``,
+            the power of the channel.
+
+    Example:
+        >>> vna.segments = [SweepSegment(0.5, 1.5, 21, if_bandwidth=1e4),
+        ...                 SweepSegment(1.5, 2.5, 301, if_bandwidth=1e3),
+        ...                 SweepSegment(2.5, 3.0, 11, if_bandwidth=1e4)]
+        >>> vna.setup(num_channels=8)
+    """
+
+    def __init__(self, freq_min, freq_max, points, if_bandwidth=None,
+                 power=None):
+        if freq_max < freq_min:
+            msg = 'Segment stops before it starts ({:f} GHz < {:f} GHz)'
+            raise ValueError(msg.format(freq_max, freq_min))
+        if points < 1 or (points == 1 and freq_max > freq_min):
+            msg = 'Invalid number of points {:d} for the segment'
+            raise ValueError(msg.format(points))
+        self.freq_min = float(freq_min)
+        self.freq_max = float(freq_max)
+        self.points = int(points)
+        self.if_bandwidth = _float(if_bandwidth)
+        self.power = _float(power)
+
+    def __repr__(self):
+        return 'SweepSegment({:g}, {:g}, {:d}, if_bandwidth={}, ' \
+               'power={})'.format(self.freq_min, self.freq_max, self.points,
+                                  self.if_bandwidth, self.power)
+
+    @property
+    def frequency(self):
+        """numpy.ndarray: The frequency points in Hz."""
+        return np.linspace(self.freq_min, self.freq_max, self.points) * 1.e9
+
+    def to_dict(self):
+        """Returns the segment as a dict (see `from_dict`)."""
+        return {'freq_min': float(self.freq_min),
+                'freq_max': float(self.freq_max), 'points': int(self.points),
+                'if_bandwidth': _float(self.if_bandwidth),
+                'power': _float(self.power)}
+
+    @classmethod
+    def from_dict(cls, config):
+        """Creates the segment from a dict saved by `to_dict`."""
+        return cls(**config)
+
+
+def _float(value):
+    return None if value is None else float(value)
+
+
+def check_segments(segments):
+    """Checks that the segments are sorted and do not overlap.
+
+    Args:
+        segments (list): The :class:`SweepSegment` objects.
+
+    Raises:
+        ValueError: If there are no segments or they overlap.
+    """
+    if not segments:
+        raise ValueError('A segmented sweep needs at least one segment')
+    for prev, seg in zip(segments[:-1], segments[1:]):
+        if seg.freq_min < prev.freq_max:
+            msg = 'Segments overlap: {!r} and {!r}'
+            raise ValueError(msg.format(prev, seg))
+
+
+def stimulus(segments):
+    """The frequency axis (in Hz) of a segmented sweep.
+
+    Args:
+        segments (list): The :class:`SweepSegment` objects.
+
+    Returns:
+        numpy.ndarray: The frequency points of all segments.
+    """
+    return np.concatenate([seg.frequency for seg in segments])
+
+
+def plan_sweep(noise_db, bandwidth, target_db, points, point_seconds=0.,
+               bandwidths=_IF_BANDWIDTHS, max_averaging=_MAX_AVERAGING):
+    """Chooses the IF bandwidth and averaging count of the fastest sweep
+    with a noise floor below `target_db`.
+
+    The noise power of a trace scales with the IF bandwidth and with one
+    over the averaging count, the duration of a sweep is about
+    ``points * (1 / bandwidth + point_seconds)`` per averaged sweep.
+
+    Args:
+        noise_db (float): Measured noise floor in dB (power of the noise of
+            the S-parameters).
+        bandwidth (float): IF bandwidth of the noise measurement in Hz.
+        target_db (float): Target noise floor in dB.
+        points (int): Number of frequency points.
+        point_seconds (float, optional): Overhead of every point in s (the
+            part of the duration that does not depend on the bandwidth).
+            Defaults to 0.
+        bandwidths (tuple, optional): The IF bandwidths to choose from.
+            Defaults to the bandwidths of the instrument (1 Hz to 1 MHz).
+        max_averaging (int, optional): Maximum averaging count. Defaults to
+            1000.
+
+    Returns:
+        dict: ``'if_bandwidth'``, ``'averaging'``, the predicted
+        ``'noise_db'`` and ``'sweep_seconds'`` (all averaged sweeps).
+
+    Raises:
+        ValueError: If the target cannot be reached.
+
+    Example:
+        >>> plan_sweep(-60., 1.e4, -70., 201)['if_bandwidth']
+        1000
+    """
+    best = None
+    for bwidth in bandwidths:
+        noise = noise_db + 10. * math.log10(bwidth / bandwidth)
+        # small tolerance, so that 10 dB less are exactly 10 sweeps
+        count = max(1, math.ceil(10. ** ((noise - target_db) / 10.) - 1.e-9))
+        if count > max_averaging:
+            continue
+        seconds = count * points * (1. / bwidth + point_seconds)
+        # on a tie keep the narrower bandwidth (fewer sweeps to trigger)
+        if best is None or seconds < best['sweep_seconds'] * (1. - 1.e-9):
+            best = {'if_bandwidth': bwidth, 'averaging': count,
+                    'noise_db': noise - 10. * math.log10(count),
+                    'sweep_seconds': seconds}
+    if best is None:
+        msg = 'Cannot reach a noise floor of {:.1f} dB (measured {:.1f} dB ' \
+              'at {:g} Hz)'
+        raise ValueError(msg.format(target_db, noise_db, bandwidth))
+    return best
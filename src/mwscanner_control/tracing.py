@@ -0,0 +1,196 @@
+import atexit
+import collections
+import functools
+import json
+import os
+import threading
+from time import perf_counter_ns
+
+
+class _NullSpan(object):
+    """Span returned while tracing is disabled (does nothing)."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span(object):
+
+    def __init__(self, tracer, name, cat, args):
+        self._tracer = tracer
+        self._name = name
+        self._cat = cat
+        self._args = args
+        self._start = 0
+
+    def __enter__(self):
+        self._start = perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self._args['error'] = exc_type.__name__
+        self._tracer.complete(self._name, self._cat, self._start,
+                              **self._args)
+        return False
+
+
+class Tracer(object):
+    """Collects timed spans and exports them in the Chrome trace format.
+
+    The trace file can be opened with ``chrome://tracing`` or
+    https://ui.perfetto.dev. The events are kept in a bounded buffer (the
+    oldest are dropped) and written to the file by :meth:`flush`, which is
+    also called when the interpreter exits.
+
+    Attributes:
+        enabled (bool): Whether spans are recorded. Default is ``False``.
+        path (str): The trace file.
+
+    Example:
+        >>> tracer = Tracer()
+        >>> tracer.start('scan.trace.json')
+        >>> with tracer.span('measure', 'vna', sweep=1):
+        ...     pass
+        >>> tracer.stop()
+    """
+
+    def __init__(self, max_events=100000):
+        self.enabled = False
+        self.path = None
+        self._events = collections.deque(maxlen=max_events)
+        self._threads = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._origin = perf_counter_ns()
+        self._atexit = False
+
+    def start(self, path, max_events=None):
+        """Starts recording spans, to be written to `path`.
+
+        Args:
+            path (str): The trace file (json).
+            max_events (int, optional): Size of the in-memory buffer.
+                Defaults to ``None``, i.e. keep the current size.
+        """
+        with self._lock:
+            if max_events is not None:
+                self._events = collections.deque(self._events,
+                                                 maxlen=max_events)
+            self.path = path
+            self.enabled = True
+            if not self._atexit:
+                atexit.register(self.flush)
+                self._atexit = True
+
+    def stop(self):
+        """Stops recording and writes the trace file."""
+        self.enabled = False
+        self.flush()
+
+    def span(self, name, cat='', **args):
+        """Context manager recording the time spent in the block.
+
+        Args:
+            name (str): Name of the span.
+            cat (str, optional): Category, e.g. ``'motor'`` or ``'vna'``.
+            **args: Extra information shown with the span.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, cat, args)
+
+    def complete(self, name, cat, start, **args):
+        """Records a span that started at `start` (``perf_counter_ns``)
+        and ends now."""
+        if not self.enabled:
+            return
+        end = perf_counter_ns()
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': cat, 'ph': 'X',
+                 'ts': (start - self._origin) / 1000.,
+                 'dur': (end - start) / 1000.,
+                 'pid': self._pid, 'tid': thread.ident}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._events.append(event)
+
+    def instant(self, name, cat='', **args):
+        """Records an instantaneous event (e.g. a switch press)."""
+        if not self.enabled:
+            return
+        thread = threading.current_thread()
+        event = {'name': name, 'cat': cat, 'ph': 'i', 's': 't',
+                 'ts': (perf_counter_ns() - self._origin) / 1000.,
+                 'pid': self._pid, 'tid': thread.ident}
+        if args:
+            event['args'] = args
+        with self._lock:
+            self._threads[thread.ident] = thread.name
+            self._events.append(event)
+
+    def flush(self, path=None):
+        """Writes the buffered events to the trace file.
+
+        Args:
+            path (str, optional): Write to this file instead of `path`.
+        """
+        path = self.path if path is None else path
+        if path is None:
+            return
+        with self._lock:
+            events = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid,
+                       'tid': tid, 'args': {'name': name}}
+                      for tid, name in self._threads.items()]
+            events.extend(self._events)
+        with open(path, 'w') as fid:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, fid,
+                      separators=(',', ':'), default=str)
+
+
+# the tracer used by the package
+TRACER = Tracer()
+
+
+def start_tracing(path, max_events=None):
+    """Starts recording a session timeline to `path` (see :class:`Tracer`).
+    """
+    TRACER.start(path, max_events=max_events)
+
+
+def stop_tracing():
+    """Stops recording and writes the session timeline."""
+    TRACER.stop()
+
+
+def span(name, cat='', **args):
+    """Context manager recording a span with the package tracer."""
+    return TRACER.span(name, cat, **args)
+
+
+def traced(cat=''):
+    """Decorator recording every call of the function as a span.
+
+    Args:
+        cat (str, optional): Category of the span. The name of the span is
+            the qualified name of the function.
+    """
+    def decorator(func):
+        name = func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not TRACER.enabled:
+                return func(*args, **kwargs)
+            with _Span(TRACER, name, cat, {}):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -38,6 +38,69 @@ def pause():
     input("> Press Enter to continue...\n")
 
 
+def ellipse_points(a_matrix, centroid, num=100):
+    """Samples points on the ellipse given in "center form".
+
+    The ellipse is described by (x - c).T * A * (x - c) = 1, as returned by
+    `outer_ellipsoid_fit` for 2D points.
+
+    Args:
+        a_matrix (numpy.ndarray): The 2 x 2 matrix A of the ellipse.
+        centroid (numpy.ndarray): The center c of the ellipse.
+        num (int): Number of points. Default is 100.
+
+    Returns:
+        tuple: Two arrays with the x and y coordinates of the points. The
+        first point is repeated at the end, so that the curve is closed.
+
+    Example:
+        >>> x, y = ellipse_points(np.eye(2) / 4., np.zeros(2), num=4)
+        >>> print(np.round(x, 3))
+        [ 2.  0. -2. -0.  2.]
+    """
+    eigval, eigvec = la.eigh(np.asarray(a_matrix))
+    theta = np.linspace(0., 2. * np.pi, num + 1)
+    circle = np.vstack((np.cos(theta), np.sin(theta)))
+    points = eigvec @ (circle / np.sqrt(eigval)[:, None])
+    points += np.asarray(centroid).reshape(2, 1)
+    return points[0], points[1]
+
+
+def ray_ellipse_distance(a_matrix, centroid, angles):
+    """Distance from the origin to the ellipse along the given directions.
+
+    The ellipse is described by (x - c).T * A * (x - c) = 1. For every angle
+    we return the (largest) positive t for which the point
+    t * (cos(angle), sin(angle)) lies on the ellipse.
+
+    Args:
+        a_matrix (numpy.ndarray): The 2 x 2 matrix A of the ellipse.
+        centroid (numpy.ndarray): The center c of the ellipse.
+        angles (array_like): The angles of the rays in degrees.
+
+    Returns:
+        numpy.ndarray: The distances, ``nan`` where the ray does not cross
+        the ellipse.
+
+    Example:
+        >>> ray_ellipse_distance(np.eye(2) / 4., np.zeros(2), [0., 90.])
+        array([2., 2.])
+    """
+    a_matrix = np.asarray(a_matrix)
+    centroid = np.asarray(centroid)
+    theta = np.radians(np.asarray(angles, dtype=float))
+    rays = np.stack((np.cos(theta), np.sin(theta)), axis=-1)
+
+    coef2 = np.einsum('ni,ij,nj->n', rays, a_matrix, rays)
+    coef1 = rays @ (a_matrix @ centroid)
+    coef0 = centroid @ a_matrix @ centroid - 1.
+    disc = coef1 * coef1 - coef2 * coef0
+    with np.errstate(invalid='ignore'):
+        dist = (coef1 + np.sqrt(disc)) / coef2
+    dist[(disc < 0.) | ~(dist > 0.)] = np.nan
+    return dist
+
+
 def outer_ellipsoid_fit(points, tol=0.001):
     """Find the minimum volume ellipsoid enclosing a set of points.
 
@@ -3,6 +3,37 @@ import numpy as np
 import warnings
 import datetime
 import functools
+import math
+import time
+from .tracing import span, traced
+from .instrumentation import VNAStats
+from .sparams import SMatrix, trace_pairs, upper_pairs
+from .sweep import SweepSegment, check_segments, stimulus, plan_sweep
+from .calibration import calibration_key
+from .replay import SessionRecorder, ReplayResource
+from .state import SWEEP_SETTINGS, AVERAGING_SETTINGS, desired_state, \
+    differences, parse_snapshot, snapshot_query, state_commands, \
+    trace_catalog, segment_query, parse_segments, desired_segments, \
+    segment_differences
+from .logs import get_logger
+
+_log = get_logger('vna')
+
+# wait for the calibration unit to report the connected ports (in s)
+_CAL_DELAY = 35.
+# the links tried by connect(link='auto'), fastest first if they draw
+_LINKS = ('hislip', 'socket', 'lan', 'usb')
+# USB resource of the instrument on the bench
+_USB_RESOURCE = 'USB0::0x0AAD::0x01BE::102631::INSTR'
+# port of the raw SCPI socket
+_SOCKET_PORT = 5025
+# round trips measured by the link probe
+_PROBE_QUERIES = 5
+# attempts and first delay (in s, doubled every attempt) of a reconnect
+_RECONNECT_RETRIES = 5
+_RECONNECT_BACKOFF = .5
+# IF bandwidth of the quick sweeps measuring the noise floor (in Hz)
+_PROBE_BANDWIDTH = 1.e4
 
 
 def _check_connected(func):
@@ -19,7 +50,11 @@ def _check_connected(func):
         if args[0]._vna is None:
             msg = 'You have to connection to the VNA to perform this action!'
             raise RuntimeError(msg)
-        return func(*args, **kwargs)
+        try:
+            return func(*args, **kwargs)
+        except pyvisa.errors.Error:
+            args[0]._stats.visa_errors += 1
+            raise
     return wrapper
 
 
@@ -50,6 +85,21 @@ class RSVNAControl(object):
             Default is 3.0.
         averaging (int, optional): Number of sweeps for the averaging. Set to
             ``None`` to disable averaging. Default is 10.
+        if_bandwidth (float, optional): IF (measurement) bandwidth in Hz.
+            Default is ``None``, the bandwidth of the instrument.
+        calibrations (CalibrationRegistry, optional): The stored
+            calibrations, a matching one is loaded by `setup`. Default is
+            ``None``, no registry.
+        usb_resource (str, optional): VISA resource of the USB link.
+            Default is the instrument on the bench.
+        socket_port (int, optional): Port of the raw SCPI socket. Default is
+            5025.
+        auto_reconnect (bool, optional): Reconnect (see `reconnect`) and
+            repeat the sweep when the session is lost during a measurement.
+            Default is ``True``.
+        segments (list, optional): The :class:`SweepSegment` objects of a
+            segmented sweep, used instead of `freq_min`, `freq_max` and
+            `freq_points`. Default is ``None``, linear sweep.
     """
     def __init__(self):
         self._ip_address = '192.168.1.58'
@@ -57,6 +107,12 @@ class RSVNAControl(object):
         self.freq_min = 0.5           # min frequency in GHz
         self.freq_max = 3.0           # max frequency in GHz
         self.averaging = 10           # number of sweeps for averaging
+        self.segments = None          # segmented sweep (SweepSegment list)
+        self.if_bandwidth = None      # IF bandwidth in Hz
+        self.calibrations = None      # CalibrationRegistry
+        self.usb_resource = _USB_RESOURCE
+        self.socket_port = _SOCKET_PORT
+        self.auto_reconnect = True
 
         self._rm = pyvisa.ResourceManager()
         self._vna = None
@@ -64,6 +120,10 @@ class RSVNAControl(object):
         self._lib_py = (self._rm.visalib.library_path == 'py')
         self._num_channels = None
         self._event_data = None
+        self._link = None
+        # the settings applied to the instrument (see state.py)
+        self._applied = {}
+        self._stats = VNAStats()
 
     @property
     def ip_address(self):
@@ -77,6 +137,33 @@ class RSVNAControl(object):
             raise TypeError('Expecting string input for IP address')
         self._ip_address = val
 
+    @property
+    def stats(self):
+        """VNAStats: Counters of the sweeps, ``measure`` latency, transferred
+        bytes and VISA errors."""
+        return self._stats
+
+    @property
+    def link(self):
+        """str: The link of the connection (``None`` before `connect`)."""
+        return self._link
+
+    @property
+    def sweep_points(self):
+        """int: Number of frequency points of the sweep (of all the segments
+        for a segmented sweep)."""
+        if self.segments:
+            return sum(seg.points for seg in self.segments)
+        return self.freq_points
+
+    @property
+    def stimulus(self):
+        """numpy.ndarray: The expected frequency axis of the sweep in Hz."""
+        if self.segments:
+            return stimulus(self.segments)
+        return np.linspace(self.freq_min, self.freq_max,
+                           self.freq_points) * 1.e9
+
     @staticmethod
     def _index2traceid(ik, ij, total):
         if (ik < 1) or (ij < 1) or (ik > total) or (ij > total):
@@ -174,32 +261,238 @@ class RSVNAControl(object):
             self._vna.write(':SENSe1:AVERage:CLEar')
         else:
             self._vna.write(':SENSe1:AVERage:STATe OFF')
+        self._remember(AVERAGING_SETTINGS)
+
+    def _remember(self, names):
+        """Records the settings `names` as applied to the instrument."""
+        state = desired_state(self)
+        for name in names:
+            self._applied[name] = state[name]
+
+    def _set_sweep(self):
+        if self.if_bandwidth is not None:
+            cmd = ':SENSe1:BWIDth {:f}Hz'.format(self.if_bandwidth)
+            self._vna.write(cmd)
+        if not self.segments:
+            cmd = ':SENSe1:FREQuency:STARt {:f}GHz'.format(self.freq_min)
+            self._vna.write(cmd)
+            cmd = ':SENSe1:FREQuency:STOP {:f}GHz'.format(self.freq_max)
+            self._vna.write(cmd)
+            self._vna.write(':SENSe1:SWEep:TYPE LINear')
+            cmd = ':SENSe1:SWEep:POINts {:d}'.format(self.freq_points)
+            self._vna.write(cmd)
+            self._remember(SWEEP_SETTINGS)
+            return
+
+        # segment table, manual p. 1040
+        check_segments(self.segments)
+        self._vna.write(':SENSe1:SEGMent:DELete:ALL')
+        for iseg, seg in enumerate(self.segments, 1):
+            prefix = ':SENSe1:SEGMent{:d}'.format(iseg)
+            self._vna.write(prefix + ':ADD')
+            self._vna.write(prefix + ':FREQuency:STARt {:f}GHz'.format(
+                seg.freq_min))
+            self._vna.write(prefix + ':FREQuency:STOP {:f}GHz'.format(
+                seg.freq_max))
+            self._vna.write(prefix + ':SWEep:POINts {:d}'.format(seg.points))
+            if seg.if_bandwidth is not None:
+                self._vna.write(prefix + ':BWIDth {:f}Hz'.format(
+                    seg.if_bandwidth))
+            if seg.power is not None:
+                self._vna.write(prefix + ':POWer {:f}'.format(seg.power))
+        self._vna.write(':SENSe1:SWEep:TYPE SEGMent')
+        self._remember(SWEEP_SETTINGS)
+
+    def _snapshot(self):
+        """Reads the settings of the instrument with one query."""
+        return parse_snapshot(self._vna.query(snapshot_query()))
+
+    def _apply_state(self, current, names):
+        """Writes the settings `names` that differ from `current`.
+
+        A segmented sweep is compared segment by segment (one more query),
+        any difference writes the whole segment table.
+
+        Returns:
+            list: The settings that were written.
+        """
+        desired = desired_state(self)
+        diff = differences({name: desired[name] for name in names}, current)
+        self._applied.update(current)
+        if self.segments and 'segments' in names and \
+                not any(name in SWEEP_SETTINGS for name in diff):
+            table = parse_segments(self._vna.query(segment_query(
+                current['segments'])), current['segments'])
+            if segment_differences(desired_segments(self.segments), table):
+                diff.append('segments')
+        written = diff
+        if self.segments and any(name in SWEEP_SETTINGS for name in diff):
+            self._set_sweep()
+            written = [name for name in diff if name not in SWEEP_SETTINGS]
+        for cmd in state_commands(written, desired):
+            self._vna.write(cmd)
+        for name in written:
+            self._applied[name] = desired[name]
+        return diff
+
+    def _get_sweep(self, current):
+        self.if_bandwidth = current['if_bandwidth']
+        if current['sweep_type'] != 'SEGM':
+            self.segments = None
+            self.freq_points = current['points']
+            self.freq_min = current['freq_min'] * 1.e-9
+            self.freq_max = current['freq_max'] * 1.e-9
+            return
+
+        table = []
+        if current['segments']:
+            table = parse_segments(self._vna.query(segment_query(
+                current['segments'])), current['segments'])
+        self.segments = [SweepSegment(seg['freq_min'] * 1.e-9,
+                                      seg['freq_max'] * 1.e-9, seg['points'],
+                                      if_bandwidth=seg['if_bandwidth'],
+                                      power=seg['power']) for seg in table]
+
+    def _resource(self, link):
+        """The VISA resource name of a link."""
+        lnk = str(link).lower()
+        if lnk == 'usb':
+            return self.usb_resource
+        elif lnk == 'lan':
+            return 'TCPIP0::' + self._ip_address + '::inst0::INSTR'
+        elif lnk == 'hislip':
+            return 'TCPIP0::' + self._ip_address + '::hislip0::INSTR'
+        elif lnk == 'socket':
+            return 'TCPIP0::{:s}::{:d}::SOCKET'.format(self._ip_address,
+                                                       self.socket_port)
+        raise ValueError('Could not connect. Unknown link ' + str(link))
+
+    def _open(self, link):
+        rsrc = self._resource(link)
+        if rsrc.endswith('::SOCKET'):
+            # raw sockets have no end of message, use new lines
+            return self._rm.open_resource(rsrc, read_termination='\n',
+                                          write_termination='\n')
+        return self._rm.open_resource(rsrc)
+
+    @staticmethod
+    def _probe_link(resource):
+        """Measures the round trip and the transfer rate of a link.
+
+        Returns:
+            tuple: The round trip in s, the rate in bytes/s and the expected
+            duration of a measurement-like exchange (a few short queries and
+            a long response) in s.
+        """
+        rtt = []
+        for _ in range(_PROBE_QUERIES):
+            start = time.perf_counter()
+            resource.query('*IDN?')
+            rtt.append(time.perf_counter() - start)
+        rtt = min(rtt)
+
+        start = time.perf_counter()
+        resp = resource.query(':CALCulate1:DATA:STIMulus?')
+        bulk = time.perf_counter() - start
+        rate = len(resp) / max(bulk - rtt, 1.e-6)
+        return rtt, rate, _PROBE_QUERIES * rtt + bulk
+
+    def probe_links(self, links=_LINKS):
+        """Measures the available links to the VNA.
+
+        Args:
+            links (tuple, optional): The links to try. Defaults to
+                ``('hislip', 'socket', 'lan', 'usb')``.
 
-    def connect(self, link='usb'):
+        Returns:
+            dict: The round trip ``'rtt'`` in s, the transfer rate
+            ``'rate'`` in bytes/s and the ``'score'`` (expected duration of
+            a typical exchange in s) of every link that could be opened.
+        """
+        results = {}
+        for link in links:
+            try:
+                resource = self._open(link)
+            except (pyvisa.errors.Error, OSError, ValueError) as exc:
+                _log.debug('Link %s not available: %s', link, exc)
+                continue
+            try:
+                rtt, rate, score = self._probe_link(resource)
+            except (pyvisa.errors.Error, OSError) as exc:
+                _log.debug('Link %s failed: %s', link, exc)
+                continue
+            finally:
+                resource.close()
+            results[link] = {'rtt': rtt, 'rate': rate, 'score': score}
+            _log.info('Link %s: round trip %.2f ms, %.0f kB/s', link,
+                      rtt * 1.e3, rate * 1.e-3)
+        return results
+
+    def connect(self, link='usb', record=None):
         """Connect to the VNA to send and receive data.
 
+        With ``link='auto'`` every link is probed (see `probe_links`) and
+        the fastest one is used.
+
         Args:
             link (str, optional): Which interface to use. Possible values are
-                'usb', 'lan' or 'hislip'. Defaults to 'usb'.
+                'usb', 'lan', 'hislip', 'socket' (raw SCPI on port
+                `socket_port`) or 'auto'. Defaults to 'usb'.
+            record (str, optional): Records the session to this file, to be
+                replayed with `replay`. Defaults to ``None``.
+
+        Returns:
+            str: The link used.
 
         Raises:
             ValueError: If the link argument has the wrong value.
+            RuntimeError: If no link is available (``'auto'``).
         """
         if self._vna is not None:
             warnings.warn('VNA is already connected', RuntimeWarning)
-            return
+            return None
+
+        if str(link).lower() == 'auto':
+            results = self.probe_links()
+            if not results:
+                raise RuntimeError('Could not connect, no link to the VNA')
+            link = min(results, key=lambda lnk: results[lnk]['score'])
+        self._vna = self._open(link)
+        self._link = str(link).lower()
+        if record is not None:
+            self._vna = SessionRecorder(self._vna, record, link=self._link)
+        return self._link
+
+    def replay(self, path, speed=None, strict=True):
+        """Connect to a recorded session instead of the VNA.
+
+        The recorded responses are served in order, e.g. to benchmark the
+        setup and the measurement pipeline offline. The user keys and the
+        events of the instrument are not available.
 
-        lnk = str(link).lower()
-        if lnk == 'usb':
-            rsrc = 'USB0::0x0AAD::0x01BE::102631'
-        elif lnk == 'lan':
-            rsrc = 'TCPIP0::' + self._ip_address + '::inst0'
-        elif lnk == 'hislip':
-            rsrc = 'TCPIP0::' + self._ip_address + '::hislip0'
-        else:
-            raise ValueError('Could not connect. Unknown link ' + link)
-        rsrc += '::INSTR'
-        self._vna = self._rm.open_resource(rsrc)
+        Args:
+            path (str): The file recorded with ``connect(record=...)``.
+            speed (float, optional): Replay the timing of the recording
+                accelerated by `speed` (1 for the original timing). Defaults
+                to ``None``, as fast as possible.
+            strict (bool, optional): Raise if the commands differ from the
+                recording. Defaults to ``True``.
+
+        Example:
+            >>> vna.connect(link='lan', record='scan.scpi.gz')
+            >>> vna.setup(num_channels=8)
+            >>> frequency, sparam = vna.measure()
+            >>> vna.disconnect()
+            >>> # later, without the instrument
+            >>> vna.replay('scan.scpi.gz')
+            >>> vna.setup(num_channels=8)
+            >>> frequency, sparam = vna.measure()
+        """
+        if self._vna is not None:
+            warnings.warn('VNA is already connected', RuntimeWarning)
+            return
+        self._vna = ReplayResource(path, speed=speed, strict=strict)
+        self._link = 'replay'
 
     def disconnect(self):
         """Disconnects from the VNA (only if it is already connected)"""
@@ -218,23 +511,138 @@ class RSVNAControl(object):
         self._vna.close()
         self._vna = None
 
+    def _reopen(self, retries, backoff):
+        """Closes the session and opens the link again (see `reconnect`)."""
+        # the recording (connect(record=...)) goes on with the new session
+        recorder = None
+        if isinstance(self._vna, SessionRecorder):
+            recorder = self._vna
+        if self._vna is not None:
+            try:
+                if recorder is not None:
+                    recorder.detach()
+                else:
+                    self._vna.close()
+            except (pyvisa.errors.Error, OSError):
+                pass
+            self._vna = None
+        self._event_data = None
+
+        delay = backoff
+        for attempt in range(1, retries + 1):
+            try:
+                self._vna = self._open(self._link)
+                break
+            except (pyvisa.errors.Error, OSError) as exc:
+                _log.warning('Reconnect %d/%d to the VNA failed: %s',
+                             attempt, retries, exc)
+                if attempt < retries:
+                    time.sleep(delay)
+                    delay *= 2.
+        else:
+            if recorder is not None:
+                recorder.close()
+            msg = 'Could not reconnect to the VNA ({:s})'
+            raise RuntimeError(msg.format(self._link))
+        if recorder is not None:
+            recorder.attach(self._vna)
+            self._vna = recorder
+
+    def reconnect(self, retries=_RECONNECT_RETRIES,
+                  backoff=_RECONNECT_BACKOFF):
+        """Opens the session again after a timeout or a lost connection.
+
+        The link is opened again with exponential backoff. The instrument
+        keeps its configuration while the session is down, so the settings
+        are checked with one query and only the ones that differ from what
+        was applied (see `setup`) are written again. If the traces are gone
+        (e.g. the instrument restarted), the full `setup` runs. A recording
+        (``connect(record=...)``) continues with the new session, and a
+        replayed session (`replay`) continues with the recorded exchanges.
+
+        Args:
+            retries (int, optional): Attempts to open the link. Defaults to
+                5.
+            backoff (float, optional): Delay before the second attempt in s,
+                doubled after every attempt. Defaults to 0.5.
+
+        Returns:
+            list: The settings that were applied again.
+
+        Raises:
+            RuntimeError: If the link cannot be opened.
+        """
+        if self._link is None or (self._link == 'replay' and
+                                  self._vna is None):
+            raise RuntimeError('Cannot reconnect, the VNA was never '
+                               'connected')
+        # a replayed session goes on with the exchanges recorded after the
+        # reconnect
+        if self._link != 'replay':
+            self._reopen(retries, backoff)
+        self._stats.reconnects += 1
+
+        current = parse_snapshot(self._vna.query(snapshot_query()))
+        diff = differences(self._applied, current)
+        if 'traces' in diff:
+            _log.warning('VNA lost its traces, running the full setup')
+            self.setup(num_channels=self._num_channels)
+        elif 'segments' in diff:
+            self._set_sweep()
+            self._set_averaging()
+        else:
+            for cmd in state_commands(diff, self._applied):
+                self._vna.write(cmd)
+        _log.info('Reconnected to the VNA (%s), applied again: %s',
+                  self._link, ', '.join(diff) or 'nothing')
+        return diff
+
+    @traced('vna')
     @_check_connected
-    def setup(self, num_channels=8):
+    def setup(self, num_channels=8, reset=None):
         """Setup for VNA for measurement.
 
         First, this method will split the screen and add traces. For more than
         3 antennas, there will be three panels: one with the antenna
         reflection, one with the neighboring antenna signals and the third
         with the rest of the S-parameters. Moreover, the sweep parameters are
-        set (minimum and maximum frequency, number of frequnecy points, etc).
+        set (minimum and maximum frequency, number of frequnecy points, etc),
+        or the segment table if `segments` are given.
         For less than three antennas, there will be two or even a single panel.
 
+        The settings of the instrument are read first (one query). If it
+        already has the traces, the reset and the screen setup are skipped and
+        only the settings that differ are written. The calibration is kept
+        unless the sweep changed. The screen layout (the windows and their
+        traces) is not checked then, use ``reset=True`` to set it up again.
+
         Args:
             num_channels (int, optional): Number of channesl. Defaults to 8.
+            reset (bool, optional): Whether to reset the instrument
+                (``*RST``) and create the traces. Defaults to ``None``, only
+                if the traces are not there.
 
         Raises:
             RuntimeError: If you are connected to the VNA.
         """
+        current = self._snapshot()
+        if reset is None:
+            reset = current['traces'] != trace_catalog(num_channels)
+        self._applied = {}
+        if not reset:
+            ports_changed = num_channels != self._num_channels
+            self._num_channels = num_channels
+            diff = self._apply_state(current, [name for name in current
+                                               if name != 'traces'])
+            _log.info('VNA already set up, changed: %s',
+                      ', '.join(diff) or 'nothing')
+            # the calibration of the instrument is kept with the sweep
+            if ports_changed or any(name in SWEEP_SETTINGS for name in diff):
+                self._calibrated = False
+            if not self._calibrated:
+                self._load_registered_calibration()
+            return
+
         # activate single sweep mode for all channels
         self._vna.write('*RST')
         self._vna.write(':INITiate:CONTinuous:ALL OFF')
@@ -280,14 +688,8 @@ class RSVNAControl(object):
                     trc_list.append(self._index2traceid(ik, ij, num_channels))
             self._addtrace2window(3, trc_list, -120., 0., 'Transmission')
 
-        # configure sweep parameters
-        # FIXME: you are missing some configuration here!
-        cmd = ':SENSe1:FREQuency:STARt {:f}GHz'.format(self.freq_min)
-        self._vna.write(cmd)
-        cmd = ':SENSe1:FREQuency:STOP {:f}GHz'.format(self.freq_max)
-        self._vna.write(cmd)
-        self._vna.write(':SENSe1:SWEep:TYPE LINear')
-        self._vna.write(':SENSe1:SWEep:POINTs {:d}'.format(self.freq_points))
+        # configure sweep parameters (linear or segmented)
+        self._set_sweep()
         self._set_averaging()
 
         # switch display on (may slow down measurement)
@@ -295,6 +697,9 @@ class RSVNAControl(object):
 
         # update members
         self._num_channels = num_channels
+        self._remember(('continuous', 'display', 'traces'))
+        self._calibrated = False
+        self._load_registered_calibration()
 
     @_check_connected
     def setup_user_interface(self, buttons):
@@ -373,6 +778,7 @@ class RSVNAControl(object):
         else:
             self._buttons_handlers = buttons
 
+    @traced('vna')
     @_check_connected
     def calibrate(self):
         # TODO: test this function
@@ -390,7 +796,7 @@ class RSVNAControl(object):
                         'ASSignment1:DEFine:TPORt ' + ports)
         # NOTE: set delay high here, query should wait for calibration unit
         resp = self._vna.query(':SENSe:CORRection:COLLect:AUTO:'
-                               'PORTs:CONNection?; *WAI', delay=35.)
+                               'PORTs:CONNection?; *WAI', delay=_CAL_DELAY)
         data = np.asarray(resp.split(','), dtype=int)
 
         # some checks
@@ -424,13 +830,17 @@ class RSVNAControl(object):
                 with ``NN`` the number of channes and ``XXXXXXXX`` the current
                 date. Defaults to ``None``.
 
+        Returns:
+            str: The name of the file on the instrument (``None`` if there
+            is no calibration).
+
         Raises:
             RuntimeError: If you are connected to the VNA.
         """
         if not self._calibrated:
             msg = 'No calibration data present. Skip saving'
             warnings.warn(msg, RuntimeWarning)
-            return
+            return None
 
         if calfile is None:
             today = datetime.date.today()
@@ -438,6 +848,7 @@ class RSVNAControl(object):
             calfile += today.strftime('%Y%m%d')
         cmd = ':MMEMory:STORe:CORRection 1, \'{:s}.cal\''.format(calfile)
         self._vna.write(cmd)
+        return calfile + '.cal'
 
     @_check_connected
     def load_calibration(self, calfile):
@@ -452,6 +863,54 @@ class RSVNAControl(object):
         cmd = ':MMEMory:LOAD:CORRection 1, \'{:s}\''.format(calfile)
         self._vna.write(cmd)
 
+    def _load_registered_calibration(self):
+        """Loads the matching calibration of the registry (if any)."""
+        if self.calibrations is None:
+            return False
+        entry = self.calibrations.find(calibration_key(self))
+        if entry is None:
+            return False
+        _log.info('Loading calibration %s (%.1f h old)', entry['file'],
+                  self.calibrations.age(entry) / 3600.)
+        self.load_calibration(entry['file'])
+        self._calibrated = True
+        return True
+
+    @_check_connected
+    def ensure_calibration(self, force=False):
+        """Makes sure the current sweep is calibrated.
+
+        A valid calibration of the registry matching the sweep (ports,
+        frequencies, points, IF bandwidth and segments) is loaded, only if
+        there is none the automatic calibration is run, saved on the
+        instrument and recorded in the registry.
+
+        Args:
+            force (bool, optional): Calibrate even if there is a matching
+                calibration. Defaults to ``False``.
+
+        Returns:
+            bool: ``True`` if the sweep is calibrated.
+
+        Raises:
+            RuntimeError: If you are connected to the VNA.
+        """
+        if self.calibrations is None:
+            msg = 'No calibration registry, set the calibrations attribute'
+            raise RuntimeError(msg)
+        if self._calibrated and not force:
+            return True
+        if not force and self._load_registered_calibration():
+            return True
+
+        self.calibrate()
+        if not self._calibrated:
+            return False
+        key = calibration_key(self)
+        calfile = self.save_calibration(self.calibrations.file_name(key))
+        self.calibrations.add(key, calfile)
+        return True
+
     @_check_connected
     def save_state(self, statefile):
         r"""Save the current VNA state to a file.
@@ -487,39 +946,285 @@ class RSVNAControl(object):
         cmd = 'MMEMory:LOAD:STATe 1, \'C:\\Users\\Public\\Documents\\' \
             'Rohde-Schwarz\\Vna\\RecallSets\\{:s}\''
         self._vna.write(cmd.format(statefile))
-        resp = self._vna.query('CALCulate1:PARameter:CATalog?')
-        nsp = float(len(resp.strip().split(',')))
-        self._num_channels = int((np.sqrt(1. + 4. * nsp) - 1.) / 2.)
-        resp = self._vna.query(':SENSe1:SWEep:POINTs?')
-        self.freq_points = int(resp.strip())
-        resp = self._vna.query(':SENSe1:FREQuency:STARt?')
-        self.freq_min = float(resp.strip()) * 1.e-9
-        resp = self._vna.query(':SENSe1:FREQuency:STOP?')
-        self.freq_max = float(resp.strip()) * 1.e-9
-        self._set_averaging()
+        current = self._snapshot()
+        nsp = float(len(current['traces']))
+        self._num_channels = int((np.sqrt(1. + 8. * nsp) - 1.) / 2.)
+        self._get_sweep(current)
+        self._applied = {}
+        self._apply_state(current, AVERAGING_SETTINGS)
+
+    def _sweep(self, pairs):
+        """Triggers one sweep and reads the traces of `pairs`.
+
+        If the session is lost and `auto_reconnect` is set, the controller
+        reconnects and repeats the sweep once.
+
+        Returns:
+            tuple: The packed data ``(len(pairs), points)`` and the number of
+            bytes transferred.
+        """
+        try:
+            return self._sweep_once(pairs)
+        except (pyvisa.errors.VisaIOError, OSError) as exc:
+            if not self.auto_reconnect or self._link is None:
+                raise
+            # counted in `reconnects`, only the errors raised to the caller
+            # are `visa_errors` (see `_check_connected`)
+            _log.warning('VNA session lost during the sweep (%s)', exc)
+            self.reconnect()
+        return self._sweep_once(pairs)
+
+    def _sweep_once(self, pairs):
+        with span('sweep', 'vna'):
+            self._vna.write('INITiate1:IMMediate; *WAI')
+
+        nbytes = 0
+        with span('transfer', 'scpi', traces=len(pairs)):
+            if len(pairs) == len(upper_pairs(self._num_channels)):
+                resps = [self._vna.query(':CALCulate1:DATA:ALL? SDATa')]
+            else:
+                cmd = ':CALCulate1:DATA:TRACe? \'Trc{:d}\', SDATa'
+                resps = [self._vna.query(cmd.format(self._index2traceid(
+                    ik + 1, ij + 1, self._num_channels)))
+                    for ik, ij in pairs]
+        data = []
+        for resp in resps:
+            nbytes += len(resp)
+            data.append(np.asarray(resp.split(','), dtype=float))
+        data = np.concatenate(data)
+        data = data[::2] + 1j*data[1::2]
+        return np.reshape(data, (len(pairs), self.sweep_points)), nbytes
 
+    @traced('vna')
     @_check_connected
-    def measure(self):
+    def measure(self, traces='all', smatrix=False):
         """Perform a measurement.
 
+        Only the requested S-parameters are transferred: all of them in one
+        query (``'all'``), otherwise one query per trace.
+
+        Args:
+            traces (str or list, optional): ``'all'``, ``'reflection'``,
+                ``'neighbour'``, ``'transmission'`` (the windows created by
+                `setup`) or a list of (i, j) pairs (0-based). Defaults to
+                ``'all'``.
+            smatrix (bool, optional): Return the S-parameters as a
+                :class:`SMatrix`. Defaults to ``False``, the packed array.
+
         Returns:
-            frequency (type): Description.
-            data (type): Description.
+            tuple: The frequencies in Hz (numpy.ndarray, of all segments for
+            a segmented sweep) and the S-parameters, packed in trace order
+            ``(ntraces, freq)`` (numpy.ndarray, or :class:`SMatrix` if
+            `smatrix` is set).
 
         Raises:
             RuntimeError: If you are connected to the VNA.
+
+        Example:
+            >>> frequency, sparam = vna.measure(traces='reflection',
+            ...                                 smatrix=True)
+            >>> sparam.reflection.shape
+            (8, 201)
         """
-        self._vna.write('INITiate1:IMMediate; *WAI')
-        resp = self._vna.query(':CALCulate1:DATA:ALL? SDATa')
-        data = np.asarray(resp.split(','), dtype=float)
-        data = data[::2] + 1j*data[1::2]
-        nmeas = (self._num_channels * (self._num_channels + 1)) // 2
-        data = np.reshape(data, (nmeas, self.freq_points))
+        pairs = trace_pairs(self._num_channels, traces)
+        start = time.perf_counter()
+        data, nbytes = self._sweep(pairs)
+        if smatrix:
+            data = SMatrix(data, self._num_channels, pairs)
 
         resp = self._vna.query(':CALCulate1:DATA:STIMulus?')
         frequency = np.asarray(resp.split(','), dtype=float)
+        nbytes += len(resp)
+        self._stats.record_measure(time.perf_counter() - start, nbytes)
         return frequency, data
 
+    @traced('vna')
+    @_check_connected
+    def measure_adaptive(self, sem_threshold, max_sweeps=100, min_sweeps=2,
+                         traces='all', smatrix=False):
+        """Perform a measurement averaged on the host until it is stable.
+
+        The instrument averaging is switched off and single sweeps are
+        triggered one after the other. The running mean and variance of every
+        S-parameter and frequency point are updated (Welford) until the
+        standard error of the mean is below `sem_threshold` everywhere, or
+        `max_sweeps` sweeps were made. Still positions are done after a few
+        sweeps, only the noisy ones take longer.
+
+        Args:
+            sem_threshold (float): Largest allowed standard error of the mean
+                (absolute, in linear units of the S-parameters).
+            max_sweeps (int, optional): Maximum number of sweeps. Defaults to
+                100.
+            min_sweeps (int, optional): Minimum number of sweeps (at least
+                2). Defaults to 2.
+            traces (str or list, optional): The traces to measure (see
+                `measure`). Defaults to ``'all'``.
+            smatrix (bool, optional): Return the S-parameters as a
+                :class:`SMatrix`. Defaults to ``False``, the packed array.
+
+        Returns:
+            tuple: The frequencies in Hz (numpy.ndarray), the mean
+            S-parameters (packed as in `measure`) and the number of sweeps.
+
+        Raises:
+            RuntimeError: If you are connected to the VNA.
+
+        Example:
+            >>> frequency, sparam, sweeps = vna.measure_adaptive(1e-3)
+        """
+        min_sweeps = max(min_sweeps, 2)
+        if max_sweeps < min_sweeps:
+            msg = 'max_sweeps ({:d}) is less than min_sweeps ({:d})'
+            raise ValueError(msg.format(max_sweeps, min_sweeps))
+        pairs = trace_pairs(self._num_channels, traces)
+        shape = (len(pairs), self.sweep_points)
+        start = time.perf_counter()
+
+        # preallocated running statistics
+        mean = np.zeros(shape, dtype=complex)
+        delta = np.empty(shape, dtype=complex)
+        m2 = np.zeros(shape)
+        threshold = sem_threshold * sem_threshold
+        nbytes = 0
+        self._vna.write(':SENSe1:AVERage:STATe OFF')
+        self._applied['averaging'] = False
+        try:
+            for count in range(1, max_sweeps + 1):
+                data, size = self._sweep(pairs)
+                nbytes += size
+                np.subtract(data, mean, out=delta)
+                mean += delta / count
+                # m2 += |x - mean_old| * |x - mean_new| (real part)
+                m2 += (delta * np.conj(data - mean)).real
+                # squared standard error: m2 / (n - 1) / n
+                if count >= min_sweeps and \
+                        np.max(m2) <= threshold * count * (count - 1):
+                    break
+        finally:
+            self._set_averaging()
+
+        sem = np.sqrt(np.max(m2) / (count * (count - 1)))
+        if sem > sem_threshold:
+            msg = 'Standard error {:g} still above {:g} after {:d} sweeps'
+            warnings.warn(msg.format(sem, sem_threshold, count),
+                          RuntimeWarning)
+        _log.debug('Adaptive averaging: %d sweeps, standard error %g', count,
+                   sem)
+
+        resp = self._vna.query(':CALCulate1:DATA:STIMulus?')
+        frequency = np.asarray(resp.split(','), dtype=float)
+        nbytes += len(resp)
+        self._stats.record_measure(time.perf_counter() - start, nbytes,
+                                   sweeps=count)
+        if smatrix:
+            mean = SMatrix(mean, self._num_channels, pairs)
+        return frequency, mean, count
+
+    @_check_connected
+    def optimize_sweep(self, target_noise_db, sweeps=3, traces='reflection',
+                       resolution=None, max_averaging=None):
+        """Chooses the fastest IF bandwidth and averaging for a noise floor.
+
+        A few quick sweeps without averaging measure the noise floor (the
+        variance of the S-parameters between the sweeps) and the time per
+        point. The IF bandwidth and the averaging count with the shortest
+        sweep that reaches `target_noise_db` are then set (see `plan_sweep`)
+        and applied to the instrument. Keep the antennas still while
+        optimizing.
+
+        The number of points is not optimized: the noise floor of a point
+        does not depend on it and every point makes the sweep longer, so
+        the search would always end at the fewest points. It is given by
+        `resolution` (the fewest points with that frequency step) or left as
+        it is.
+
+        Args:
+            target_noise_db (float): Target noise floor in dB.
+            sweeps (int, optional): Number of quick sweeps (at least 2).
+                Defaults to 3.
+            traces (str or list, optional): The traces used for the noise
+                (see `measure`). Defaults to ``'reflection'``.
+            resolution (float, optional): Frequency step in GHz of a linear
+                sweep, sets `freq_points`. Defaults to ``None``, keep the
+                points (and the segments of a segmented sweep).
+            max_averaging (int, optional): Maximum averaging count. Defaults
+                to ``None``, up to 1000.
+
+        Returns:
+            dict: The chosen ``'if_bandwidth'``, ``'averaging'`` and
+            ``'points'``, the measured and predicted noise floor
+            (``'measured_db'`` and ``'noise_db'``) and the predicted
+            duration of a measurement ``'sweep_seconds'``.
+
+        Raises:
+            ValueError: If the target cannot be reached or the `segments`
+                have their own IF bandwidth.
+            RuntimeError: If you are connected to the VNA.
+
+        Example:
+            >>> plan = vna.optimize_sweep(target_noise_db=-70.)
+            >>> print(plan['if_bandwidth'], plan['averaging'])
+        """
+        if sweeps < 2:
+            raise ValueError('Need at least 2 sweeps to measure the noise')
+        if self.segments and any(seg.if_bandwidth is not None
+                                 for seg in self.segments):
+            raise ValueError('The segments set their own IF bandwidth, '
+                             'remove it to optimize the sweep')
+
+        # the sweep of before, restored if the optimization fails (with the
+        # bandwidth of the instrument if the controller does not set one)
+        saved = (self.if_bandwidth, self.freq_points, self.averaging)
+        bandwidth = self.if_bandwidth
+        if bandwidth is None:
+            bandwidth = float(self._vna.query(':SENSe1:BWIDth?'))
+        probe = self.if_bandwidth or _PROBE_BANDWIDTH
+        try:
+            if resolution is not None and not self.segments:
+                self.freq_points = int(np.ceil(
+                    (self.freq_max - self.freq_min) / resolution - 1.e-9)) + 1
+            self.if_bandwidth = probe
+            self.averaging = None
+            self._set_sweep()
+            self._set_averaging()
+
+            data, seconds = [], []
+            for _ in range(sweeps):
+                start = time.perf_counter()
+                data.append(self.measure(traces=traces)[1])
+                seconds.append(time.perf_counter() - start)
+
+            noise = np.mean(np.var(np.stack(data), axis=0, ddof=1))
+            measured_db = 10. * math.log10(max(float(noise),
+                                               np.finfo(float).tiny))
+            points = self.sweep_points
+            point_seconds = max(float(np.min(seconds)) / points - 1. / probe,
+                                0.)
+            kwargs = {}
+            if max_averaging is not None:
+                kwargs['max_averaging'] = max_averaging
+            plan = plan_sweep(measured_db, probe, target_noise_db, points,
+                              point_seconds=point_seconds, **kwargs)
+        except BaseException:
+            self.if_bandwidth, self.freq_points, self.averaging = saved
+            self._set_sweep()
+            if self.if_bandwidth is None:
+                self._vna.write(':SENSe1:BWIDth {:f}Hz'.format(bandwidth))
+            self._set_averaging()
+            raise
+
+        self.if_bandwidth = plan['if_bandwidth']
+        self.averaging = plan['averaging'] if plan['averaging'] > 1 else None
+        self._set_sweep()
+        self._set_averaging()
+        plan.update(points=points, measured_db=float(measured_db))
+        _log.info('Sweep: %g Hz IF bandwidth, %d averages, %d points, '
+                  'noise %.1f dB, about %.2f s per measurement',
+                  plan['if_bandwidth'], plan['averaging'], points,
+                  plan['noise_db'], plan['sweep_seconds'])
+        return plan
+
     def poll_user_keys(self):
         """Poll the VNA for a pressed button.
 
@@ -0,0 +1,155 @@
+"""Stand-in for the R&S VNA on the raw SCPI socket (port 5025).
+
+Remembers the settings written to it (and answers the queries of the same
+header), creates traces with ``PARameter:SDEFine`` and answers the data
+queries of ``RSVNAControl.measure`` with noise. Connect with
+``vna.ip_address = '127.0.0.1'`` and ``vna.connect(link='socket')`` (set
+``vna.socket_port`` for a different port).
+
+Usage:
+    python scpi_server.py [--port 5025] [--sweep-seconds 0.05]
+"""
+import argparse
+import re
+import socketserver
+import time
+
+import numpy as np
+
+_IDN = 'Rohde-Schwarz,ZNB8-8Port,1311601044100105,3.45 (stand-in)'
+
+
+def _number(value):
+    """Parses '0.500000GHz', '1000Hz' or '201' to a float in base units."""
+    match = re.match(r'\s*([-+0-9.eE]+)\s*([a-zA-Z]*)', value)
+    scale = {'': 1., 'HZ': 1., 'KHZ': 1.e3, 'MHZ': 1.e6, 'GHZ': 1.e9,
+             'DBM': 1.}[match.group(2).upper()]
+    return float(match.group(1)) * scale
+
+
+class Instrument(object):
+    """The state of the stand-in instrument."""
+
+    def __init__(self, sweep_seconds=0.05):
+        self.sweep_seconds = sweep_seconds
+        self.reset()
+
+    def reset(self):
+        self.settings = {'SENSE1:SWEEP:TYPE': 'LINear',
+                         'SENSE1:SWEEP:POINTS': '201',
+                         'SENSE1:FREQUENCY:START': '1e9',
+                         'SENSE1:FREQUENCY:STOP': '8.5e9',
+                         'SENSE1:BWIDTH': '10000'}
+        self.traces = {}
+
+    def points(self):
+        if self.settings['SENSE1:SWEEP:TYPE'].upper().startswith('SEGM'):
+            return sum(int(_number(val)) for key, val in
+                       self.settings.items()
+                       if re.match(r'SENSE1:SEGMENT\d+:SWEEP:POINTS$', key))
+        return int(_number(self.settings['SENSE1:SWEEP:POINTS']))
+
+    def stimulus(self):
+        if self.settings['SENSE1:SWEEP:TYPE'].upper().startswith('SEGM'):
+            freq = []
+            iseg = 1
+            while 'SENSE1:SEGMENT{:d}:SWEEP:POINTS'.format(iseg) in \
+                    self.settings:
+                prefix = 'SENSE1:SEGMENT{:d}:'.format(iseg)
+                freq.append(np.linspace(
+                    _number(self.settings[prefix + 'FREQUENCY:START']),
+                    _number(self.settings[prefix + 'FREQUENCY:STOP']),
+                    int(_number(self.settings[prefix + 'SWEEP:POINTS']))))
+                iseg += 1
+            return np.concatenate(freq)
+        return np.linspace(_number(self.settings['SENSE1:FREQUENCY:START']),
+                           _number(self.settings['SENSE1:FREQUENCY:STOP']),
+                           self.points())
+
+    def trace_data(self, count):
+        data = np.random.normal(scale=1.e-3, size=2 * count * self.points())
+        return ','.join('{:.6e}'.format(val) for val in data)
+
+    def command(self, cmd):
+        """Executes one command, returns the response of a query (or
+        ``None``)."""
+        header, _, args = cmd.strip().partition(' ')
+        header = header.lstrip(':').upper()
+        # long form without the optional SENSe, e.g. 'SENS1:' == 'SENSE1:'
+        header = re.sub(r'\bSENS(\d)', r'SENSE\1', header)
+
+        if header == '*IDN?':
+            return _IDN
+        if header == '*RST':
+            self.reset()
+        elif header == '*OPC?':
+            return '1'
+        elif header.startswith('INIT') and 'IMM' in header:
+            time.sleep(self.sweep_seconds)
+        elif header.endswith('PARAMETER:SDEFINE'):
+            name, param = [arg.strip(" '") for arg in args.split(',')]
+            self.traces[name] = param
+        elif header.endswith('PARAMETER:CATALOG?'):
+            return "'" + ','.join('{:s},{:s}'.format(name, param)
+                                  for name, param in self.traces.items()) + \
+                   "'"
+        elif header.endswith('DATA:ALL?'):
+            return self.trace_data(len(self.traces))
+        elif header.endswith('DATA:TRACE?'):
+            return self.trace_data(1)
+        elif header.endswith('DATA:STIMULUS?'):
+            return ','.join('{:.6e}'.format(val) for val in self.stimulus())
+        elif header.endswith('TRACE:CATALOG?'):
+            return "''"
+        elif header.endswith('SEGMENT:COUNT?'):
+            nseg = 0
+            while 'SENSE1:SEGMENT{:d}:SWEEP:POINTS'.format(nseg + 1) in \
+                    self.settings:
+                nseg += 1
+            return str(nseg)
+        elif header == 'SENSE1:SWEEP:POINTS?':
+            # the total of the segments in a segmented sweep
+            return str(self.points())
+        elif header.endswith('?'):
+            value = self.settings.get(header[:-1], '0')
+            try:
+                return '{:.10g}'.format(_number(value))
+            except (AttributeError, KeyError, ValueError):
+                return value
+        elif args:
+            self.settings[header] = args.strip()
+        return None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            responses = []
+            for cmd in line.decode().split(';'):
+                if cmd.strip():
+                    resp = self.server.instrument.command(cmd)
+                    if resp is not None:
+                        responses.append(resp)
+            if responses:
+                self.wfile.write((';'.join(responses) + '\n').encode())
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='SCPI stand-in of the VNA')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5025)
+    parser.add_argument('--sweep-seconds', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    with socketserver.ThreadingTCPServer((args.host, args.port),
+                                         _Handler) as server:
+        server.instrument = Instrument(args.sweep_seconds)
+        print('SCPI stand-in listening on {:s}:{:d}'.format(args.host,
+                                                             args.port))
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,20 @@
+import os
+import sys
+import types
+
+_SRC = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))), 'src')
+sys.path.insert(0, _SRC)
+
+try:
+    import mwscanner_control  # noqa: F401
+except ImportError:
+    # without the hardware dependencies (sympy, pyvisa, ...) the package
+    # __init__ cannot be imported, the modules that do not need them are
+    # still tested (the others are skipped with pytest.importorskip)
+    for _name in [name for name in sys.modules
+                  if name.startswith('mwscanner_control.')]:
+        del sys.modules[_name]
+    _pkg = types.ModuleType('mwscanner_control')
+    _pkg.__path__ = [os.path.join(_SRC, 'mwscanner_control')]
+    sys.modules['mwscanner_control'] = _pkg
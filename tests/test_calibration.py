@@ -0,0 +1,63 @@
+import types
+
+from mwscanner_control.calibration import CalibrationRegistry, \
+    calibration_key
+from mwscanner_control.sweep import SweepSegment
+
+
+def _vna(**kwargs):
+    attrs = dict(_num_channels=8, if_bandwidth=1000, segments=None,
+                 freq_min=1., freq_max=8.5, freq_points=201)
+    attrs.update(kwargs)
+    return types.SimpleNamespace(**attrs)
+
+
+def test_key_types():
+    # e.g. optimize_sweep sets 1000, load_state reads 1000.
+    key = calibration_key(_vna())
+    assert calibration_key(_vna(if_bandwidth=1000.)) == key
+    assert CalibrationRegistry.file_name(key) == CalibrationRegistry.file_name(
+        calibration_key(_vna(if_bandwidth=1000., freq_points=201.)))
+    assert CalibrationRegistry.file_name(key).startswith('autoCal_8chan_')
+
+    seg = calibration_key(_vna(segments=[SweepSegment(1, 2, 11, 1000)]))
+    assert seg == calibration_key(_vna(
+        segments=[SweepSegment(1., 2., 11, 1000.)]))
+    assert 'points' not in seg
+
+
+def test_find():
+    reg = CalibrationRegistry(path=None, max_age=100.)
+    key = calibration_key(_vna())
+    assert reg.find(key) is None
+    reg.add(key, 'old', created=0.)
+    reg.add(key, 'new', created=50.)
+    reg.add(calibration_key(_vna(freq_points=101)), 'other', created=60.)
+    assert reg.find(key, now=60.)['file'] == 'new'
+    assert reg.find(calibration_key(_vna(if_bandwidth=1000.)),
+                    now=60.)['file'] == 'new'
+
+    reg.invalidate('new')
+    assert reg.find(key, now=60.)['file'] == 'old'
+    # too old
+    assert reg.find(key, now=120.) is None
+
+
+def test_is_valid():
+    reg = CalibrationRegistry(path=None, max_age=10.)
+    entry = reg.add(calibration_key(_vna()), 'cal', created=100.)
+    assert reg.is_valid(entry, now=105.)
+    assert not reg.is_valid(entry, now=111.)
+    reg.max_age = None
+    assert reg.is_valid(entry, now=1.e9)
+    reg.invalidate('cal')
+    assert not reg.is_valid(entry, now=105.)
+
+
+def test_save(tmp_path):
+    path = str(tmp_path / 'calibrations.json')
+    reg = CalibrationRegistry(path=path)
+    key = calibration_key(_vna())
+    reg.add(key, 'cal', created=1.)
+    assert CalibrationRegistry(path=path, max_age=None).find(key)['file'] \
+        == 'cal'
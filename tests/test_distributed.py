@@ -0,0 +1,121 @@
+import json
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('sympy')
+pytest.importorskip('matplotlib')
+
+from mwscanner_control.distributed import MotorNode, MotorCoordinator, \
+    RemoteMotorControl, RemoteError, _dumps  # noqa: E402
+
+
+class FakeMotorControl(object):
+    """The state and the moves of a MotorControl, without motors."""
+
+    def __init__(self, antennas, angles):
+        self._antenna_number = antennas
+        self._angles = angles
+        self._outer = [100.] * len(antennas)
+        self._inner = [10.] * len(antennas)
+        self.positions = [50.] * len(antennas)
+        self.head_positions = [None] * len(antennas)
+        self.progress_callback = None
+        self.plans = []
+
+    @property
+    def coordinates(self):
+        return [[pos, angle] for pos, angle in zip(self.positions,
+                                                   self._angles)]
+
+    def positions_trusted(self):
+        return True
+
+    def release_all(self):
+        # not JSON serializable
+        return object()
+
+    def move_to_positions(self, targets, pauses=False):
+        self.plans.append(dict(targets))
+        for motor, pos in sorted(targets.items()):
+            self.positions[motor] = pos
+            self.progress_callback('position', {'motor': motor,
+                                                'position': pos})
+
+
+@pytest.fixture
+def nodes():
+    controls = [FakeMotorControl([1, 2], [0., 45.]),
+                FakeMotorControl([3], [90.])]
+    servers = [MotorNode(mc, port=0, event_interval=0.) for mc in controls]
+    for server in servers:
+        server.start()
+    coord = MotorCoordinator([('127.0.0.1', server.port)
+                              for server in servers], lead=.05)
+    yield controls, coord
+    coord.close()
+    for server in servers:
+        server.stop()
+
+
+def test_move_to_positions(nodes):
+    controls, coord = nodes
+    assert len(coord) == 3
+    assert coord.get_angle(2) == 90.
+    events = []
+    coord.progress_callback = lambda event, data: events.append(
+        (event, data['motor'], data['position']))
+
+    coord.move_to_positions([40., 30., 20.])
+    assert controls[0].plans == [{0: 40., 1: 30.}]
+    assert controls[1].plans == [{0: 20.}]
+    assert coord.positions == [40., 30., 20.]
+    # the events of the second node have the motor index of the coordinator
+    assert sorted(events) == [('position', 0, 40.), ('position', 1, 30.),
+                              ('position', 2, 20.)]
+
+    # only the nodes with targets move
+    coord.move_to_positions({2: 25.})
+    assert len(controls[0].plans) == 1
+    assert controls[1].plans[-1] == {0: 25.}
+
+
+def test_move_backward_all(nodes):
+    controls, coord = nodes
+    coord.move_backward(100, 5.)
+    assert controls[0].plans == [{0: 55., 1: 55.}]
+    assert controls[1].plans == [{0: 55.}]
+
+
+def test_result_not_serializable(nodes):
+    controls, coord = nodes
+    with pytest.raises(RemoteError, match='TypeError'):
+        coord.nodes[0].release_all()
+    # the connection still works
+    assert coord.positions_trusted()
+
+
+def test_invalid_message():
+    server = socket.create_server(('127.0.0.1', 0))
+
+    def serve():
+        conn, _ = server.accept()
+        with conn, conn.makefile('rwb') as fid:
+            fid.write(b'not json\n{"event": "position"}\n')
+            fid.flush()
+            request = json.loads(fid.readline())
+            fid.write(_dumps({'id': request['id'], 'result': 42.}))
+            fid.flush()
+            fid.readline()
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    remote = RemoteMotorControl('127.0.0.1', server.getsockname()[1],
+                                timeout=5.)
+    remote.progress_callback = lambda event, data: None
+    try:
+        assert remote.call('clock') == 42.
+    finally:
+        remote.close()
+        server.close()
@@ -0,0 +1,73 @@
+import json
+
+from mwscanner_control.instrumentation import MotionStats, VNAStats
+
+
+def test_histogram():
+    stats = MotionStats(2, labels=[5, 6], enabled=True)
+    for nsec in (1, 3, 4, 1000, 1023):
+        stats.record_step(1, nsec)
+    stats.record_gpio(1, 0)
+    stats.count(1, 'switch_presses', 2)
+
+    snap = stats.snapshot()
+    assert snap['motors'][0]['steps'] == 0
+    motor = snap['motors'][1]
+    assert motor['label'] == 6
+    assert motor['steps'] == 5
+    assert motor['switch_reads'] == 1
+    assert motor['switch_presses'] == 2
+    # the keys are the exclusive upper bounds, bucket k is < 2**k ns
+    assert motor['onestep_ns']['buckets'] == {2: 1, 4: 1, 8: 1, 1024: 2}
+    assert motor['onestep_ns']['count'] == 5
+    assert motor['onestep_ns']['total_ns'] == 2031
+    assert motor['onestep_ns']['mean_ns'] == 2031 / 5
+    assert motor['gpio_ns']['buckets'] == {1: 1}
+    assert snap['motors'][0]['gpio_ns']['mean_ns'] == 0.
+    json.dumps(snap)
+
+
+def test_phases():
+    stats = MotionStats(2, labels=[5, 6])
+    # disabled: no timing
+    assert stats.start_phase() == 0
+    stats.end_phase('homing', 0, 0)
+    assert stats.snapshot()['phases'] == {}
+
+    stats.enabled = True
+    for motor in (0, 0, 1):
+        stats.end_phase('homing', motor, stats.start_phase())
+    phases = stats.snapshot()['phases']
+    assert phases['homing'][5]['count'] == 2
+    assert phases['homing'][6]['count'] == 1
+    assert phases['homing'][5]['total_ns'] >= 0
+
+
+def test_snapshot_is_a_copy():
+    stats = MotionStats(1, enabled=True)
+    stats.record_step(0, 10)
+    stats.end_phase('move', 0, stats.start_phase())
+    snap = stats.snapshot()
+    stats.record_step(0, 10)
+    assert snap['motors'][0]['steps'] == 1
+
+    stats.reset()
+    snap = stats.snapshot()
+    assert snap['motors'][0]['steps'] == 0
+    assert snap['motors'][0]['onestep_ns']['buckets'] == {}
+    assert snap['phases'] == {}
+
+
+def test_vna_stats():
+    stats = VNAStats()
+    stats.record_measure(.5, 100)
+    stats.record_measure(1.5, 300, sweeps=4)
+    snap = stats.snapshot()
+    assert snap['sweeps'] == 5
+    assert snap['measure_count'] == 2
+    assert snap['measure_seconds'] == 2.
+    assert snap['measure_max'] == 1.5
+    assert snap['bytes_received'] == 400
+    stats.reset()
+    assert stats.snapshot()['sweeps'] == 0
+    assert snap['sweeps'] == 5
@@ -0,0 +1,45 @@
+import numpy as np
+import pytest
+
+from mwscanner_control.layout import AntennaLayout
+
+
+def test_default():
+    layout = AntennaLayout.default()
+    assert len(layout) == 8
+    assert layout.hats == [0x60, 0x61, 0x62, 0x63]
+    assert layout.antenna_number(0x61, 1) == 3
+    assert layout.antenna_number('0x63', 0) == 6
+    assert np.allclose(layout.inner, layout.outer - 40.)
+    assert np.allclose(layout.directions[2], [1., 0.])
+
+
+def test_dict_round_trip(tmp_path):
+    layout = AntennaLayout.regular(6, outer_dist=110., travel=35.,
+                                   addresses=[0x70, 0x71, 0x72])
+    config = layout.to_dict()
+    assert config['antennas'][3] == {'angle': 270., 'outer_dist': 110.,
+                                     'travel': 35., 'address': '0x71',
+                                     'stepper': 1}
+    copy = AntennaLayout.from_dict(config)
+    assert copy.to_dict() == config
+    assert copy.antenna_number(0x72, 0) == 4
+
+    path = str(tmp_path / 'layout.json')
+    layout.to_file(path)
+    assert AntennaLayout.from_file(path).to_dict() == config
+
+
+def test_antenna_number_unknown():
+    with pytest.raises(ValueError):
+        AntennaLayout.default().antenna_number(0x64, 0)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        AntennaLayout([0., 90.], [100.], 40., [0x60, 0x60], [0, 1])
+    # two antennas on one stepper
+    with pytest.raises(ValueError):
+        AntennaLayout([0., 90.], [100., 100.], 40., [0x60, 0x60], [0, 0])
+    with pytest.raises(ValueError):
+        AntennaLayout.regular(5, outer_dist=100., addresses=[0x60, 0x61])
@@ -0,0 +1,75 @@
+import logging
+import time
+
+import pytest
+
+from mwscanner_control.logs import RateLimitFilter, get_logger, \
+    configure_logging, set_quiet, stop_logging
+
+
+def _record(msg, category=None):
+    record = logging.LogRecord('mwscanner_control.motor', logging.DEBUG,
+                               __file__, 1, msg, None, None)
+    if category is not None:
+        record.category = category
+    return record
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [100.]
+    monkeypatch.setattr(time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_rate_limit(clock):
+    filt = RateLimitFilter(interval=1.)
+    assert filt.filter(_record('first', 'switch'))
+    assert not filt.filter(_record('second', 'switch'))
+    clock[0] += .5
+    assert not filt.filter(_record('third', 'switch'))
+    clock[0] += .6
+    record = _record('fourth', 'switch')
+    assert filt.filter(record)
+    assert record.getMessage() == 'fourth [2 similar suppressed]'
+    # the count starts again
+    clock[0] += 1.
+    record = _record('fifth', 'switch')
+    assert filt.filter(record)
+    assert record.getMessage() == 'fifth'
+
+
+def test_categories(clock):
+    filt = RateLimitFilter(interval=1.)
+    assert filt.filter(_record('switch', 'switch'))
+    assert filt.filter(_record('bounce', 'bounce'))
+    assert not filt.filter(_record('bounce', 'bounce'))
+    # records without category are never dropped
+    assert all(filt.filter(_record('plain')) for _ in range(5))
+
+
+def test_get_logger():
+    assert get_logger().name == 'mwscanner_control'
+    assert get_logger('motor').name == 'mwscanner_control.motor'
+
+
+@pytest.fixture
+def handler():
+    logger = get_logger()
+    state = logger.handlers[:], logger.level, logger.propagate
+    yield logging.NullHandler()
+    stop_logging()
+    logger.handlers[:], logger.level, logger.propagate = state
+
+
+def test_set_quiet(handler):
+    logger = configure_logging(level=logging.DEBUG, handler=handler)
+    set_quiet()
+    assert logger.level == logging.WARNING
+    set_quiet(False)
+    assert logger.level == logging.DEBUG
+
+
+def test_capture_warnings(handler):
+    configure_logging(handler=handler)
+    assert handler not in logging.getLogger('py.warnings').handlers
@@ -0,0 +1,82 @@
+import types
+import urllib.error
+import urllib.request
+
+import pytest
+
+from mwscanner_control import instrumentation
+from mwscanner_control.instrumentation import MotionStats, VNAStats
+from mwscanner_control.metrics import MetricsServer, motor_metrics, \
+    vna_metrics
+
+
+@pytest.fixture
+def motion_stats(monkeypatch):
+    stats = MotionStats(2, labels=[3, 4], enabled=True)
+    for _ in range(400):
+        stats.record_step(0, 1000)
+    stats.count(0, 'switch_presses')
+    stats.count(1, 'bounces', 2)
+    # two seconds of homing and two of moving for antenna 3
+    monkeypatch.setattr(instrumentation, 'perf_counter_ns',
+                        lambda: 3 * 10 ** 9)
+    stats.end_phase('homing', 0, 10 ** 9)
+    stats.end_phase('move', 0, 10 ** 9)
+    return stats
+
+
+def test_motor_metrics(motion_stats):
+    lines = []
+    motor_metrics(motion_stats, lines)
+    assert lines[:4] == [
+        '# HELP mwscanner_motor_steps_total Motor steps taken.',
+        '# TYPE mwscanner_motor_steps_total counter',
+        'mwscanner_motor_steps_total{antenna="3"} 400',
+        'mwscanner_motor_steps_total{antenna="4"} 0']
+    assert 'mwscanner_motor_steps_per_second{antenna="3"} 100.0' in lines
+    assert 'mwscanner_motor_steps_per_second{antenna="4"} 0.0' in lines
+    assert 'mwscanner_switch_presses_total{antenna="3"} 1' in lines
+    assert 'mwscanner_switch_bounces_total{antenna="4"} 2' in lines
+    assert '# TYPE mwscanner_homing_duration_seconds summary' in lines
+    assert 'mwscanner_homing_duration_seconds_sum{antenna="3"} 2.0' in lines
+    assert 'mwscanner_homing_duration_seconds_count{antenna="3"} 1' in lines
+
+
+def test_vna_metrics():
+    stats = VNAStats()
+    stats.record_measure(.25, 1000, sweeps=2)
+    stats.reconnects = 1
+    lines = []
+    vna_metrics(stats, lines)
+    assert 'mwscanner_vna_sweeps_total 2' in lines
+    assert 'mwscanner_vna_measure_seconds_sum 0.25' in lines
+    assert 'mwscanner_vna_measure_seconds_count 1' in lines
+    assert 'mwscanner_vna_bytes_received_total 1000' in lines
+    assert 'mwscanner_vna_reconnects_total 1' in lines
+    # every sample has its HELP and TYPE
+    names = [line.split()[2] for line in lines if line.startswith('# TYPE')]
+    assert len(names) == 6
+
+
+def test_server(motion_stats):
+    motion_stats.enabled = False
+    motor_control = types.SimpleNamespace(stats=motion_stats)
+    server = MetricsServer(motor_control=motor_control,
+                           vna=types.SimpleNamespace(stats=VNAStats()),
+                           port=0)
+    server.start()
+    try:
+        assert server.port != 0
+        # serving enables the instrumentation
+        assert motion_stats.enabled
+        url = 'http://127.0.0.1:{:d}'.format(server.port)
+        with urllib.request.urlopen(url + '/metrics', timeout=5.) as resp:
+            assert resp.headers['Content-Type'].startswith('text/plain')
+            body = resp.read().decode()
+        assert body == server.render()
+        assert 'mwscanner_motor_steps_total{antenna="3"} 400\n' in body
+        assert 'mwscanner_vna_sweeps_total 0\n' in body
+        with pytest.raises(urllib.error.HTTPError):
+            urllib.request.urlopen(url + '/other', timeout=5.)
+    finally:
+        server.stop()
@@ -0,0 +1,365 @@
+import itertools
+import threading
+import time
+import types
+
+import pytest
+
+pytest.importorskip('sympy')
+pytest.importorskip('matplotlib')
+
+from mwscanner_control import motor_control  # noqa: E402
+from mwscanner_control.motor_control import MotorControl, \
+    MotionCancelled  # noqa: E402
+
+FORWARD, BACKWARD = 1, 2
+
+
+class FakeStepper(object):
+    """A stepper on its lead screw, stepping like the adafruit_motor driver
+    (16 microsteps, the other styles align to the half steps first). The
+    releases of the coils are counted."""
+
+    def __init__(self, rig=None, usteps=0):
+        self.rig = rig
+        self.releases = 0
+        # position in microsteps from the home switch and driver counter
+        self.usteps = usteps
+        self.counter = 0
+        # (direction, style, rate) of every step
+        self.steps = []
+        # every second forward step is lost above this rate (steps/s)
+        self.max_rate = None
+
+    def release(self):
+        self.releases += 1
+
+    def onestep(self, direction, style):
+        half, full = 8, 16
+        size = 1 if style == 'microstep' else 0
+        if style != 'microstep':
+            # the driver aligns to the half steps first
+            extra = self.counter % half
+            align = 0
+            if extra:
+                align = half - extra if direction == FORWARD else extra
+            aligned = self.counter + (align if direction == FORWARD
+                                      else -align)
+            odd = (aligned // half) % 2
+            if (style == 'single' and odd) or (style == 'double' and
+                                               not odd):
+                size = half
+            elif style in ('single', 'double'):
+                size = full
+            elif not extra:
+                size = half
+            size += align
+        rate = self.rig.rate if self.rig is not None else None
+        self.steps.append((direction, style, rate))
+        lost = self.max_rate is not None and rate is not None and \
+            rate > self.max_rate and direction == FORWARD and \
+            len(self.steps) % 2 == 0
+        moved = size if direction == FORWARD else -size
+        self.counter += moved
+        if not lost:
+            self.usteps += moved
+        return self.counter % 64
+
+
+class Rig(object):
+    """Simulated hardware: the steppers and the switch shared by all the
+    antennas, pressed at home and on the head."""
+
+    def __init__(self, num, usteps=4000):
+        self.steppers = [FakeStepper(self, usteps) for _ in range(num)]
+        # head contact of every antenna in microsteps (None: no head)
+        self.head = [None] * num
+        # step rate of the running move, see `pace`
+        self.rate = None
+        # the switch reports that many readings late
+        self.lag = 0
+        self._readings = []
+
+    def pace(self, rate, last):
+        """Stands in for `MotorControl._pace`, without waiting."""
+        self.rate = rate
+        return 0.
+
+    def pressed(self):
+        return any(stp.usteps <= 0 or (head is not None and
+                                       stp.usteps >= head)
+                   for stp, head in zip(self.steppers, self.head))
+
+    def input(self, pin):
+        """Stands in for `GPIO.input`, 0 if the switch is pressed."""
+        self._readings.append(0 if self.pressed() else 1)
+        if len(self._readings) <= self.lag:
+            return 1
+        return self._readings[-1 - self.lag]
+
+    def phases(self, motor):
+        """The (direction, style) of the consecutive steps of a motor."""
+        return [key for key, _ in itertools.groupby(
+            step[:2] for step in self.steppers[motor].steps)]
+
+
+@pytest.fixture
+def motors():
+    with pytest.warns(UserWarning):
+        mc = MotorControl()
+    mc._steppers = [FakeStepper() for _ in mc._motor_id]
+    return mc
+
+
+@pytest.fixture
+def sim(monkeypatch):
+    """Two antennas on the simulated hardware (10 mm from home)."""
+    rig = Rig(2)
+    monkeypatch.setattr(motor_control, 'stepper',
+                        types.SimpleNamespace(FORWARD=FORWARD,
+                                              BACKWARD=BACKWARD),
+                        raising=False)
+    styles = {style: style for style in motor_control._STYLE_USTEPS}
+    monkeypatch.setattr(motor_control, '_STEPPER_STYLES', styles)
+    monkeypatch.setattr(motor_control, 'GPIO', rig, raising=False)
+    monkeypatch.setattr(MotorControl, '_pace', staticmethod(rig.pace))
+    with pytest.warns(UserWarning):
+        mc = MotorControl(motor_id=[[0, 0], [0, 1]])
+    mc._steppers = rig.steppers
+    mc.pin_checks = 2
+    mc.hold_timeout = 0.
+    return mc, rig
+
+
+def _in_thread(func, *args, timeout=2.):
+    """Runs `func` and fails if it does not return (e.g. a deadlock)."""
+    thread = threading.Thread(target=func, args=args, daemon=True)
+    thread.start()
+    thread.join(timeout)
+    assert not thread.is_alive(), 'deadlock in {:s}'.format(func.__name__)
+
+
+def test_release_without_hold(motors):
+    motors.hold_timeout = 0.
+    _in_thread(motors._energize, 0)
+    _in_thread(motors._release, 0)
+    assert motors._released[0]
+    assert motors._steppers[0].releases == 1
+
+
+def test_hold_timer_then_move(motors):
+    motors.hold_timeout = .05
+    _in_thread(motors._energize, 0)
+    _in_thread(motors._release, 0)
+    assert not motors._released[0]
+    time.sleep(.3)
+    assert motors._released[0]
+    assert motors._steppers[0].releases == 1
+    assert motors._hold_timers[0] is None
+
+    # the next move energizes the motor again
+    _in_thread(motors._energize, 0)
+    assert not motors._released[0]
+    _in_thread(motors._release, 0)
+    time.sleep(.3)
+    assert motors._steppers[0].releases == 2
+
+
+def test_hold_forever(motors):
+    motors.hold_timeout = None
+    _in_thread(motors._energize, 0)
+    _in_thread(motors._release, 0)
+    time.sleep(.1)
+    assert not motors._released[0]
+    assert motors._steppers[0].releases == 0
+
+
+def test_two_phase_homing(sim):
+    mc, rig = sim
+    mc.init_motors(pauses=False)
+    assert mc.positions_trusted()
+    assert mc.positions == mc._outer
+    for im, stp in enumerate(rig.steppers):
+        # fast approach, back off, slow touch and release
+        assert rig.phases(im) == [(BACKWARD, 'double'), (FORWARD, 'double'),
+                                  (BACKWARD, 'interleave'),
+                                  (FORWARD, 'interleave')]
+        backoff = [step for step in stp.steps
+                   if step[:2] == (FORWARD, 'double')]
+        assert len(backoff) == mc._dist2steps(mc.homing_backoff[im])
+        touch = [step for step in stp.steps
+                 if step[:2] == (BACKWARD, 'interleave')]
+        assert {step[2] for step in touch} == {mc.homing_slow_rate[im]}
+        # released right after the switch
+        assert 0 < stp.usteps <= 8
+
+
+def test_one_phase_homing(sim):
+    mc, rig = sim
+    mc.two_phase_homing = False
+    mc.init_motors(pauses=False)
+    assert mc.positions_trusted()
+    for im, stp in enumerate(rig.steppers):
+        assert rig.phases(im) == [(BACKWARD, 'double'),
+                                  (FORWARD, 'interleave')]
+        assert {step[2] for step in stp.steps} == {None}
+        assert 0 < stp.usteps <= 8
+
+
+def test_set_on_head_trusted(sim, caplog):
+    mc, rig = sim
+    rig.head = [12000, 12000]
+    mc.init_motors(pauses=False)
+    for stp in rig.steppers:
+        stp.steps = []
+
+    with caplog.at_level('INFO', logger='mwscanner_control.motor'):
+        mc.set_on_head(pauses=False)
+    assert 'Positions are trusted, skipping homing' in caplog.text
+    for im, stp in enumerate(rig.steppers):
+        # no homing, straight to the head
+        assert stp.steps[0][0] == FORWARD
+        assert 12000 - 8 <= stp.usteps < 12000
+        assert mc.head_positions[im] == mc.positions[im]
+
+    # an antenna is not trusted anymore: all are homed again
+    mc._distrust(0, 'test')
+    for stp in rig.steppers:
+        stp.steps = []
+    mc.set_on_head(pauses=False)
+    for im, stp in enumerate(rig.steppers):
+        assert stp.steps[0][:2] == (BACKWARD, 'double')
+        assert 12000 - 8 <= stp.usteps < 12000
+    assert mc.positions_trusted()
+
+
+def test_onestep_tracks_alignment(sim):
+    mc, rig = sim
+    stp = rig.steppers[0]
+    mc._onestep(0, FORWARD, 'interleave')
+    start = stp.usteps
+    assert mc._onestep(0, FORWARD, 'microstep') == 1
+    # aligns to the half step (7) and goes on to the next full step
+    assert mc._onestep(0, FORWARD, 'double') == 15
+    assert mc._onestep(0, FORWARD, 'double') == 16
+    assert mc._onestep(0, BACKWARD, 'interleave') == -8
+    # the driver counter wraps every 4 full steps
+    total = 24
+    for style in itertools.islice(itertools.cycle(
+            ['microstep', 'double', 'interleave', 'single', 'microstep']),
+            60):
+        total += mc._onestep(0, FORWARD, style)
+    assert total == stp.usteps - start
+
+
+def test_move_styles(sim):
+    mc, rig = sim
+    mc.init_motors(pauses=False)
+    styles = list(mc._move_styles(2.))
+    # 1.5 mm in full steps, the last 0.5 mm (and the rest) in half steps
+    assert styles.count('double') == 37
+    assert styles.count('interleave') == 26
+    assert styles[-1] == 'interleave'
+
+    offset = rig.steppers[0].usteps
+    mc.move_forward(0, 2., pauses=False)
+    mc.move_forward(0, 1.01, pauses=False)
+    mc.move_backward(0, 2.5, pauses=False)
+    # the tracked position is the position of the stepper
+    usteps = rig.steppers[0].usteps - offset
+    assert mc._antenna_usteps[0] == usteps
+    assert mc.positions[0] == mc._outer[0] - usteps / 400
+    assert abs(mc.positions[0] - (mc._outer[0] - .51)) <= .02
+
+
+def test_tune_step_rate(sim, tmp_path):
+    mc, rig = sim
+    rig.steppers[0].max_rate = 300
+    path = str(tmp_path / 'rates.json')
+    tuned = mc.tune_step_rate(rates=(100, 200, 400, 800), distance=2.,
+                              profile=path)
+    assert tuned == [200, 800]
+    assert mc.step_rate == [200, 800]
+    assert mc.homing_fast_rate == [200, 800]
+    assert mc.positions_trusted()
+
+    mc.step_rate = [None, None]
+    mc.load_rate_profile(path)
+    assert mc.step_rate == [200, 800]
+
+
+def test_tune_step_rate_lost(sim):
+    mc, rig = sim
+    rig.steppers[0].max_rate = 50
+    with pytest.warns(UserWarning, match='Could not tune'):
+        tuned = mc.tune_step_rate(rates=(100, 200), distance=2., repeats=1)
+    assert tuned == [None, 200]
+    assert mc.step_rate == [None, 200]
+
+
+def test_move_all(sim):
+    mc, rig = sim
+    mc.scheduler.bus_step_rate = None
+    mc.init_motors(pauses=False)
+    events = []
+    mc.progress_callback = lambda event, data: events.append(
+        (event, data.get('motor')))
+
+    mc.move_forward(100, 5., pauses=False)
+    assert ('schedule', None) in events
+    # the antennas move at the same time
+    moved = [motor for event, motor in events if event == 'position']
+    assert moved.index(1) < len(moved) - 1 - moved[::-1].index(0)
+    for im in range(2):
+        assert abs(mc.positions[im] - (mc._outer[im] - 5.)) <= .02
+
+    # one after the other without scheduler
+    mc.scheduler = None
+    events.clear()
+    mc.move_backward(100, 5., pauses=False)
+    moved = [motor for event, motor in events if event == 'position']
+    assert moved == sorted(moved)
+    assert ('schedule', None) not in events
+
+
+def test_switch_in_concurrent_moves(sim):
+    mc, rig = sim
+    mc.scheduler.bus_step_rate = None
+    mc.init_motors(pauses=False)
+    offsets = [stp.usteps for stp in rig.steppers]
+    for stp in rig.steppers:
+        stp.steps = []
+    # antenna 1 touches the head after 4 mm and the switch reports it one
+    # reading late, after the step of antenna 0
+    rig.head[1] = offsets[1] + 1600
+    rig.lag = 1
+
+    targets = [pos - 10. for pos in mc.positions]
+    mc.move_to_positions(targets)
+    # antenna 0 was backed off first, but still reaches its target
+    assert (BACKWARD, 'interleave') in rig.phases(0)
+    assert abs(mc.positions[0] - targets[0]) <= .02
+    # antenna 1 stopped on the head
+    assert rig.head[1] - 16 <= rig.steppers[1].usteps < rig.head[1]
+    for im, stp in enumerate(rig.steppers):
+        assert mc._antenna_usteps[im] == stp.usteps - offsets[im]
+    assert mc.positions_trusted()
+
+
+def test_pause_callback(sim):
+    mc, rig = sim
+    paused = []
+    mc.pause_callback = lambda: paused.append(rig.steppers[1].steps[:])
+    mc.init_motors(pauses=True)
+    # after every antenna
+    assert len(paused) == 2
+    assert paused[0] == []
+
+    # a cancel while paused stops before the next antenna
+    mc.pause_callback = mc.request_cancel
+    for stp in rig.steppers:
+        stp.steps = []
+    with pytest.raises(MotionCancelled):
+        mc.move_forward(100, 1., pauses=True)
+    assert rig.steppers[0].steps
+    assert rig.steppers[1].steps == []
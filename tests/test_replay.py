@@ -0,0 +1,116 @@
+import gzip
+import json
+
+import pytest
+
+from mwscanner_control.replay import SessionRecorder, ReplayResource, \
+    RecordedError
+
+
+class FakeResource(object):
+    """Answers every query with the command in upper case."""
+
+    def __init__(self):
+        self.written = []
+        self.timeout = 5000
+        self.closed = False
+
+    def write(self, cmd):
+        self.written.append(cmd)
+        return len(cmd)
+
+    def query(self, cmd):
+        if cmd == 'timeout?':
+            raise TimeoutError('no response')
+        return cmd.upper()
+
+    def close(self):
+        self.closed = True
+
+
+def _record(path):
+    resource = FakeResource()
+    rec = SessionRecorder(resource, path, link='socket')
+    rec.write('*RST')
+    assert rec.query('*idn?') == '*IDN?'
+    rec.write(':INIT')
+    assert rec.query(':data?') == ':DATA?'
+    # not recorded
+    assert rec.timeout == 5000
+    rec.close()
+    assert resource.closed
+    assert resource.written == ['*RST', ':INIT']
+
+
+def test_round_trip(tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    _record(path)
+    with gzip.open(path, 'rt') as fid:
+        lines = [json.loads(line) for line in fid]
+    assert lines[0]['link'] == 'socket'
+    assert [line['op'] for line in lines[1:]] == ['write', 'query', 'write',
+                                                  'query']
+
+    replay = ReplayResource(path)
+    assert len(replay) == 4
+    assert replay.header['link'] == 'socket'
+    replay.write('*RST')
+    assert replay.query('*idn?') == '*IDN?'
+    replay.write(':INIT')
+    assert replay.query(':data?') == ':DATA?'
+    assert replay.remaining == 0
+    with pytest.raises(RuntimeError):
+        replay.query(':data?')
+
+
+def test_strict(tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    _record(path)
+    replay = ReplayResource(path)
+    with pytest.raises(RuntimeError):
+        replay.query('*RST')
+
+    replay = ReplayResource(path, strict=False)
+    replay.write('*CLS')
+    assert replay.query('*opc?') == '*IDN?'
+
+
+def test_version(tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    with gzip.open(path, 'wt') as fid:
+        fid.write(json.dumps({'version': 99}) + '\n')
+    with pytest.raises(ValueError):
+        ReplayResource(path)
+
+
+def test_error(tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    with SessionRecorder(FakeResource(), path) as rec:
+        with pytest.raises(TimeoutError):
+            rec.query('timeout?')
+        rec.write('*CLS')
+
+    replay = ReplayResource(path)
+    with pytest.raises(RecordedError, match='TimeoutError: no response'):
+        replay.query('timeout?')
+    replay.write('*CLS')
+
+
+def test_truncated(tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    rec = SessionRecorder(FakeResource(), path)
+    rec.write('*RST')
+    rec.query('*idn?')
+    # every exchange is on disk before the recorder is closed
+    with open(path, 'rb') as fid:
+        data = fid.read()
+    rec.close()
+    crashed = str(tmp_path / 'crashed.scpi.gz')
+    with open(crashed, 'wb') as fid:
+        fid.write(data)
+
+    with pytest.warns(RuntimeWarning):
+        replay = ReplayResource(crashed)
+    assert len(replay) == 2
+    replay.write('*RST')
+    assert replay.query('*idn?') == '*IDN?'
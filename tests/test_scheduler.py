@@ -0,0 +1,44 @@
+import types
+
+import pytest
+
+from mwscanner_control.scheduler import MotionScheduler
+
+
+def _job(motor, steps, rate):
+    return types.SimpleNamespace(motor=motor, steps=steps, rate=rate)
+
+
+def test_single_move():
+    sched = MotionScheduler(bus_step_rate=None)
+    # 10 steps at 100 steps/s, the last one takes 1 ms
+    assert sched._simulate([_job(0, 10, 100.)], [1.e-3]) == \
+        pytest.approx(.091)
+
+
+def test_concurrent_moves():
+    jobs = [_job(0, 10, 100.), _job(1, 5, 100.)]
+    sched = MotionScheduler(max_energized=2, bus_step_rate=None)
+    assert sched._simulate(jobs, [1.e-3, 1.e-3]) == pytest.approx(.091)
+    # one after the other
+    sched.max_energized = 1
+    assert sched._simulate(jobs, [1.e-3, 1.e-3]) == pytest.approx(.091 + .041)
+
+
+def test_bus_limit():
+    jobs = [_job(0, 5, 100.), _job(1, 5, 100.)]
+    # the bus allows one step every 20 ms for both motors
+    sched = MotionScheduler(max_energized=2, bus_step_rate=50.)
+    assert sched._simulate(jobs, [1.e-3, 1.e-3]) == pytest.approx(.181)
+
+
+def test_slow_steps():
+    # the step takes longer than the interval of the rate
+    sched = MotionScheduler(bus_step_rate=None)
+    assert sched._simulate([_job(0, 4, 1000.)], [5.e-3]) == \
+        pytest.approx(.02)
+
+
+def test_invalid():
+    with pytest.raises(ValueError):
+        MotionScheduler(max_energized=0)
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from mwscanner_control.sparams import SMatrix, upper_pairs, trace_pairs, \
+    packed_index
+
+
+def _dense(num_ports, freq=5, seed=0):
+    rng = np.random.default_rng(seed)
+    dense = rng.normal(size=(freq, num_ports, num_ports)) + \
+        1j * rng.normal(size=(freq, num_ports, num_ports))
+    # reciprocal
+    return dense + np.swapaxes(dense, 1, 2)
+
+
+def _pack(dense, pairs):
+    return np.stack([dense[:, ik, ij] for ik, ij in pairs])
+
+
+def test_packing():
+    dense = _dense(4)
+    pairs = upper_pairs(4)
+    assert len(pairs) == 10
+    ik, ij = np.array(pairs).T
+    assert packed_index(ik, ij, 4).tolist() == list(range(10))
+    assert packed_index(ij, ik, 4).tolist() == list(range(10))
+
+    sparam = SMatrix(_pack(dense, pairs), 4)
+    assert sparam.freq_points == 5
+    assert np.array_equal(sparam.full(), dense)
+    assert np.asarray(sparam).shape == (5, 4, 4)
+    assert sparam.nbytes < dense.nbytes
+
+
+def test_indexing():
+    dense = _dense(3)
+    sparam = SMatrix(_pack(dense, upper_pairs(3)), 3)
+    assert np.array_equal(sparam[0, 2], dense[:, 0, 2])
+    assert np.array_equal(sparam[2, 0], dense[:, 0, 2])
+    # a view of the packed row
+    assert np.shares_memory(sparam[1, 2], sparam.data)
+    assert np.array_equal(sparam.reflection,
+                          np.diagonal(dense, axis1=1, axis2=2).T)
+    assert np.array_equal(sparam.neighbours[2], dense[:, 2, 0])
+    assert (1, 2) in sparam
+
+
+def test_subset():
+    dense = _dense(4)
+    pairs = trace_pairs(4, 'reflection')
+    assert pairs == [(0, 0), (1, 1), (2, 2), (3, 3)]
+    sparam = SMatrix(_pack(dense, pairs), 4, pairs)
+    assert (0, 1) not in sparam
+    with pytest.raises(KeyError):
+        sparam[0, 1]
+    with pytest.raises(KeyError):
+        sparam.neighbours
+    full = sparam.full()
+    assert np.isnan(full[:, 0, 1]).all()
+    assert np.array_equal(full[:, 3, 3], dense[:, 3, 3])
+
+
+def test_trace_pairs():
+    assert trace_pairs(4, 'neighbour') == [(0, 1), (0, 3), (1, 2), (2, 3)]
+    assert trace_pairs(4, 'transmission') == [(0, 2), (1, 3)]
+    assert trace_pairs(3, [(1, 0), (0, 1)]) == [(0, 1)]
+    with pytest.raises(ValueError):
+        trace_pairs(3, 'diagonal')
+    with pytest.raises(IndexError):
+        trace_pairs(3, [(0, 3)])
+
+
+def test_wrong_shape():
+    with pytest.raises(ValueError):
+        SMatrix(np.zeros((5, 10)), 3)
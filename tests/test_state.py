@@ -0,0 +1,74 @@
+import types
+
+import pytest
+
+from mwscanner_control.state import snapshot_query, parse_snapshot, \
+    differences, desired_state, state_commands, trace_catalog, \
+    segment_query, parse_segments, desired_segments, segment_differences
+from mwscanner_control.sweep import SweepSegment
+
+_SNAPSHOT = "0;1;LIN;201;1000000000;8500000000;0;10000;1;4;RED;" \
+            "'Trc1,S11,Trc2,S12,Trc4,S22'"
+
+
+def _vna(**kwargs):
+    attrs = dict(sweep_points=201, if_bandwidth=1.e4, averaging=4,
+                 segments=None, freq_min=1., freq_max=8.5, _num_channels=2)
+    attrs.update(kwargs)
+    return types.SimpleNamespace(**attrs)
+
+
+def test_parse_snapshot():
+    state = parse_snapshot(_SNAPSHOT)
+    assert state['continuous'] is False
+    assert state['display'] is True
+    assert state['sweep_type'] == 'LIN'
+    assert state['points'] == 201
+    assert state['freq_max'] == 8.5e9
+    assert state['avg_count'] == 4
+    assert state['traces'] == trace_catalog(2)
+    assert len(snapshot_query().split(';')) == len(state)
+
+
+def test_parse_snapshot_wrong_length():
+    with pytest.raises(ValueError):
+        parse_snapshot('0;1;LIN')
+
+
+def test_no_differences():
+    assert differences(desired_state(_vna()), parse_snapshot(_SNAPSHOT)) \
+        == []
+
+
+def test_differences():
+    current = parse_snapshot(_SNAPSHOT)
+    desired = desired_state(_vna(freq_max=8.5 + 1.e-9, sweep_points=101,
+                                 averaging=None))
+    # 1 Hz on 8.5 GHz is within the tolerance
+    assert differences(desired, current) == ['points', 'averaging']
+    assert state_commands(['points', 'averaging'], desired) == \
+        [':SENSe1:SWEep:POINts 101', ':SENSe1:AVERage:STATe OFF']
+
+
+def test_differences_skips_unset():
+    current = parse_snapshot(_SNAPSHOT)
+    assert differences({'points': None, 'if_bandwidth': 1.e4}, current) == []
+
+
+def test_segment_table():
+    segments = [SweepSegment(1., 2., 11, if_bandwidth=1.e3),
+                SweepSegment(2.5, 3., 21)]
+    assert len(segment_query(2).split(';')) == 10
+    table = parse_segments('1e9;2e9;11;1000;0;2.5e9;3e9;21;10000;-10', 2)
+    assert table[1]['points'] == 21
+    assert table[1]['power'] == -10.
+    assert segment_differences(desired_segments(segments), table) == []
+
+
+def test_segment_differences():
+    table = parse_segments('1e9;2e9;11;1000;0;2.5e9;3e9;21;10000;0', 2)
+    # same count and points, another start and IF bandwidth
+    moved = [SweepSegment(1.2, 2., 11, if_bandwidth=1.e3),
+             SweepSegment(2.5, 3., 21, if_bandwidth=3.e3)]
+    assert segment_differences(desired_segments(moved), table) == [1, 2]
+    assert segment_differences(desired_segments(moved[:1]), table) == [1, 2]
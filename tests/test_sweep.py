@@ -0,0 +1,55 @@
+import pytest
+
+from mwscanner_control.sweep import SweepSegment, check_segments, stimulus, \
+    plan_sweep
+
+
+def test_segment():
+    seg = SweepSegment(1, 2, 11, if_bandwidth=1000)
+    assert seg.frequency[[0, -1]].tolist() == [1.e9, 2.e9]
+    assert SweepSegment.from_dict(seg.to_dict()).to_dict() == seg.to_dict()
+    with pytest.raises(ValueError):
+        SweepSegment(2., 1., 11)
+    with pytest.raises(ValueError):
+        SweepSegment(1., 2., 1)
+
+
+def test_check_segments():
+    segments = [SweepSegment(1., 2., 11), SweepSegment(2., 3., 21)]
+    check_segments(segments)
+    assert len(stimulus(segments)) == 32
+    with pytest.raises(ValueError):
+        check_segments([])
+    with pytest.raises(ValueError):
+        check_segments(segments[::-1])
+    with pytest.raises(ValueError):
+        check_segments([SweepSegment(1., 2., 11), SweepSegment(1.5, 3., 21)])
+
+
+def test_plan_sweep():
+    # 10 dB less noise: 1 kHz (10 times slower) or 10 averages, a tie
+    plan = plan_sweep(-60., 1.e4, -70., 201)
+    assert plan['if_bandwidth'] == 1000
+    assert plan['averaging'] == 1
+    assert plan['noise_db'] == pytest.approx(-70.)
+    assert plan['sweep_seconds'] == pytest.approx(0.201)
+
+
+def test_plan_sweep_overhead():
+    # with a large overhead per point, averaging at a wide bandwidth is
+    # slower than a single narrow sweep
+    plan = plan_sweep(-60., 1.e4, -80., 101, point_seconds=1.e-3)
+    assert plan['averaging'] == 1
+    assert plan['noise_db'] <= -80.
+    # a tie of 5 kHz with 2 averages at 10 kHz, 3 kHz is slower
+    plan = plan_sweep(-60., 1.e4, -63., 101, bandwidths=(3000, 5000, 1.e4))
+    assert (plan['if_bandwidth'], plan['averaging']) == (5000, 1)
+    assert plan['sweep_seconds'] == pytest.approx(101 / 5000)
+
+
+def test_plan_sweep_unreachable():
+    with pytest.raises(ValueError):
+        plan_sweep(-60., 1.e4, -200., 201)
+    with pytest.raises(ValueError):
+        plan_sweep(-60., 1.e4, -70., 201, bandwidths=(1.e4,),
+                   max_averaging=5)
@@ -0,0 +1,82 @@
+import json
+import threading
+
+import pytest
+
+from mwscanner_control.tracing import Tracer
+
+
+def _read(path):
+    with open(path) as fid:
+        return json.load(fid)
+
+
+def test_disabled(tmp_path):
+    tracer = Tracer()
+    with tracer.span('measure', 'vna'):
+        pass
+    tracer.instant('press', 'motor')
+    path = str(tmp_path / 'trace.json')
+    tracer.flush(path)
+    assert _read(path)['traceEvents'] == []
+
+
+def test_chrome_format(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    tracer = Tracer()
+    tracer.start(path)
+    with tracer.span('measure', 'vna', sweep=1):
+        tracer.instant('press', 'motor', motor=2)
+    with pytest.raises(ValueError):
+        with tracer.span('setup', 'vna'):
+            raise ValueError
+    thread = threading.Thread(target=tracer.instant, args=('worker',),
+                              name='worker')
+    thread.start()
+    thread.join()
+    tracer.stop()
+
+    trace = _read(path)
+    assert trace['displayTimeUnit'] == 'ms'
+    events = trace['traceEvents']
+    names = {event['args']['name'] for event in events
+             if event['ph'] == 'M'}
+    assert 'worker' in names
+    events = {event['name']: event for event in events
+              if event['ph'] != 'M'}
+    measure = events['measure']
+    assert measure['ph'] == 'X'
+    assert measure['cat'] == 'vna'
+    assert measure['args'] == {'sweep': 1}
+    assert measure['dur'] >= 0.
+    press = events['press']
+    assert press['ph'] == 'i'
+    assert press['args'] == {'motor': 2}
+    # the instant event is within the span (in us)
+    assert measure['ts'] <= press['ts'] <= measure['ts'] + measure['dur']
+    assert events['setup']['args'] == {'error': 'ValueError'}
+
+    # stopped: nothing more is recorded
+    with tracer.span('late'):
+        pass
+    tracer.flush()
+    assert 'late' not in {event['name']
+                          for event in _read(path)['traceEvents']}
+
+
+def test_bounded(tmp_path):
+    path = str(tmp_path / 'trace.json')
+    tracer = Tracer(max_events=3)
+    tracer.start(path)
+    for ik in range(5):
+        tracer.instant('event{:d}'.format(ik))
+    tracer.flush()
+    # the oldest are dropped
+    assert [event['name'] for event in _read(path)['traceEvents']
+            if event['ph'] != 'M'] == ['event2', 'event3', 'event4']
+
+    # resized, keeping the newest
+    tracer.start(path, max_events=2)
+    tracer.stop()
+    assert [event['name'] for event in _read(path)['traceEvents']
+            if event['ph'] != 'M'] == ['event3', 'event4']
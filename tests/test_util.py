@@ -0,0 +1,45 @@
+import numpy as np
+
+from mwscanner_control.util import ellipse_points, ray_ellipse_distance
+
+
+def _ellipse():
+    # semi-axes 4 (along 30 degrees) and 2, centered at (1, -0.5)
+    rot = np.array([[np.cos(np.pi / 6.), -np.sin(np.pi / 6.)],
+                    [np.sin(np.pi / 6.), np.cos(np.pi / 6.)]])
+    a_matrix = rot @ np.diag([1. / 16., 1. / 4.]) @ rot.T
+    return a_matrix, np.array([1., -.5])
+
+
+def test_ellipse_points():
+    a_matrix, centroid = _ellipse()
+    x, y = ellipse_points(a_matrix, centroid, num=50)
+    assert len(x) == len(y) == 51
+    assert np.allclose((x[0], y[0]), (x[-1], y[-1]))
+    diff = np.stack((x, y), axis=-1) - centroid
+    assert np.allclose(np.einsum('ni,ij,nj->n', diff, a_matrix, diff), 1.)
+
+
+def test_circle():
+    assert np.allclose(ray_ellipse_distance(np.eye(2) / 4., np.zeros(2),
+                                            [0., 90., 225.]), 2.)
+
+
+def test_ray_ellipse_distance():
+    a_matrix, centroid = _ellipse()
+    angles = np.arange(0., 360., 15.)
+    dist = ray_ellipse_distance(a_matrix, centroid, angles)
+    theta = np.radians(angles)
+    points = dist[:, None] * np.stack((np.cos(theta), np.sin(theta)),
+                                      axis=-1)
+    diff = points - centroid
+    assert np.all(dist > 0.)
+    assert np.allclose(np.einsum('ni,ij,nj->n', diff, a_matrix, diff), 1.)
+
+
+def test_ray_misses():
+    # the origin is outside, the rays pointing away do not cross it
+    dist = ray_ellipse_distance(np.eye(2), np.array([5., 0.]),
+                                [0., 90., 180.])
+    assert dist[0] == 6.
+    assert np.isnan(dist[1:]).all()
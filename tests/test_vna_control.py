@@ -0,0 +1,238 @@
+import gzip
+import json
+import os
+import socket
+import socketserver
+import sys
+import threading
+
+import numpy as np
+
+import pytest
+
+pyvisa = pytest.importorskip('pyvisa')
+pytest.importorskip('pyvisa_py')
+
+from mwscanner_control.vna_control import RSVNAControl  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(
+    os.path.abspath(__file__))), 'testing_hardware'))
+import scpi_server  # noqa: E402
+
+_DATA = ':CALCulate1:DATA:ALL? SDATa'
+
+
+class _TimeoutOnce(object):
+    """Times out the first data query of a resource."""
+
+    def __init__(self, resource):
+        self._resource = resource
+        self.failed = False
+
+    def __getattr__(self, name):
+        return getattr(self._resource, name)
+
+    def query(self, cmd, *args, **kwargs):
+        if cmd == _DATA and not self.failed:
+            self.failed = True
+            raise pyvisa.errors.VisaIOError(
+                pyvisa.constants.StatusCode.error_timeout)
+        return self._resource.query(cmd, *args, **kwargs)
+
+
+@pytest.fixture
+def instrument():
+    """The SCPI stand-in (testing_hardware/scpi_server.py) on a free
+    port."""
+    server = socketserver.ThreadingTCPServer(('127.0.0.1', 0),
+                                             scpi_server._Handler)
+    server.daemon_threads = True
+    server.instrument = scpi_server.Instrument(sweep_seconds=0.)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def vna(instrument):
+    vna = RSVNAControl()
+    vna.ip_address = '127.0.0.1'
+    vna.socket_port = instrument.server_address[1]
+    yield vna
+    if vna._vna is not None:
+        vna.disconnect()
+
+
+def _commands(path):
+    with gzip.open(path, 'rt') as fid:
+        return [json.loads(line).get('cmd') for line in fid][1:]
+
+
+def test_reconnect_while_recording(vna, tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    vna.connect(link='socket', record=path)
+    vna.setup(num_channels=2)
+    vna.measure()
+    assert vna.reconnect() == []
+    frequency, sparam = vna.measure()
+    vna.disconnect()
+
+    commands = _commands(path)
+    assert commands.count(_DATA) == 2
+    # the settings are checked after the reconnect
+    assert commands[commands.index(_DATA) + 2].startswith(
+        ':INITiate1:CONTinuous?')
+    assert commands[-1] == ':CALCulate1:DATA:STIMulus?'
+
+
+def test_replay_reconnect(vna, tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    vna.connect(link='socket', record=path)
+    vna.setup(num_channels=2)
+    vna._vna.attach(_TimeoutOnce(vna._vna._resource))
+    vna.measure()
+    assert vna.stats.reconnects == 1
+    vna.disconnect()
+
+    # the timeout and the reconnect are replayed
+    vna.replay(path)
+    vna.setup(num_channels=2)
+    frequency, sparam = vna.measure()
+    assert sparam.shape == (3, len(frequency))
+    assert vna.stats.reconnects == 2
+    assert vna._vna.remaining == 0
+
+
+def test_optimize_sweep(vna, instrument):
+    vna.connect(link='socket')
+    vna.setup(num_channels=2)
+    settings = instrument.instrument.settings
+    # the noise of the stand-in is about -57 dB at any bandwidth
+    plan = vna.optimize_sweep(target_noise_db=-70., resolution=0.025)
+    assert -60. < plan['measured_db'] < -54.
+    assert plan['noise_db'] <= -70.
+    assert plan['points'] == 101
+    assert vna.sweep_points == 101
+    # the writes are not answered, wait until the stand-in has them all
+    vna._vna.query('*OPC?')
+    assert scpi_server._number(settings['SENSE1:BWIDTH']) == \
+        plan['if_bandwidth']
+    if plan['averaging'] > 1:
+        assert int(settings['SENSE1:AVERAGE:COUNT']) == plan['averaging']
+        assert settings['SENSE1:AVERAGE:STATE'] == 'ON'
+    else:
+        assert settings['SENSE1:AVERAGE:STATE'] == 'OFF'
+    frequency, sparam = vna.measure()
+    np.testing.assert_allclose(np.diff(frequency), 0.025e9)
+
+
+def test_optimize_sweep_unreachable(vna, instrument):
+    vna.connect(link='socket')
+    vna.setup(num_channels=2)
+    settings = instrument.instrument.settings
+    points, averaging = vna.sweep_points, vna.averaging
+    with pytest.raises(ValueError):
+        vna.optimize_sweep(target_noise_db=-200., resolution=0.025,
+                           max_averaging=10)
+    # the sweep of before is restored
+    vna._vna.query('*OPC?')
+    assert vna.sweep_points == points
+    assert vna.averaging == averaging
+    assert int(settings['SENSE1:AVERAGE:COUNT']) == averaging
+    assert settings['SENSE1:AVERAGE:STATE'] == 'ON'
+
+
+def test_setup_again(vna, tmp_path):
+    path = str(tmp_path / 'session.scpi.gz')
+    vna.connect(link='socket')
+    vna.setup(num_channels=2)
+    vna._calibrated = True
+    vna.disconnect()
+
+    vna.connect(link='socket', record=path)
+    vna.setup(num_channels=2)
+    assert vna._calibrated
+    vna.freq_points = 101
+    vna.setup(num_channels=2)
+    assert not vna._calibrated
+    vna.disconnect()
+
+    # no reset and no screen setup, only the points are written
+    commands = _commands(path)
+    assert '*RST' not in commands
+    assert not any(cmd.startswith(':DISPlay') for cmd in commands)
+    assert ':SENSe1:SWEep:POINts 101' in commands
+
+
+def _record_sweeps(vna, monkeypatch):
+    """Keeps a copy of the data of every sweep."""
+    sweeps = []
+    sweep = vna._sweep
+
+    def record(pairs):
+        data, size = sweep(pairs)
+        sweeps.append(data.copy())
+        return data, size
+
+    monkeypatch.setattr(vna, '_sweep', record)
+    return sweeps
+
+
+def _sem(sweeps):
+    """Largest standard error of the mean of the sweeps."""
+    return np.sqrt(np.max(np.var(sweeps, axis=0, ddof=1)) / len(sweeps))
+
+
+def test_measure_adaptive(vna, instrument, monkeypatch):
+    vna.connect(link='socket')
+    vna.setup(num_channels=2)
+    sweeps = _record_sweeps(vna, monkeypatch)
+    # the noise of the stand-in is about 1.4e-3
+    threshold = 4.e-4
+    frequency, sparam, count = vna.measure_adaptive(threshold,
+                                                    max_sweeps=500)
+    assert count == len(sweeps)
+    np.testing.assert_allclose(sparam, np.mean(sweeps, axis=0))
+    # stopped at the first sweep below the threshold
+    assert 2 < count < 500
+    assert _sem(sweeps) <= threshold
+    assert _sem(sweeps[:-1]) > threshold
+    assert sparam.shape == (3, len(frequency))
+    # the averaging of the instrument is switched on again
+    vna._vna.query('*OPC?')
+    settings = instrument.instrument.settings
+    assert int(settings['SENSE1:AVERAGE:COUNT']) == vna.averaging
+    assert settings['SENSE1:AVERAGE:STATE'] == 'ON'
+
+    sweeps.clear()
+    frequency, sparam, count = vna.measure_adaptive(1., max_sweeps=10)
+    assert count == len(sweeps) == 2
+    with pytest.warns(RuntimeWarning, match='still above'):
+        frequency, sparam, count = vna.measure_adaptive(1.e-9, max_sweeps=5)
+    assert count == 5
+
+
+def test_probe_links(vna):
+    results = vna.probe_links(links=('hislip', 'socket', 'lan'))
+    # only the raw socket of the stand-in answers
+    assert list(results) == ['socket']
+    link = results['socket']
+    assert link['rtt'] > 0.
+    assert link['rate'] > 0.
+    assert link['score'] >= link['rtt']
+
+    assert vna.connect(link='auto') == 'socket'
+    vna.setup(num_channels=2)
+    frequency, sparam = vna.measure()
+    assert sparam.shape == (3, len(frequency))
+
+
+def test_connect_auto_no_link(vna):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        vna.socket_port = sock.getsockname()[1]
+    with pytest.raises(RuntimeError, match='no link'):
+        vna.connect(link='auto')
+    assert vna._vna is None